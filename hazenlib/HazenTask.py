@@ -3,26 +3,49 @@ HazenTask.py
 """
 import os
 import pathlib
-from pydicom import dcmread
 
 from hazenlib.logger import logger
+import hazenlib.utils
+from hazenlib.utils import LazyDicom, pixel_cache
 
 
 class HazenTask:
     """Base class for performing tasks on image sets"""
 
     def __init__(
-        self, input_data: list, report: bool = False, report_dir=None, **kwargs
+        self,
+        input_data: list,
+        report: bool = False,
+        report_dir=None,
+        cache=None,
+        phantom_locator=None,
+        **kwargs,
     ):
         """Initialise a HazenTask instance
 
         Args:
-            input_data (list): list of filepaths to DICOM images
+            input_data (list): list of filepaths to DICOM images, or DicomHeader records from
+                hazenlib.utils.scan_dicom_headers
             report (bool, optional): Whether to create measurement visualisation diagrams. Defaults to False.
             report_dir (string, optional): Path to output report images. Defaults to None.
+            cache (hazenlib.utils.PixelCache, optional): where decoded pixel arrays are kept.
+                Defaults to the shared hazenlib.utils.pixel_cache.
+            phantom_locator (hazenlib.utils.PhantomLocator, optional): where phantom localisation results
+                are kept. Defaults to the shared hazenlib.utils.phantom_locator.
+
+        Notes:
+            dcm_list holds hazenlib.utils.LazyDicom proxies: headers are read on first access
+            and pixel arrays are decoded once, read-only.
         """
         data_paths = sorted(input_data)
-        self.dcm_list = [dcmread(dicom) for dicom in data_paths]
+        cache = pixel_cache if cache is None else cache
+        self.dcm_list = [
+            LazyDicom(dicom, header=getattr(dicom, "dataset", None), cache=cache)
+            for dicom in data_paths
+        ]
+        if phantom_locator is None:
+            phantom_locator = hazenlib.utils.phantom_locator
+        self.phantom_locator = phantom_locator
         self.report: bool = report
         if report_dir is not None:
             self.report_path = os.path.join(str(report_dir), type(self).__name__)
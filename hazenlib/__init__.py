@@ -4,19 +4,24 @@ Welcome to the hazen Command Line Interface
 The following Tasks are available:
 - ACR phantom:
 acr_snr | acr_slice_position | acr_slice_thickness | acr_spatial_resolution | acr_uniformity | acr_ghosting | acr_geometric_accuracy
+acr_all (runs all of the above ACR tasks, preprocessing the images once)
 - MagNET Test Objects:
 snr | snr_map | slice_position | slice_width | spatial_resolution | uniformity | ghosting
 - Caliber phantom:
 relaxometry
+relaxometry_all (runs T1 and T2 relaxometry on every plate in a study folder, detecting the plates)
 
 All tasks can be run by executing 'hazen <task> <folder>'. Optional flags are available for the Tasks; see the General
-Options section below. The 'acr_snr' and 'snr' Tasks have additional optional flags, also detailed below.
+Options section below. The 'acr_snr', 'acr_all' and 'snr' Tasks have additional optional flags, also detailed below.
+The exit status is 1 if a single image task fails on any image, or relaxometry_all on any image set.
 
 Usage:
     hazen <task> <folder> [options]
     hazen snr <folder> [--measured_slice_width=<mm>] [--coil=<head or body>] [options]
     hazen acr_snr <folder> [--measured_slice_width=<mm>] [--subtract=<folder2>] [options]
-    hazen relaxometry <folder> --calc=<T1> --plate_number=<4> [options]
+    hazen acr_all <folder> [--measured_slice_width=<mm>] [--subtract=<folder2>] [options]
+    hazen relaxometry <folder> --calc=<T1> --plate_number=<4> [--map] [options]
+    hazen relaxometry_all <folder> [--map] [options]
 
     hazen -h | --help
     hazen --version
@@ -26,24 +31,30 @@ General Options: available for all Tasks
     --output=<path>              Provide a folder where report images are to be saved.
     --verbose                    Whether to provide additional metadata about the calculation in the result (slice position and relaxometry tasks)
     --log=<level>                Set the level of logging based on severity. Available levels are "debug", "warning", "error", "critical", with "info" as default.
+    --jobs=<n>                   Number of processes to run single image tasks (ghosting, uniformity, spatial_resolution, slice_width, snr_map) in parallel, with 1 as default.
 
-acr_snr & snr Task options:
-    --measured_slice_width=<mm>  Provide a slice width to be used for SNR measurement, by default it is parsed from the DICOM (optional for acr_snr and snr)
-    --subtract=<folder2>         Provide a second folder path to calculate SNR by subtraction for the ACR phantom (optional for acr_snr)
+acr_snr, acr_all & snr Task options:
+    --measured_slice_width=<mm>  Provide a slice width to be used for SNR measurement, by default it is parsed from the DICOM (optional for acr_snr, acr_all and snr)
+    --subtract=<folder2>         Provide a second folder path to calculate SNR by subtraction for the ACR phantom (optional for acr_snr and acr_all)
 
-relaxometry Task options:
-    --calc=<n>                   Choose 'T1' or 'T2' for relaxometry measurement (required)
-    --plate_number=<n>           Which plate to use for measurement: 4 or 5 (required)
+relaxometry & relaxometry_all Task options:
+    --calc=<n>                   Choose 'T1' or 'T2' for relaxometry measurement (required for relaxometry)
+    --plate_number=<n>           Which plate to use for measurement: 4 or 5 (required for relaxometry)
+    --map                        Calculate a voxel-wise T1 or T2 map of the phantom and sample the sphere values from it
 """
 
+import os
 import sys
 import json
 import inspect
 import logging
 import importlib
+import functools
 
-from docopt import docopt
-from hazenlib.utils import get_dicom_files
+from concurrent.futures import ProcessPoolExecutor
+from docopt import docopt, DocoptExit
+from hazenlib.logger import logger
+from hazenlib.utils import phantom_locator, pixel_cache, scan_dicom_headers
 from hazenlib._version import __version__
 
 """
@@ -72,7 +83,8 @@ def init_task(selected_task, files, report, report_dir, **kwargs):
 
     Args:
         selected_task (string): name of task script/module to load
-        files (list): list of filepaths to DICOM images
+        files (list): list of filepaths to DICOM images, or DicomHeader records from
+            hazenlib.utils.scan_dicom_headers
         report (bool): whether to generate report images
         report_dir (string): path to folder to save report images to
         kwargs: any other key word arguments
@@ -106,10 +118,69 @@ def init_task(selected_task, files, report, report_dir, **kwargs):
     return task
 
 
+def run_single_image_task(selected_task, file, report, report_dir, **kwargs):
+    """Run a single image task on one file, catching any error so a batch can continue
+
+    Args:
+        selected_task (string): name of task script/module to load
+        file (string): filepath to DICOM image, or its DicomHeader record
+        report (bool): whether to generate report images
+        report_dir (string): path to folder to save report images to
+        kwargs: any other key word arguments
+
+    Returns:
+        dict: result of task.run(), or the task name, file and error message if it failed
+    """
+    try:
+        task = init_task(selected_task, [file], report, report_dir, **kwargs)
+        return task.run()
+    except Exception as e:
+        logger.error(f"Could not run {selected_task} on {file} because of: {e}")
+        return {
+            "task": selected_task,
+            "file": os.path.basename(file),
+            "error": f"{type(e).__name__}: {e}",
+        }
+
+
+def run_single_image_tasks(selected_task, files, report, report_dir, jobs=1, **kwargs):
+    """Run a single image task on each file, optionally in a pool of processes
+
+    Args:
+        selected_task (string): name of task script/module to load
+        files (list): list of filepaths to DICOM images, or DicomHeader records from
+            hazenlib.utils.scan_dicom_headers
+        report (bool): whether to generate report images
+        report_dir (string): path to folder to save report images to
+        jobs (int, optional): number of processes to use. Defaults to 1.
+        kwargs: any other key word arguments
+
+    Yields:
+        dict: result for each file, in the order of the input files
+    """
+    run_file = functools.partial(
+        run_single_image_task,
+        selected_task,
+        report=report,
+        report_dir=report_dir,
+        **kwargs,
+    )
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            yield from executor.map(run_file, files)
+    else:
+        yield from map(run_file, files)
+
+
 def main():
     """Main entrypoint to hazen"""
     arguments = docopt(__doc__, version=__version__)
-    files = get_dicom_files(arguments["<folder>"])
+    # header records are passed to the tasks so that files are only scanned once
+    if arguments["relaxometry_all"] or arguments["<task>"] == "relaxometry_all":
+        # a study may be exported with one subfolder per series
+        files = scan_dicom_headers(arguments["<folder>"], recursive=True)
+    else:
+        files = scan_dicom_headers(arguments["<folder>"])
 
     # Set common options
     log_levels = {
@@ -129,55 +200,92 @@ def main():
     report = arguments["--report"]
     report_dir = arguments["--output"] if arguments["--output"] else None
     verbose = arguments["--verbose"]
+    try:
+        jobs = int(arguments["--jobs"]) if arguments["--jobs"] else 1
+    except ValueError:
+        raise DocoptExit(f"--jobs must be a whole number, not {arguments['--jobs']!r}")
+    if jobs < 1:
+        raise DocoptExit(f"--jobs must be at least 1, not {jobs}")
 
-    # Parse the task and optional arguments:
-    if arguments["snr"] or arguments["<task>"] == "snr":
-        selected_task = "snr"
-        task = init_task(
-            selected_task,
-            files,
-            report,
-            report_dir,
-            measured_slice_width=arguments["--measured_slice_width"],
-            coil=arguments["--coil"],
-        )
-        result = task.run()
-    elif arguments["acr_snr"] or arguments["<task>"] == "acr_snr":
-        selected_task = "acr_snr"
-        task = init_task(
-            selected_task,
-            files,
-            report,
-            report_dir,
-            subtract=arguments["--subtract"],
-            measured_slice_width=arguments["--measured_slice_width"],
-        )
-        result = task.run()
-    elif arguments["relaxometry"] or arguments["<task>"] == "relaxometry":
-        selected_task = "relaxometry"
-        task = init_task(selected_task, files, report, report_dir)
-        result = task.run(
-            calc=arguments["--calc"],
-            plate_number=arguments["--plate_number"],
-            verbose=arguments["--verbose"],
-        )
-    else:
-        selected_task = arguments["<task>"]
-        if selected_task in single_image_tasks:
-            # Ghosting, Uniformity, Spatial resolution, SNR map, Slice width
-            for file in files:
-                task = init_task(selected_task, [file], report, report_dir)
-                result = task.run()
-                result_string = json.dumps(result, indent=2)
-                print(result_string)
-            return
-        else:
-            # Slice Position task, all ACR tasks except SNR
-            task = init_task(selected_task, files, report, report_dir, verbose=verbose)
+    try:
+        # Parse the task and optional arguments:
+        if arguments["snr"] or arguments["<task>"] == "snr":
+            selected_task = "snr"
+            task = init_task(
+                selected_task,
+                files,
+                report,
+                report_dir,
+                measured_slice_width=arguments["--measured_slice_width"],
+                coil=arguments["--coil"],
+            )
+            result = task.run()
+        elif arguments["acr_snr"] or arguments["<task>"] == "acr_snr":
+            selected_task = "acr_snr"
+            task = init_task(
+                selected_task,
+                files,
+                report,
+                report_dir,
+                subtract=arguments["--subtract"],
+                measured_slice_width=arguments["--measured_slice_width"],
+            )
             result = task.run()
+        elif arguments["acr_all"] or arguments["<task>"] == "acr_all":
+            selected_task = "acr_all"
+            task = init_task(
+                selected_task,
+                files,
+                report,
+                report_dir,
+                subtract=arguments["--subtract"],
+                measured_slice_width=arguments["--measured_slice_width"],
+            )
+            result = task.run()
+        elif arguments["relaxometry"] or arguments["<task>"] == "relaxometry":
+            selected_task = "relaxometry"
+            task = init_task(selected_task, files, report, report_dir)
+            result = task.run(
+                calc=arguments["--calc"],
+                plate_number=arguments["--plate_number"],
+                verbose=arguments["--verbose"],
+                calc_map=arguments["--map"],
+            )
+        elif arguments["relaxometry_all"] or arguments["<task>"] == "relaxometry_all":
+            selected_task = "relaxometry_all"
+            task = init_task(selected_task, files, report, report_dir)
+            result = task.run(verbose=verbose, calc_map=arguments["--map"])
+        else:
+            selected_task = arguments["<task>"]
+            if selected_task in single_image_tasks:
+                # Ghosting, Uniformity, Spatial resolution, SNR map, Slice width
+                failed = False
+                for result in run_single_image_tasks(
+                    selected_task, files, report, report_dir, jobs=jobs
+                ):
+                    result_string = json.dumps(result, indent=2)
+                    print(result_string)
+                    failed = failed or "error" in result
+                if failed:
+                    # a batch that is not complete should not look like a success to scripts
+                    sys.exit(1)
+                return
+            else:
+                # Slice Position task, all ACR tasks except SNR
+                task = init_task(
+                    selected_task, files, report, report_dir, verbose=verbose
+                )
+                result = task.run()
 
-    result_string = json.dumps(result, indent=2)
-    print(result_string)
+        result_string = json.dumps(result, indent=2)
+        print(result_string)
+        if "errors" in result:
+            # some image sets of relaxometry_all could not be measured
+            sys.exit(1)
+    finally:
+        # pixel arrays and localisation results are only kept for the images of this run
+        pixel_cache.clear()
+        phantom_locator.clear()
 
 
 if __name__ == "__main__":
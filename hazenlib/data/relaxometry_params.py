@@ -230,3 +230,9 @@ TERMINATION_EPS = 1e-10
 # Parameters for Rician noise model - used in T2 calculation
 MAX_RICIAN_NOISE = 20.0
 SEED_RICIAN_NOISE = 5.0
+
+# Parameters for voxel-wise relaxation maps
+# Relaxation times (ms) searched to seed the fit in each voxel
+MAP_SEED_TIMES = {"t1": np.geomspace(10, 5000, 60), "t2": np.geomspace(5, 3000, 60)}
+# Maximum number of voxels fitted together, to bound memory use
+MAP_CHUNK_SIZE = 4096
@@ -40,3 +40,10 @@ class ArgumentCombinationError(Exception):
 
     def __init__(self, msg="Invalid combination of arguments."):
         super().__init__(msg)
+
+
+class RodTrackingError(Exception):
+    """Rods not found near their positions in a neighbouring slice."""
+
+    def __init__(self, msg="Could not track the rods."):
+        super().__init__(msg)
@@ -0,0 +1,83 @@
+"""
+ACR All
+
+https://www.acraccreditation.org/-/media/acraccreditation/documents/mri/largephantomguidance.pdf
+
+Runs all ACR phantom measurements on one image set of the ACR phantom: SNR, uniformity, ghosting, slice thickness,
+slice position, spatial resolution and geometric accuracy.
+
+The image set is loaded and the ACR object (slice sorting, orientation checks, rotation, phantom centre and mask) is
+set up once, then shared by every measurement task, instead of each task repeating this preprocessing. The results of
+all tasks are combined into a single results dictionary.
+"""
+
+import sys
+import traceback
+
+from hazenlib.HazenTask import HazenTask
+from hazenlib.ACRObject import ACRObject
+from hazenlib.tasks.acr_snr import ACRSNR
+from hazenlib.tasks.acr_uniformity import ACRUniformity
+from hazenlib.tasks.acr_ghosting import ACRGhosting
+from hazenlib.tasks.acr_slice_thickness import ACRSliceThickness
+from hazenlib.tasks.acr_slice_position import ACRSlicePosition
+from hazenlib.tasks.acr_spatial_resolution import ACRSpatialResolution
+from hazenlib.tasks.acr_geometric_accuracy import ACRGeometricAccuracy
+
+
+class ACRAll(HazenTask):
+    """Runs all measurement tasks for DICOM images of the ACR phantom, sharing one ACR object."""
+
+    acr_tasks = [
+        ACRSNR,
+        ACRUniformity,
+        ACRGhosting,
+        ACRSliceThickness,
+        ACRSlicePosition,
+        ACRSpatialResolution,
+        ACRGeometricAccuracy,
+    ]
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Initialise ACR object once for all tasks
+        self.ACR_obj = ACRObject(self.dcm_list)
+        # keep the input arguments (eg. measured_slice_width, subtract) to pass on to each task
+        self.task_kwargs = kwargs
+
+    def run(self) -> dict:
+        """Main function for performing all ACR phantom measurements on the image set.
+
+        Notes:
+            A task that fails is reported and skipped, the remaining tasks are still run.
+
+        Returns:
+            dict: results are returned in a standardised dictionary structure specifying the task name, input DICOM
+            Series Description + SeriesNumber, the measurement results of each task (keyed by task name) and
+            optionally the paths to the generated images for visualisation.
+        """
+        # Initialise results dictionary
+        results = self.init_result_dict()
+        results["file"] = self.img_desc(
+            self.ACR_obj.slice7_dcm, properties=["SeriesDescription", "SeriesNumber"]
+        )
+
+        for task_class in self.acr_tasks:
+            try:
+                task = task_class(acr_obj=self.ACR_obj, **self.task_kwargs)
+                task_results = task.run()
+                results["measurement"][task_results["task"]] = task_results[
+                    "measurement"
+                ]
+                if self.report:
+                    self.report_files.extend(task_results["report_image"])
+            except Exception as e:
+                print(f"Could not run {task_class.__name__} because of : {e}")
+                traceback.print_exc(file=sys.stdout)
+                continue
+
+        # only return reports if requested
+        if self.report:
+            results["report_image"] = self.report_files
+
+        return results
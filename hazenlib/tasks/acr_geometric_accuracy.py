@@ -40,7 +40,8 @@ class ACRGeometricAccuracy(HazenTask):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.ACR_obj = ACRObject(self.dcm_list)
+        # Initialise ACR object, unless one is shared with other tasks (see ACRAll)
+        self.ACR_obj = kwargs.get("acr_obj") or ACRObject(self.dcm_list)
 
     def run(self) -> dict:
         """Main function for performing geometric accuracy measurement using the first and fifth slices from the ACR phantom image set.
@@ -29,8 +29,8 @@ class ACRGhosting(HazenTask):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        # Initialise ACR object
-        self.ACR_obj = ACRObject(self.dcm_list)
+        # Initialise ACR object, unless one is shared with other tasks (see ACRAll)
+        self.ACR_obj = kwargs.get("acr_obj") or ACRObject(self.dcm_list)
 
     def run(self) -> dict:
         """Main function for performing ghosting measurement using slice 7 from the ACR phantom image set.
@@ -42,8 +42,8 @@ class ACRSlicePosition(HazenTask):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        # Initialise ACR object
-        self.ACR_obj = ACRObject(self.dcm_list)
+        # Initialise ACR object, unless one is shared with other tasks (see ACRAll)
+        self.ACR_obj = kwargs.get("acr_obj") or ACRObject(self.dcm_list)
 
     def run(self) -> dict:
         """Main function for performing slice position measurement using the first and last slices from the ACR phantom
@@ -107,22 +107,13 @@ class ACRSlicePosition(HazenTask):
         # northmost point of object
         n_point = np.argwhere(np.sum(mask, 1) > 0)[0].item()
 
-        invest_x = []
-        for k in range(x_investigate_region):
-            # add n_point to ensure in image's coordinate system
-            y_loc = n_point + k
-            # mask for resultant line profile
-            t = mask[y_loc, np.arange(w_point, e_point + 1, 1)]
-            # line profile at varying y positions from west to east
-            line_prof_x = skimage.measure.profile_line(
-                img, (y_loc, w_point), (y_loc, e_point), mode="constant"
-            ).flatten()
-
-            # mask unwanted values out and append
-            invest_x.append(t * line_prof_x)
-
-        # transpose array
-        invest_x = np.array(invest_x).T
+        # line profiles at varying y positions from west to east, masked and transposed
+        invest_x = self.wedge_profiles(
+            img,
+            mask,
+            np.arange(n_point, n_point + x_investigate_region),
+            np.arange(w_point, e_point + 1),
+        ).T
         # mean of horizontal projections of phantom
         mean_x_profile = np.mean(invest_x, 1)
         # absolute first derivative of mean
@@ -154,20 +145,15 @@ class ACRSlicePosition(HazenTask):
             # we want an odd number to see -N to N points in the y direction
             y_investigate_region = y_investigate_region + 1
 
-        invest_y = []
-        for m in range(y_investigate_region):
-            x_loc = (
-                m - np.floor(y_investigate_region / 2) + np.floor(np.mean(x_pts))
-            ).astype(int)
-            # mask for resultant line profile
-            c = mask[np.arange(n_point, end_point + 1, 1), x_loc]
-            line_prof_y = skimage.measure.profile_line(
-                img, (n_point, x_loc), (end_point, x_loc), mode="constant"
-            ).flatten()
-            invest_y.append(c * line_prof_y)
-
-        # transpose array
-        invest_y = np.array(invest_y).T
+        x_cols = (
+            np.arange(y_investigate_region)
+            - np.floor(y_investigate_region / 2)
+            + np.floor(np.mean(x_pts))
+        ).astype(int)
+        # line profiles at varying x positions from north to end of wedges, masked
+        invest_y = self.wedge_profiles(
+            img, mask, np.arange(n_point, end_point + 1), x_cols
+        )
         # mean of vertical projections of phantom
         mean_y_profile = np.mean(invest_y, 1)
         # absolute first derivative of mean
@@ -192,6 +178,59 @@ class ACRSlicePosition(HazenTask):
 
         return x_pts, y_pts
 
+    @staticmethod
+    def wedge_profiles(img, mask, rows, cols):
+        """Samples masked line profiles along every row and column of a grid in a single pass.
+
+        Args:
+            img (np.ndarray): dcm.pixel_array.
+            mask (np.ndarray): dcm.pixel_array of the image mask.
+            rows (np.ndarray): 1D array of row indices.
+            cols (np.ndarray): 1D array of column indices.
+
+        Returns:
+            np.ndarray: array of shape (len(rows), len(cols)) of pixel values, zero outside the mask and the image.
+        """
+        grid = np.meshgrid(rows, cols, indexing="ij")
+        profiles = scipy.ndimage.map_coordinates(
+            img, grid, output=float, order=1, mode="constant"
+        )
+
+        return mask[np.ix_(rows, cols)] * profiles
+
+    @staticmethod
+    def lag_errors(static_line_L, static_line_R, lag):
+        """Calculates the mean difference between the right line profile and the circularly shifted left line
+        profile for every lag at once, ignoring the wrapped values.
+
+        Args:
+            static_line_L (np.ndarray): left line profile.
+            static_line_R (np.ndarray): right line profile.
+            lag (np.ndarray): 1D array of integer lag values.
+
+        Returns:
+            np.ndarray: mean difference at each lag, set to 1e10 where no values overlap (including zero lag).
+        """
+        n = len(static_line_L)
+        pad = np.max(np.abs(lag))
+        padded_L = np.concatenate(
+            [np.full(pad, np.nan), static_line_L, np.full(pad, np.nan)]
+        )
+        # view of L shifted by each lag, with NaN in place of the wrapped values
+        shifted_L = np.lib.stride_tricks.sliding_window_view(padded_L, n)[pad - lag]
+
+        difference = static_line_R - shifted_L
+        difference[lag == 0] = np.nan
+
+        n_valid = np.count_nonzero(~np.isnan(difference), axis=1)
+        # filler value where there is nothing to compare
+        err = np.full(len(lag), 1e10)
+        err[n_valid > 0] = (
+            np.nansum(difference[n_valid > 0], axis=1) / n_valid[n_valid > 0]
+        )
+
+        return err
+
     def get_slice_position(self, dcm):
         """Locates the two opposing wedges and calculates the height difference.
 
@@ -253,21 +292,8 @@ class ACRSlicePosition(HazenTask):
         # create array of lag values
         lag = np.linspace(-50, 50, 101, dtype=int)
 
-        # initialise array of errors
-        err = np.zeros(len(lag))
-
-        for k, lag_val in enumerate(lag):
-            # difference of L and circularly shifted R
-            difference = static_line_R - np.roll(static_line_L, lag_val)
-            # set wrapped values to nan
-            if lag_val > 0:
-                difference[:lag_val] = np.nan
-            else:
-                difference[lag_val:] = np.nan
-
-            # filler value to suppress warning when trying to calculate mean of array filled with NaN otherwise
-            # calculate difference
-            err[k] = 1e10 if np.isnan(difference).all() else np.nanmean(difference)
+        # mean difference of R and circularly shifted L at each lag
+        err = self.lag_errors(static_line_L, static_line_R, lag)
 
         # find minimum non-zero error
         temp = np.argwhere(err == np.min(err[err > 0]))[0]
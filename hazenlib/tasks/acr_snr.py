@@ -32,7 +32,8 @@ class ACRSNR(HazenTask):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.ACR_obj = ACRObject(self.dcm_list)
+        # Initialise ACR object, unless one is shared with other tasks (see ACRAll)
+        self.ACR_obj = kwargs.get("acr_obj") or ACRObject(self.dcm_list)
         # measured slice width is expected to be a floating point number
         try:
             self.measured_slice_width = float(kwargs["measured_slice_width"])
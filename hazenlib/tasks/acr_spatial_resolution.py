@@ -57,7 +57,10 @@ class ACRSpatialResolution(HazenTask):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.ACR_obj = ACRObject(self.dcm_list)
+        # Initialise ACR object, unless one is shared with other tasks (see ACRAll)
+        self.ACR_obj = kwargs.get("acr_obj") or ACRObject(self.dcm_list)
+        # Oversampling factor across the edge used to build the ERF
+        self.resamp_factor = int(kwargs.get("resamp_factor", 8))
 
     def run(self) -> dict:
         """Main function for performing spatial resolution measurement
@@ -281,7 +284,7 @@ class ACRSpatialResolution(HazenTask):
         Returns:
             np.array: _description_
         """
-        resamp_factor = 8
+        resamp_factor = self.resamp_factor
         if edge_type == "horizontal":
             resample_crop_img = cv2.resize(
                 crop_img, (crop_img.shape[0] * resamp_factor, crop_img.shape[1])
@@ -297,41 +300,49 @@ class ACRSpatialResolution(HazenTask):
         temp_y = np.linspace(1, resample_crop_img.shape[0], resample_crop_img.shape[0])
         x_resample, y_resample = np.meshgrid(temp_x, temp_y)
 
-        erf = []
-        n_inside_roi = []
         if edge_type == "horizontal":
             diffY = (y_resample - 1) - mid_loc[0]
             x_prime = x_resample + resamp_factor * diffY * slope
-
-            x_min, x_max = np.min(x_prime).astype(int), np.max(x_prime).astype(int)
-
-            for k in range(x_min, x_max):
-                erf_val = np.mean(resample_crop_img[(x_prime >= k) & (x_prime < k + 1)])
-                erf.append(erf_val)
-                number_nonzero = np.count_nonzero(
-                    resample_crop_img[(x_prime >= k) & (x_prime < k + 1)]
-                )
-                n_inside_roi.append(number_nonzero)
+            erf, n_inside_roi = self.bin_erf(resample_crop_img, x_prime)
         else:
             diffX = (x_resample.shape[0] - 1) - x_resample - mid_loc[1]
             y_prime = np.flipud(y_resample) + resamp_factor * diffX * slope
+            erf, n_inside_roi = self.bin_erf(resample_crop_img, y_prime)
 
-            y_min, y_max = np.min(y_prime).astype(int), np.max(y_prime).astype(int)
+        erf = erf[n_inside_roi == np.max(n_inside_roi)]
 
-            for k in range(y_min, y_max):
-                erf_val = np.mean(resample_crop_img[(y_prime >= k) & (y_prime < k + 1)])
-                erf.append(erf_val)
-                number_nonzero = np.count_nonzero(
-                    resample_crop_img[(y_prime >= k) & (y_prime < k + 1)]
-                )
-                n_inside_roi.append(number_nonzero)
+        return erf
 
-        erf = np.array(erf)
-        n_inside_roi = np.array(n_inside_roi)
+    @staticmethod
+    def bin_erf(image, coords):
+        """Bin pixel values into unit-width bins of the projected coordinate
 
-        erf = erf[n_inside_roi == np.max(n_inside_roi)]
+        Each pixel falls into the bin k for which k <= coord < k + 1, for k
+        between the truncated minimum and maximum of the coordinates. All bins
+        are filled in a single pass using np.bincount.
 
-        return erf
+        Args:
+            image (np.array): resampled pixel array
+            coords (np.array): projected coordinate of each pixel, same shape as image
+
+        Returns:
+            tuple of np.array: mean pixel value (NaN where empty) and number of
+                nonzero pixels in each bin
+        """
+        k_min, k_max = np.min(coords).astype(int), np.max(coords).astype(int)
+        n_bins = max(k_max - k_min, 0)
+        bins = np.floor(coords).astype(int).ravel() - k_min
+        values = np.asarray(image, dtype=float).ravel()
+        inside = (bins >= 0) & (bins < n_bins)
+        bins, values = bins[inside], values[inside]
+
+        counts = np.bincount(bins, minlength=n_bins)
+        sums = np.bincount(bins, weights=values, minlength=n_bins)
+        n_nonzero = np.bincount(bins, weights=values != 0, minlength=n_bins)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            erf = sums / counts
+
+        return erf, n_nonzero.astype(int)
 
     def fit_erf(self, erf):
         """Fit ERF
@@ -397,8 +408,7 @@ class ACRSpatialResolution(HazenTask):
             else np.arange(-(N - 1) / 2, (N + 1) / 2)
         )
 
-        resamp_factor = 8
-        Fs = 1 / (np.sqrt(np.mean(np.square(res))) * (1 / resamp_factor))
+        Fs = 1 / (np.sqrt(np.mean(np.square(res))) * (1 / self.resamp_factor))
         freq = n * Fs / N
         MTF = np.abs(np.fft.fftshift(np.fft.fft(lsf)))
         MTF = MTF / np.max(MTF)
@@ -20,6 +20,7 @@ import os
 import sys
 import traceback
 import numpy as np
+import scipy.signal
 
 from hazenlib.HazenTask import HazenTask
 from hazenlib.ACRObject import ACRObject
@@ -30,8 +31,8 @@ class ACRUniformity(HazenTask):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        # Initialise ACR object
-        self.ACR_obj = ACRObject(self.dcm_list)
+        # Initialise ACR object, unless one is shared with other tasks (see ACRAll)
+        self.ACR_obj = kwargs.get("acr_obj") or ACRObject(self.dcm_list)
 
     def run(self) -> dict:
         """Main function for performing uniformity measurement using slice 7 from the ACR phantom image set.
@@ -64,7 +65,8 @@ class ACRUniformity(HazenTask):
         Iterates with a ~1 cm^2 ROI through a ~200 cm^2 ROI inside the phantom region,
         and calculates the mean non-zero pixel value inside each ~1 cm^2 ROI. \n
         The PIU is defined as: `PIU = 100 * (1 - (max - min) / (max + min))`, where \n
-        'max' and 'min' represent the maximum and minimum of the mean non-zero pixel values of each ~1 cm^2 ROI.
+        'max' and 'min' represent the maximum and minimum of the mean non-zero pixel values of each ~1 cm^2 ROI. \n
+        The map of ~1 cm^2 ROI means is stored in `self.mean_map`.
 
         Args:
             dcm (pydicom.Dataset): DICOM image object to calculate uniformity from.
@@ -94,58 +96,33 @@ class ACRUniformity(HazenTask):
         min_image = img_masked * (img_masked < half_max)
         max_image = img_masked * (img_masked > half_max)
 
-        min_rows, min_cols = np.nonzero(min_image)[0], np.nonzero(min_image)[1]
-        max_rows, max_cols = np.nonzero(max_image)[0], np.nonzero(max_image)[1]
+        # Crop the ~1cm2 ROI and locate its top-left corner relative to the sampled pixel
+        mask_rows, mask_cols = np.nonzero(base_mask)
+        kernel = base_mask[
+            mask_rows.min() : mask_rows.max() + 1, mask_cols.min() : mask_cols.max() + 1
+        ]
+        anchor = (cxy[0] + d_void - mask_rows.min(), cxy[1] - mask_cols.min())
 
-        mean_array = np.zeros(img_masked.shape)
+        # Each pixel is sampled from its own half of the large ROI
+        min_data = self.local_mean_map(min_image, kernel, anchor)
+        max_data = self.local_mean_map(max_image, kernel, anchor)
+        # Map of local ~1cm2 means, kept for reporting
+        self.mean_map = np.where(max_image > 0, max_data, min_data * (min_image > 0))
+        mean_map = self.mean_map
 
-        def uniformity_iterator(masked_image, sample_mask, rows, cols):
-            """Iterates spatially through the pixel array with a circular ROI and calculates the mean non-zero pixel
-            value within the circular ROI at each iteration.
+        sig_max = np.max(mean_map)
+        sig_min = np.min(mean_map[np.nonzero(mean_map)])
 
-            Args:
-                masked_image (np.array): subset of pixel array.
-                sample_mask (np.array): _description_.
-                rows (np.array): 1D array.
-                cols (np.array): 1D array.
-
-            Returns:
-                np.array: array of mean values.
-            """
-            # Coordinates of mask
-            coords = np.nonzero(sample_mask)
-            for idx, (row, col) in enumerate(zip(rows, cols)):
-                centre = [row, col]
-                translate_mask = [
-                    coords[0] + centre[0] - cxy[0] - d_void,
-                    coords[1] + centre[1] - cxy[1],
-                ]
-                values = masked_image[translate_mask[0], translate_mask[1]]
-                if np.count_nonzero(values) < np.count_nonzero(sample_mask):
-                    mean_val = 0
-                else:
-                    mean_val = np.mean(values[np.nonzero(values)])
-
-                mean_array[row, col] = mean_val
-
-            return mean_array
-
-        min_data = uniformity_iterator(min_image, base_mask, min_rows, min_cols)
-        max_data = uniformity_iterator(max_image, base_mask, max_rows, max_cols)
-
-        sig_max = np.max(max_data)
-        sig_min = np.min(min_data[np.nonzero(min_data)])
-
-        max_loc = np.where(max_data == sig_max)
-        min_loc = np.where(min_data == sig_min)
+        max_loc = np.where(mean_map == sig_max)
+        min_loc = np.where(mean_map == sig_min)
 
         piu = 100 * (1 - (sig_max - sig_min) / (sig_max + sig_min))
 
         if self.report:
             import matplotlib.pyplot as plt
 
-            fig, axes = plt.subplots(2, 1)
-            fig.set_size_inches(8, 16)
+            fig, axes = plt.subplots(3, 1)
+            fig.set_size_inches(8, 24)
             fig.tight_layout(pad=4)
 
             theta = np.linspace(0, 2 * np.pi, 360)
@@ -190,6 +167,10 @@ class ACRUniformity(HazenTask):
                 "Percent Integral Uniformity = " + str(np.round(piu, 2)) + "%"
             )
 
+            axes[2].imshow(np.ma.masked_equal(mean_map, 0))
+            axes[2].axis("off")
+            axes[2].set_title("Mean of ~1cm\u00b2 ROI at each Position")
+
             img_path = os.path.realpath(
                 os.path.join(self.report_path, f"{self.img_desc(dcm)}.png")
             )
@@ -197,3 +178,39 @@ class ACRUniformity(HazenTask):
             self.report_files.append(img_path)
 
         return piu
+
+    @staticmethod
+    def local_mean_map(masked_image, kernel, anchor):
+        """Calculates the mean pixel value within a small ROI placed at every pixel of an image. \n
+        The ROI sums and the number of non-zero pixels within each ROI are obtained for all positions at
+        once by FFT convolution of the image and of its non-zero mask with the ROI.
+
+        Args:
+            masked_image (np.array): pixel array, zero outside the region of interest.
+            kernel (np.array): boolean array of the small ROI.
+            anchor (tuple): row and column offset of the ROI top-left corner from the pixel it is placed at.
+
+        Returns:
+            np.array: mean pixel value of the ROI at each pixel, or 0 where the ROI is not entirely non-zero.
+        """
+        flipped = kernel[::-1, ::-1].astype(float)
+        sums = scipy.signal.fftconvolve(masked_image.astype(float), flipped)
+        counts = np.rint(scipy.signal.fftconvolve((masked_image != 0) * 1.0, flipped))
+        if np.issubdtype(masked_image.dtype, np.integer):
+            # Remove FFT round-off so that sums of integers stay exact
+            sums = np.rint(sums)
+
+        # Index of the full convolution corresponding to each ROI position
+        rows = np.arange(masked_image.shape[0]) - anchor[0] + kernel.shape[0] - 1
+        cols = np.arange(masked_image.shape[1]) - anchor[1] + kernel.shape[1] - 1
+        valid_rows = (rows >= 0) & (rows < sums.shape[0])
+        valid_cols = (cols >= 0) & (cols < sums.shape[1])
+
+        mean_map = np.zeros(masked_image.shape)
+        window = np.ix_(rows[valid_rows], cols[valid_cols])
+        full = counts[window] == np.count_nonzero(kernel)
+        mean_map[np.ix_(valid_rows, valid_cols)] = np.where(
+            full, sums[window] / np.count_nonzero(kernel), 0
+        )
+
+        return mean_map
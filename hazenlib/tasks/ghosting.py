@@ -79,30 +79,45 @@ class Ghosting(HazenTask):
 
         return 100 * abs(ghost_mean - noise_mean) / phantom_mean
 
-    def get_signal_bounding_box(self, array: np.ndarray):
-        """_summary_
+    def get_signal_mask(self, array: np.ndarray) -> np.ndarray:
+        """Find the pixels belonging to the phantom signal
 
         Args:
-            array (np.ndarray): _description_
+            array (np.ndarray): pixel array of the image
 
         Returns:
-            tuple: positions of left_column, right_column, upper_row, lower_row
+            np.ndarray: boolean mask of pixels above 40% of the maximum signal
         """
         max_signal = np.max(array)
 
         signal_limit = np.percentile(max_signal, 0.95) * 0.4
-        signal = []
-        for idx, voxel in np.ndenumerate(array):
-            if voxel > signal_limit:
-                signal.append(idx)
-
-        signal_column = sorted([voxel[1] for voxel in signal])
-        signal_row = sorted([voxel[0] for voxel in signal])
-
-        upper_row = min(signal_row)
-        lower_row = max(signal_row)
-        left_column = min(signal_column)
-        right_column = max(signal_column)
+        return array > signal_limit
+
+    def get_signal_bounding_box(self, array: np.ndarray, signal_mask=None):
+        """Find the bounding box of the phantom signal
+
+        Args:
+            array (np.ndarray): pixel array of the image
+            signal_mask (np.ndarray, optional): boolean mask of the signal, as
+                returned by get_signal_mask. Calculated from array if not given.
+
+        Returns:
+            tuple: positions of left_column, right_column, upper_row, lower_row
+        """
+        if signal_mask is None:
+            signal_mask = self.get_signal_mask(array)
+        # Keep the mask for reuse, e.g. when reporting
+        self.signal_mask = signal_mask
+
+        signal_row = np.flatnonzero(np.any(signal_mask, axis=1))
+        signal_column = np.flatnonzero(np.any(signal_mask, axis=0))
+        if signal_row.size == 0:
+            raise ValueError("No signal found above the signal threshold")
+
+        upper_row = int(signal_row[0])
+        lower_row = int(signal_row[-1])
+        left_column = int(signal_column[0])
+        right_column = int(signal_column[-1])
         return (
             left_column,
             right_column,
@@ -314,7 +329,8 @@ class Ghosting(HazenTask):
         Returns:
             float: percentage ghosting across eligible area
         """
-        bbox = self.get_signal_bounding_box(dcm.pixel_array)
+        arr = dcm.pixel_array
+        bbox = self.get_signal_bounding_box(arr)
 
         x, y = hazenlib.utils.get_pixel_size(dcm)  # assume square pixels i.e. x=y
         # ROIs need to be 10mmx10mm
@@ -325,13 +341,13 @@ class Ghosting(HazenTask):
         ghost_col, ghost_row = self.get_ghost_slice(
             bbox, dcm, slice_radius=slice_radius
         )
-        ghost = dcm.pixel_array[(ghost_col, ghost_row)]
+        ghost = arr[(ghost_col, ghost_row)]
         signal_col, signal_row = self.get_signal_slice(bbox, slice_radius=slice_radius)
-        phantom = dcm.pixel_array[(signal_row, signal_col)]
+        phantom = arr[(signal_row, signal_col)]
 
         noise = np.concatenate(
             [
-                dcm.pixel_array[(row, col)]
+                arr[(row, col)]
                 for col, row in self.get_background_slices(
                     background_rois, slice_radius=slice_radius
                 )
@@ -348,8 +364,7 @@ class Ghosting(HazenTask):
             fig, ax = plt.subplots()
             x1, x2, y1, y2 = bbox
 
-            img = dcm.pixel_array
-            img = img.astype("float64")
+            img = arr.astype("float64")
             # print('this is img',img)
             img *= 255.0 / img.max()
             # img = hazenlib.utils.rescale_to_byte(dcm.pixel_array)
@@ -83,7 +83,8 @@ Algorithm overview
     overlay image to visually check the fit.
 3. A ROI is generated for each target sphere using stored coordinates, the RT
     transformation above, and a structuring element (default is a 5x5 boxcar).
-4. Store pixel data for each ROI at various times, in an ``ROITimeSeries``
+4. Rescale all images once and extract the pixel data for every ROI at
+    every time in one step. Each ROI is accessed as an ``ROITimeSeries``
     object. A list of these objects is stored in 
     ``ImageStack.ROI_time_series``.
 5. Generate the fit function. For T1 this looks up TR for the given TI 
@@ -91,7 +92,8 @@ Algorithm overview
     magnitude or signed image is used. No customisation is required for T2
     measurements.
 6. Determine relaxation time (T1 or T2) by fitting the decay equation to
-    the ROI data for each sphere. The published values of the relaxation
+    the ROI data for all spheres at once (batched Levenberg-Marquardt,
+    ``fit_batch_lm``). The published values of the relaxation
     times are used to seed the optimisation algorithm. A Rician noise model is
     used for T2 fitting [1]_. Optionally plot and save the decay curves.
 7. Return plate number, relaxation type (T1 or T2), measured relaxation
@@ -124,24 +126,31 @@ Get r-squared measure of fit.
 import json
 import os.path
 import pathlib
+import threading
+import time
+from functools import cached_property
 
 import cv2 as cv
 import numpy as np
 import matplotlib.pyplot as plt
 import pydicom
-import skimage.morphology
 import scipy.ndimage
-import scipy.optimize
+import skimage.filters
+import skimage.morphology
 from scipy.interpolate import UnivariateSpline
-from scipy.special import i0e, ive
+from scipy.special import i0e, i1e
 
 import hazenlib.exceptions
 from hazenlib.HazenTask import HazenTask
+from hazenlib.logger import logger
 from hazenlib.data.relaxometry_params import (
+    MAP_CHUNK_SIZE,
+    MAP_SEED_TIMES,
     MAX_RICIAN_NOISE,
     SEED_RICIAN_NOISE,
     TEMPLATE_VALUES,
     SMOOTH_TIMES,
+    TEMPLATE_DIR,
     TEMPLATE_FIT_ITERS,
     TERMINATION_EPS,
 )
@@ -159,8 +168,16 @@ from hazenlib.data.relaxometry_params import (
 class Relaxometry(HazenTask):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-
-    def run(self, calc: str = "T1", plate_number=None, verbose=False):
+        # Preprocessed templates, shared by all relaxometry tasks unless given
+        self.template_cache = kwargs.get("template_cache")
+        if self.template_cache is None:
+            self.template_cache = template_cache
+        # Number of image pyramid levels for template fitting (0: full resolution)
+        self.pyramid_levels = int(kwargs.get("pyramid_levels", 0))
+        # Jacobian of the Rician T2 model: 'analytic' or 'numeric'
+        self.t2_jacobian = kwargs.get("t2_jacobian", "analytic")
+
+    def run(self, calc: str = "T1", plate_number=None, verbose=False, calc_map=False):
         """
         Calculate T1 or T2 values for relaxometry phantom.
 
@@ -193,6 +210,12 @@ class Relaxometry(HazenTask):
                 date=index_im.StudyDate,
                 detailed_output : dict with extensive information
             The default is False.
+        calc_map : bool, optional
+            Calculate a voxel-wise T1 or T2 map within the phantom, and sample
+            the values for each sphere from the map rather than fitting the
+            mean signal in each sphere. The map is included in the report
+            images (and saved as a .npy file) if ``report`` is True. The
+            default is False.
 
         Returns
         -------
@@ -220,8 +243,8 @@ class Relaxometry(HazenTask):
         if calc in ["T1", "t1"]:
             image_stack = T1ImageStack(self.dcm_list)
             try:
-                template_dcm = pydicom.read_file(
-                    TEMPLATE_VALUES[f"plate{plate_number}"][relax_str]["filename"]
+                template = self.template_cache.get(
+                    plate_number, relax_str, image_stack.pixel_stack.shape[1:]
                 )
             except KeyError:
                 print(
@@ -230,10 +253,10 @@ class Relaxometry(HazenTask):
                 )
                 exit()
         elif calc in ["T2", "t2"]:
-            image_stack = T2ImageStack(self.dcm_list)
+            image_stack = T2ImageStack(self.dcm_list, jacobian=self.t2_jacobian)
             try:
-                template_dcm = pydicom.read_file(
-                    TEMPLATE_VALUES[f"plate{plate_number}"][relax_str]["filename"]
+                template = self.template_cache.get(
+                    plate_number, relax_str, image_stack.pixel_stack.shape[1:]
                 )
             except KeyError:
                 print(
@@ -245,7 +268,9 @@ class Relaxometry(HazenTask):
             print("Please provide 'T1' or 'T2' for the --calc argument.")
             exit()
 
-        warp_matrix = image_stack.template_fit(template_dcm)
+        warp_matrix = image_stack.template_fit(
+            template=template, pyramid_levels=self.pyramid_levels
+        )
         image_stack.generate_time_series(
             TEMPLATE_VALUES[f"plate{plate_number}"]["sphere_centres_row_col"],
             warp_matrix=warp_matrix,
@@ -257,9 +282,13 @@ class Relaxometry(HazenTask):
         relax_published = TEMPLATE_VALUES[f"plate{plate_number}"][relax_str][
             "relax_times"
         ][image_stack.b0_str]
-        s0_est = image_stack.initialise_fit_parameters(relax_published)
 
-        image_stack.find_relax_times(relax_published, s0_est)
+        if calc_map:
+            image_stack.generate_relax_map()
+            image_stack.sample_relax_map()
+        else:
+            s0_est = image_stack.initialise_fit_parameters(relax_published)
+            image_stack.find_relax_times(relax_published, s0_est)
         frac_time_diff = (image_stack.relax_times - relax_published) / relax_published
         # last value is for background water. Strip before calculating RMS frac error
         frac_time = frac_time_diff[:-1]
@@ -325,6 +354,17 @@ class Relaxometry(HazenTask):
             relax_fit_fig.savefig(relax_fit_img, dpi=300)
             self.report_files.append(("decay_graphs", relax_fit_img))
 
+            if calc_map:
+                # Show relaxation map and save map values
+                relax_map_fig = image_stack.plot_relax_map(calc.upper())
+                plt.title(f"{calc.upper()} map (plate {plate_number})")
+                relax_map_img = f"{img_path}_relax_map.png"
+                relax_map_fig.savefig(relax_map_img, dpi=300)
+                self.report_files.append(("relax_map", relax_map_img))
+                relax_map_data = f"{img_path}_relax_map.npy"
+                np.save(relax_map_data, image_stack.relax_map)
+                self.report_files.append(("relax_map_data", relax_map_data))
+
         if verbose:
             # Dump additional details about the images and the measurement to a file
             pathlib.Path(self.report_path).mkdir(parents=True, exist_ok=True)
@@ -364,6 +404,11 @@ class Relaxometry(HazenTask):
                     tuple(param[0].tolist()) for param in image_stack.relax_fit
                 ],
                 "fit_equation": image_stack.fit_eqn_str,
+                # time and correlation coefficient at each pyramid level
+                "template_fit": [
+                    dict(level, shape=list(level["shape"]))
+                    for level in image_stack.template_fit_levels
+                ],
             }
             detailed_output["metadata"] = metadata
             json_object = json.dumps(detailed_output, indent=4)
@@ -527,13 +572,457 @@ def pixel_rescale(dcm):
         return pydicom.pixel_data_handlers.util.apply_modality_lut(dcm.pixel_array, dcm)
 
 
+def grid_search_scale(signal, basis):
+    """
+    Choose the best fitting curve from a set, allowing for a scale factor.
+
+    For each row of ``signal``, finds the row of ``basis`` which, multiplied by
+    a scale factor, gives the smallest sum of squared differences. The scale
+    factor is the linear least squares solution, so all rows and all basis
+    curves are compared in one matrix product.
+
+    Parameters
+    ----------
+    signal : array_like
+        Array (n, m) of signal series, one per row.
+    basis : array_like
+        Array (n_basis, m) of candidate curves, one per row.
+
+    Returns
+    -------
+    best_index : np.array
+        Index into ``basis`` of the best fitting curve for each row of
+        ``signal``.
+    scale : np.array
+        Scale factor for the best fitting curve for each row of ``signal``.
+    """
+    basis_norm = np.sum(basis**2, axis=1)
+    projection = signal @ basis.T
+    # sum of squared residuals is |signal|^2 - projection^2 / |basis|^2
+    best_index = np.argmax(projection**2 / basis_norm, axis=1)
+    scale = projection[np.arange(len(signal)), best_index] / basis_norm[best_index]
+    return best_index, scale
+
+
+def roi_offsets(kernel):
+    """
+    Row and column offsets of the pixels in a structuring element.
+
+    Parameters
+    ----------
+    kernel : array
+        Structuring element which defines ROI size and shape, centred on the
+        point of interest. Non-zero elements are included in the ROI.
+
+    Returns
+    -------
+    np.array
+        Array (n,2) of (row, col) offsets from the centre of ``kernel``, in
+        row-major order (the same order as indexing an image with a mask).
+    """
+    return np.argwhere(kernel) - np.array(kernel.shape) // 2
+
+
+def fit_batch_lm(
+    model,
+    y_data,
+    p0,
+    jacobian=None,
+    bounds=(-np.inf, np.inf),
+    ftol=1.49012e-08,
+    xtol=1.49012e-08,
+    max_iter=200,
+):
+    """
+    Fit a model to many data series at once with Levenberg-Marquardt.
+
+    Each row of ``y_data`` is fitted independently, but the residuals,
+    Jacobians and parameter updates for all rows are calculated together with
+    array operations, rather than calling ``scipy.optimize.curve_fit`` once per
+    row. Each row has its own damping parameter and stops updating when it has
+    converged. Parameters are clipped to ``bounds`` after each step.
+
+    Parameters
+    ----------
+    model : function
+        ``model(params)`` returns the modelled values, shape (n, m), for a
+        parameter array of shape (n, k). Any independent variable (e.g. TI or
+        TE) should already be bound to the function, so it is evaluated once
+        per series rather than on every call.
+    y_data : array_like
+        Array (n, m) of data to fit, one series per row.
+    p0 : array_like
+        Array (n, k) of initial parameters for each row.
+    jacobian : function, optional
+        ``jacobian(params)`` returns the partial derivatives of the model,
+        shape (n, m, k). If ``None``, forward differences are used. The
+        default is ``None``.
+    bounds : tuple of array_like, optional
+        Lower and upper bounds on the parameters, each a scalar or an array
+        of length k. The default is no bounds.
+    ftol : float, optional
+        Relative reduction in the sum of squares at which a row has
+        converged. The default matches ``scipy.optimize.leastsq``.
+    xtol : float, optional
+        Relative change in the parameters at which a row has converged. The
+        default matches ``scipy.optimize.leastsq``.
+    max_iter : int, optional
+        Maximum number of iterations. The default is 200.
+
+    Returns
+    -------
+    popt : np.array
+        Array (n, k) of fitted parameters.
+    pcov : np.array
+        Array (n, k, k) of estimated covariance of ``popt`` for each row,
+        calculated as in ``scipy.optimize.curve_fit``.
+    """
+    y_data = np.asarray(y_data, dtype=np.float64)
+    params = np.array(p0, dtype=np.float64)
+    n_series, n_params = params.shape
+    n_samples = y_data.shape[1]
+    lower = np.broadcast_to(np.asarray(bounds[0], dtype=np.float64), n_params)
+    upper = np.broadcast_to(np.asarray(bounds[1], dtype=np.float64), n_params)
+    params = np.clip(params, lower, upper)
+
+    if jacobian is None:
+
+        def jacobian(p):
+            # forward differences, stepping away from the upper bound
+            step = np.sqrt(np.finfo(np.float64).eps) * np.maximum(abs(p), 1.0)
+            step = np.where(p + step > upper, -step, step)
+            f0 = model(p)
+            jac = np.empty(f0.shape + (n_params,))
+            for k in range(n_params):
+                p_step = p.copy()
+                p_step[:, k] += step[:, k]
+                jac[..., k] = (model(p_step) - f0) / step[:, [k]]
+            return jac
+
+    residuals = model(params) - y_data
+    cost = np.sum(residuals**2, axis=1)
+    damping = np.full(n_series, 1e-3)
+    active = np.ones(n_series, dtype=bool)
+
+    for _ in range(max_iter):
+        idx = np.flatnonzero(active)
+        if idx.size == 0:
+            break
+        jac = jacobian(params[idx])
+        jtj = np.einsum("nmi,nmj->nij", jac, jac)
+        gradient = np.einsum("nmi,nm->ni", jac, residuals[idx])
+
+        # Marquardt scaling of the damping term by the diagonal of J^T J
+        diag = np.maximum(np.einsum("nii->ni", jtj), np.finfo(np.float64).tiny)
+        lhs = jtj + damping[idx, None, None] * (diag[:, :, None] * np.eye(n_params))
+        step = -np.linalg.solve(lhs, gradient[..., None])[..., 0]
+
+        # Parameters which would cross a bound are held at the bound and the
+        # step is solved again for the remaining parameters
+        trial = params[idx] + step
+        at_bound = (trial < lower) | (trial > upper)
+        if at_bound.any():
+            bound_step = np.clip(trial, lower, upper) - params[idx]
+            fixed = at_bound[:, :, None]
+            lhs = np.where(fixed, np.eye(n_params), lhs)
+            rhs = np.where(at_bound, bound_step, -gradient)
+            step = np.linalg.solve(lhs, rhs[..., None])[..., 0]
+        new_params = np.clip(params[idx] + step, lower, upper)
+        new_residuals = model(new_params) - y_data[idx]
+        new_cost = np.sum(new_residuals**2, axis=1)
+
+        improved = new_cost < cost[idx]
+        accepted = idx[improved]
+        small_reduction = cost[idx] - new_cost <= ftol * cost[idx]
+        small_step = np.all(
+            abs(new_params - params[idx]) <= xtol * (abs(params[idx]) + xtol),
+            axis=1,
+        )
+
+        params[accepted] = new_params[improved]
+        residuals[accepted] = new_residuals[improved]
+        cost[accepted] = new_cost[improved]
+        damping[idx] = np.where(improved, damping[idx] / 10, damping[idx] * 10)
+
+        converged = (improved & (small_reduction | small_step)) | (damping[idx] > 1e16)
+        active[idx[converged]] = False
+
+    # covariance as calculated by scipy.optimize.curve_fit (absolute_sigma=False)
+    jac = jacobian(params)
+    jtj = np.einsum("nmi,nmj->nij", jac, jac)
+    dof = max(n_samples - n_params, 1)
+    pcov = np.full_like(jtj, np.nan)
+    finite = np.all(np.isfinite(jtj), axis=(1, 2))
+    pcov[finite] = np.linalg.pinv(jtj[finite]) * (cost[finite] / dof)[:, None, None]
+
+    return params, pcov
+
+
+class RelaxometryTemplate:
+    """
+    Template image preprocessed for registration to a target image size.
+
+    Holds the products of the template preprocessing in
+    ``ImageStack.template_fit`` which do not depend on the target image: the
+    8-bit magnitude template (padded to the target size if required), the
+    initial scale matrix for registration and the scaled template.
+
+    Attributes
+    ----------
+    template8bit : np.array
+        Template magnitude image normalised to 8 bits.
+    scaled_template8bit : np.array
+        ``template8bit`` transformed with ``scale_matrix``.
+    scale_matrix : np.array
+        Array (2,3) of the initial transform for registration.
+    """
+
+    def __init__(self, template8bit, scaled_template8bit, scale_matrix):
+        self.template8bit = template8bit
+        self.scaled_template8bit = scaled_template8bit
+        self.scale_matrix = scale_matrix
+
+    @classmethod
+    def from_dicom(cls, template_dcm, target_shape):
+        """
+        Preprocess a template DICOM for registration to a target image size.
+
+        Parameters
+        ----------
+        template_dcm : pydicom.dataset.FileDataset
+            DICOM file containing the template image.
+        target_shape : tuple
+            Shape (rows, cols) of the image the template will be fitted to.
+
+        Returns
+        -------
+        RelaxometryTemplate
+        """
+        # Store template pixel array, after scaling in 0028,1052 and
+        # 0028,1053 applied
+        template_px = pixel_rescale(template_dcm)
+
+        ## Pad template if required
+        # Determine difference in shape
+        pad_size = np.subtract(template_px.shape, target_shape)
+        assert pad_size[0] == pad_size[1], "Image matrices must be square."
+        if pad_size[0] < 0:  # pad template
+            # add pixels to template if smaller than target
+            template_px = np.pad(template_px, pad_width=(0, -pad_size[0]))
+
+        # Always fit on magnitude images for simplicity. May be suboptimal
+        template8bit = cv.normalize(
+            abs(template_px), None, 0, 255, norm_type=cv.NORM_MINMAX, dtype=cv.CV_8U
+        )
+
+        # initialise transformation fitting parameters. The target is padded
+        # to the template size if it is smaller.
+        target_size = max(target_shape[0], len(template_px))
+        scale_factor = target_size / len(template_px)
+        scale_matrix = scale_factor * np.eye(2, 3, dtype=np.float32)
+
+        scaled_template8bit = cv.warpAffine(
+            template8bit,
+            scale_matrix,
+            (template8bit.shape[1], template8bit.shape[0]),
+        )
+
+        return cls(template8bit, scaled_template8bit, scale_matrix)
+
+    def save(self, path, source_stat=None):
+        """
+        Save the preprocessed template to a ``.npz`` file.
+
+        Parameters
+        ----------
+        path : str
+            Path of the file to write.
+        source_stat : tuple, optional
+            (modification time, size) of the template DICOM, stored to
+            detect when the file is out of date. The default is None.
+        """
+        np.savez(
+            path,
+            template8bit=self.template8bit,
+            scaled_template8bit=self.scaled_template8bit,
+            scale_matrix=self.scale_matrix,
+            source_stat=np.array(source_stat if source_stat else (0, 0)),
+        )
+
+    @classmethod
+    def load(cls, path, source_stat=None):
+        """
+        Load a preprocessed template saved with ``save``.
+
+        Parameters
+        ----------
+        path : str
+            Path of the ``.npz`` file.
+        source_stat : tuple, optional
+            (modification time, size) of the template DICOM. If given and
+            different from the value stored in the file, the file is out of
+            date and None is returned. The default is None.
+
+        Returns
+        -------
+        RelaxometryTemplate or None
+        """
+        with np.load(path) as data:
+            if source_stat is not None and tuple(data["source_stat"]) != tuple(
+                source_stat
+            ):
+                return None
+            return cls(
+                data["template8bit"], data["scaled_template8bit"], data["scale_matrix"]
+            )
+
+
+class TemplateCache:
+    """
+    Cache of preprocessed relaxometry templates.
+
+    Templates are decoded and preprocessed once for each plate number,
+    relaxation type (T1 or T2) and target matrix size, and kept in memory for
+    the life of the process. Optionally the preprocessed templates are also
+    stored as ``.npz`` files (by default next to the template DICOMs in
+    ``hazenlib/data/relaxometry``) so that later processes can skip the
+    template decode and preprocessing too.
+    """
+
+    def __init__(self, use_disk=False, cache_dir=TEMPLATE_DIR):
+        """
+        Create empty template cache.
+
+        Parameters
+        ----------
+        use_disk : bool, optional
+            Load and save preprocessed templates as ``.npz`` files. The
+            default is False.
+        cache_dir : str, optional
+            Folder for the ``.npz`` files. The default is the relaxometry
+            template folder.
+        """
+        self.use_disk = use_disk
+        self.cache_dir = cache_dir
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._templates)
+
+    def clear(self):
+        """Remove all templates held in memory."""
+        with self._lock:
+            self._templates.clear()
+
+    def cache_path(self, plate_number, relax_str, target_shape):
+        """Path of the ``.npz`` file for a preprocessed template."""
+        return os.path.join(
+            self.cache_dir,
+            f"plate{plate_number}_{relax_str}_{target_shape[0]}x{target_shape[1]}.npz",
+        )
+
+    def get(self, plate_number, relax_str, target_shape):
+        """
+        Preprocessed template for a plate, relaxation type and image size.
+
+        Parameters
+        ----------
+        plate_number : int
+            Plate number of the HPD relaxometry phantom (either 4 or 5).
+        relax_str : str
+            Relaxation type, 't1' or 't2'.
+        target_shape : tuple
+            Shape (rows, cols) of the image the template will be fitted to.
+
+        Returns
+        -------
+        RelaxometryTemplate
+        """
+        key = (int(plate_number), relax_str.lower(), tuple(target_shape))
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                return template
+
+            filename = TEMPLATE_VALUES[f"plate{key[0]}"][key[1]]["filename"]
+            stat = os.stat(filename)
+            source_stat = (stat.st_mtime_ns, stat.st_size)
+            path = self.cache_path(*key)
+            if self.use_disk and os.path.exists(path):
+                template = RelaxometryTemplate.load(path, source_stat)
+
+            if template is None:
+                template = RelaxometryTemplate.from_dicom(
+                    pydicom.dcmread(filename), key[2]
+                )
+                if self.use_disk:
+                    try:
+                        template.save(path, source_stat)
+                    except OSError as e:
+                        logger.warning(f"Could not save template cache {path}: {e}")
+
+            self._templates[key] = template
+            return template
+
+
+# Preprocessed templates shared by all relaxometry tasks in the process
+template_cache = TemplateCache()
+
+
+def detect_plate(image_stack, relax_str, cache=None, pyramid_levels=2):
+    """
+    Identify the phantom plate imaged in an image stack.
+
+    The template of each plate is fitted to the first image in the stack and
+    the plate with the highest correlation coefficient is returned. A coarse
+    image pyramid is used by default, as the fit only needs to be good enough
+    to tell the plates apart.
+
+    Parameters
+    ----------
+    image_stack : ImageStack
+        ``T1ImageStack`` or ``T2ImageStack`` of a plate of the phantom.
+    relax_str : {'t1', 't2'}
+        Relaxation type, which selects the templates.
+    cache : TemplateCache, optional
+        Store of preprocessed templates. The default is ``template_cache``.
+    pyramid_levels : int, optional
+        Number of image pyramid levels for the template fits. The default is 2.
+
+    Returns
+    -------
+    plate_number : int
+        Plate with the best template fit (4 or 5).
+    correlations : dict
+        Correlation coefficient of the template fit for each plate, or None if
+        the fit failed.
+    """
+    cache = template_cache if cache is None else cache
+    correlations = {}
+    for plate_number in [4, 5]:
+        template = cache.get(plate_number, relax_str, image_stack.pixel_stack.shape[1:])
+        try:
+            image_stack.template_fit(template=template, pyramid_levels=pyramid_levels)
+            correlations[plate_number] = image_stack.template_cc
+        except cv.error as e:
+            logger.debug(f"Template fit for plate {plate_number} failed: {e}")
+            correlations[plate_number] = None
+
+    fitted = {plate: cc for plate, cc in correlations.items() if cc is not None}
+    if not fitted:
+        raise ValueError("Could not fit the template of any plate to the images")
+    return max(fitted, key=fitted.get), correlations
+
+
 class ROITimeSeries:
     """
     Samples at one image location (ROI) at numerous sample times.
 
     Estimating T1 and T2 relaxation parameters at any ROI requires a series
     of pixel values and sequence times (e.g. TI, TE, TR). This class is a
-    wrapper for storing and accessing these parameters.
+    thin view on one row of the ROI data extracted for all ROIs at once by
+    ``ImageStack.generate_time_series``.
 
     Attributes
     ----------
@@ -550,9 +1039,8 @@ class ROITimeSeries:
         as a measure of ROI homogeneity to identify  incorrect sphere location.
 
     times : list of floats
-        If ``time_attr`` was used in the constructor, this list contains the
-        value of ``time_attr``. Typically ``'EchoTime'`` or
-        ``'InversionTime'``.
+        Value of the image stack ``time_attr`` for each image. Typically
+        ``'EchoTime'`` or ``'InversionTime'``.
 
     trs : list of floats
         Values of TR for each image.
@@ -561,52 +1049,52 @@ class ROITimeSeries:
         Mean pixel value of ROI for each image in series.
     """
 
-    def __init__(self, dcm_images, poi_coords_row_col, time_attr):
+    def __init__(self, image_stack, index):
         """
-        Create ROITimeSeries for ROI parameters at sequential scans.
+        Create ROITimeSeries view on the ROI data of an image stack.
 
         Parameters
         ----------
-        dcm_images : list
-            List of pydicom images of same object with different scan
-            parameters (e.g. TIs or TEs). Typically ``ImageStack.images``.
-        poi_coords_row_col : array
-            Two element array with coordinates of point of interest (POI),
-            typically the centre of the ROI, in row_col (y,x) format.
-        time_attr : string, optional
-            If present, lookup the DICOM attribute ``[time_attr]`` (typically
-            ``'InversionTime'`` or ``'EchoTime'``) and store in the list
-            ``self.times``. The default is ``None``, which does not create
-            ``self.times``
-        """
-
-        self.POI_mask = np.zeros(
-            (dcm_images[0].pixel_array.shape[0], dcm_images[0].pixel_array.shape[1]),
-            dtype=np.int8,
-        )
-        self.POI_mask[poi_coords_row_col[0], poi_coords_row_col[1]] = 1
-
-        kernel = skimage.morphology.square(5)
-        """kernel
-            Structuring element which defines ROI size and shape, centred on
-            POI. Each element should be 1 or 0, otherwise calculation of mean
-            will be incorrect. If ``None``, use a 5x5 square. The default is
-            ``None``.
+        image_stack : ImageStack
+            Image stack after ``generate_time_series`` has been called.
+        index : int
+            Index of the ROI in ``image_stack.roi_coords_row_col``.
         """
+        self.image_stack = image_stack
+        self.index = index
+        self.poi_coords_row_col = image_stack.roi_coords_row_col[index]
+        self.times = image_stack.times
+        self.trs = image_stack.trs
 
-        self.ROI_mask = np.zeros_like(self.POI_mask)
-        self.ROI_mask = scipy.ndimage.filters.convolve(self.POI_mask, kernel)
+    def __len__(self):
+        """Number of time samples in series."""
+        return len(self.times)
 
-        self.times = [x[time_attr].value.real for x in dcm_images]
-        self.pixel_values = [
-            pixel_rescale(img)[self.ROI_mask > 0] for img in dcm_images
-        ]
+    @property
+    def POI_mask(self):
+        """Mask of the point of interest, the same size as the image."""
+        poi_mask = np.zeros(self.image_stack.pixel_stack.shape[1:], dtype=np.int8)
+        poi_mask[self.poi_coords_row_col[0], self.poi_coords_row_col[1]] = 1
+        return poi_mask
 
-        self.trs = [x["RepetitionTime"].value.real for x in dcm_images]
+    @property
+    def ROI_mask(self):
+        """Mask of the ROI, the same size as the image."""
+        roi_mask = np.zeros(self.image_stack.pixel_stack.shape[1:], dtype=np.int8)
+        roi_mask.flat[
+            self.image_stack.roi_flat_index[self.index][
+                self.image_stack.roi_in_image[self.index]
+            ]
+        ] = 1
+        return roi_mask
 
-    def __len__(self):
-        """Number of time samples in series."""
-        return len(self.pixel_values)
+    @property
+    def pixel_values(self):
+        """List of arrays of pixel values in ROI, one for each image."""
+        in_image = self.image_stack.roi_in_image[self.index]
+        return [
+            values[in_image] for values in self.image_stack.roi_pixel_values[self.index]
+        ]
 
     @property
     def means(self):
@@ -617,7 +1105,7 @@ class ROITimeSeries:
         -------
         List of mean pixel value in ROI for each sample.
         """
-        return [np.mean(pvs) for pvs in self.pixel_values]
+        return self.image_stack.roi_means[self.index].tolist()
 
 
 class ImageStack:
@@ -668,7 +1156,20 @@ class ImageStack:
         sorted_images = sorted(images, key=lambda x: x[att].value.real)
         return sorted_images
 
-    def template_fit(self, template_dcm, image_index=0):
+    @cached_property
+    def pixel_stack(self):
+        """
+        Rescaled pixel values of all images, as a 3D float array.
+
+        Each image is rescaled once with ``pixel_rescale`` and the results are
+        stacked with shape (n_images, rows, cols) in the order of
+        ``self.images``.
+        """
+        return np.stack([pixel_rescale(img) for img in self.images]).astype(np.float64)
+
+    def template_fit(
+        self, template_dcm=None, image_index=0, template=None, pyramid_levels=0
+    ):
         """
         Calculate transformation matrix to fit template to image.
 
@@ -686,8 +1187,22 @@ class ImageStack:
 
         Parameters
         ----------
+        template_dcm : pydicom.dataset.FileDataset, optional
+            DICOM template object. Not required if ``template`` is given.
         image_index : int, optional
             Index of image to be used for template matching. The default is 0.
+        template : RelaxometryTemplate, optional
+            Template already preprocessed for the image size, e.g. from
+            ``template_cache``. If ``None``, ``template_dcm`` is preprocessed.
+            The default is None.
+        pyramid_levels : int, optional
+            Number of times the template and image are halved in size to
+            make an image pyramid. The transform is first estimated on the
+            smallest images, then refined at each level up to full resolution.
+            This is faster and more robust to large offsets than fitting at
+            full resolution only. The time and correlation coefficient at each
+            level are stored in ``self.template_fit_levels``. The default is 0
+            (full resolution only).
 
         Returns
         -------
@@ -712,51 +1227,69 @@ class ImageStack:
         Despite these limitations, this method works well in practice for small
         angle rotations.
         """
-        # Store template pixel array, after scaling in 0028,1052 and
-        # 0028,1053 applied
-        template_px = pixel_rescale(template_dcm)
-        target_px = pixel_rescale(self.images[0])
+        if template is None:
+            template = RelaxometryTemplate.from_dicom(
+                template_dcm, self.pixel_stack[image_index].shape
+            )
+        self.template8bit = template.template8bit
+        self.scaled_template8bit = template.scaled_template8bit
+        scale_matrix = template.scale_matrix
 
-        ## Pad template or target pixels if required
-        # Determine difference in shape
-        pad_size = np.subtract(template_px.shape, target_px.shape)
-        assert pad_size[0] == pad_size[1], "Image matrices must be square."
+        ## Pad target pixels if required
+        target_px = self.pixel_stack[image_index]
+        pad_size = np.subtract(self.template8bit.shape, target_px.shape)
         if pad_size[0] > 0:  # pad target--UNTESTED
             # add pixels to target if smaller than template
             target_px = np.pad(target_px, pad_width=(0, pad_size[0]))
-        elif pad_size[0] < 0:  # pad template
-            # add pixels to template if smaller than target
-            template_px = np.pad(template_px, pad_width=(0, -pad_size[0]))
 
         # Always fit on magnitude images for simplicity. May be suboptimal
-        self.template8bit = cv.normalize(
-            abs(template_px), None, 0, 255, norm_type=cv.NORM_MINMAX, dtype=cv.CV_8U
-        )
-
         self.target8bit = cv.normalize(
             abs(target_px), None, 0, 255, norm_type=cv.NORM_MINMAX, dtype=cv.CV_8U
         )
 
-        # initialise transformation fitting parameters.
-        scale_factor = len(target_px) / len(template_px)
-        scale_matrix = scale_factor * np.eye(2, 3, dtype=np.float32)
-
-        self.scaled_template8bit = cv.warpAffine(
-            self.template8bit,
-            scale_matrix,
-            (self.template8bit.shape[1], self.template8bit.shape[0]),
-        )
-
         # Apply transformation
-        criteria = (
-            cv.TERM_CRITERIA_EPS | cv.TERM_CRITERIA_COUNT,
-            TEMPLATE_FIT_ITERS,
-            TERMINATION_EPS,
-        )
-        # Find the geometric transform (warp) between two images in terms of the ECC criterion
-        self.template_cc, warp_matrix = cv.findTransformECC(
-            self.template8bit, self.target8bit, scale_matrix, criteria=criteria
-        )
+        # Image pyramids, from full resolution down to the coarsest level
+        templates = [self.template8bit]
+        targets = [self.target8bit]
+        for _ in range(pyramid_levels):
+            templates.append(cv.pyrDown(templates[-1]))
+            targets.append(cv.pyrDown(targets[-1]))
+
+        # Start at the coarsest level, translation scales with the image size
+        warp_matrix = scale_matrix.copy()
+        warp_matrix[:, 2] /= 2**pyramid_levels
+        self.template_fit_levels = []
+        for level in range(pyramid_levels, -1, -1):
+            start = time.perf_counter()
+            # iterations are halved at each finer level, where they cost 4x more
+            criteria = (
+                cv.TERM_CRITERIA_EPS | cv.TERM_CRITERIA_COUNT,
+                max(TEMPLATE_FIT_ITERS // 2 ** (pyramid_levels - level), 1),
+                TERMINATION_EPS,
+            )
+            try:
+                # Find the geometric transform (warp) between two images in terms
+                # of the ECC criterion
+                self.template_cc, warp_matrix = cv.findTransformECC(
+                    templates[level], targets[level], warp_matrix, criteria=criteria
+                )
+            except cv.error as e:
+                if level == 0:
+                    raise
+                # a coarse level may fail to converge, refine at the next level
+                logger.warning(f"Template fit at pyramid level {level} failed: {e}")
+                self.template_cc = None
+            self.template_fit_levels.append(
+                {
+                    "level": level,
+                    "shape": templates[level].shape,
+                    "iterations": criteria[1],
+                    "time": time.perf_counter() - start,
+                    "correlation": self.template_cc,
+                }
+            )
+            if level > 0:
+                warp_matrix[:, 2] *= 2
 
         self.warped_template8bit = cv.warpAffine(
             self.template8bit,
@@ -766,24 +1299,38 @@ class ImageStack:
 
         return warp_matrix
 
-    def generate_time_series(self, coords_row_col, warp_matrix, fit_coords=True):
+    def generate_time_series(
+        self, coords_row_col, warp_matrix, fit_coords=True, kernel=None
+    ):
         """
         Create list of ROITimeSeries objects.
 
+        The pixel values of every ROI in every image are extracted in a single
+        indexing operation on ``self.pixel_stack``, using the flat index of each
+        ROI pixel. The results are stored as arrays for all ROIs:
+            roi_pixel_values : (n_rois, n_images, n_pixels) array
+            roi_in_image : (n_rois, n_pixels) boolean array
+            roi_means : (n_rois, n_images) array
+        and ``self.ROI_time_series`` holds an ``ROITimeSeries`` view of each
+        row.
+
         Parameters
         ----------
         coords_row_col : array_like
             Array of coordinates points of interest (POIs) for each centre of
-            each ROI. They should be in [[col0, row0], [col1, row1], ...]
+            each ROI. They should be in [[row0, col0], [row1, col1], ...]
             format.
-        time_attribute : string, optional
-            DICOM attribute to order images. Typically 'InversionTime' for T1
-            relaxometry or 'EchoTime' for T2.
         warp_matrix : np.array
             RT transform matrix (2,3).
+        fit_coords : bool, optional
+            Transform ``coords_row_col`` with ``warp_matrix``. The default is
+            True.
+        kernel : array, optional
+            Structuring element which defines ROI size and shape, centred on
+            POI. Each element should be 1 or 0, otherwise calculation of mean
+            will be incorrect. If ``None``, use a 5x5 square. The default is
+            ``None``.
         """
-        num_coords = np.size(coords_row_col, axis=0)
-
         # adjustment may not be required for the template DICOM
         if fit_coords:
             adjusted_coords_row_col = transform_coords(
@@ -792,12 +1339,177 @@ class ImageStack:
         else:  # used in testing
             adjusted_coords_row_col = coords_row_col
 
-        self.ROI_time_series = []
-        for i in range(num_coords):
-            self.ROI_time_series.append(
-                ROITimeSeries(self.images, adjusted_coords_row_col[i], self.time_attr)
+        if kernel is None:
+            kernel = skimage.morphology.square(5)
+        self.roi_coords_row_col = np.asarray(adjusted_coords_row_col)
+        self.roi_offsets = roi_offsets(kernel)
+
+        self.times = [x[self.time_attr].value.real for x in self.images]
+        self.trs = [x["RepetitionTime"].value.real for x in self.images]
+
+        # flat index of each pixel in each ROI, shape (n_rois, n_pixels)
+        n_images, rows, cols = self.pixel_stack.shape
+        roi_rows = self.roi_coords_row_col[:, [0]] + self.roi_offsets[:, 0]
+        roi_cols = self.roi_coords_row_col[:, [1]] + self.roi_offsets[:, 1]
+        # ROIs at the edge are clipped to the image, clipped pixels are repeated
+        # edge pixels and are excluded using roi_in_image
+        self.roi_in_image = (
+            (roi_rows >= 0) & (roi_rows < rows) & (roi_cols >= 0) & (roi_cols < cols)
+        )
+        self.roi_flat_index = np.ravel_multi_index(
+            (roi_rows, roi_cols), (rows, cols), mode="clip"
+        )
+
+        # gather all ROIs at all times: (n_images, n_rois, n_pixels)
+        roi_pixels = self.pixel_stack.reshape(n_images, -1)[:, self.roi_flat_index]
+        self.roi_pixel_values = roi_pixels.transpose(1, 0, 2)
+        if np.all(self.roi_in_image):
+            self.roi_means = self.roi_pixel_values.mean(axis=2)
+        else:
+            self.roi_means = self.roi_pixel_values.mean(
+                axis=2, where=self.roi_in_image[:, np.newaxis, :]
             )
 
+        self.ROI_time_series = [
+            ROITimeSeries(self, i) for i in range(len(self.roi_coords_row_col))
+        ]
+
+    def phantom_mask(self):
+        """
+        Mask of the phantom, to restrict relaxation maps to the phantom.
+
+        The maximum magnitude of each pixel over all images is thresholded
+        using Otsu's method, and holes (e.g. dark spheres) are filled.
+
+        Returns
+        -------
+        np.array
+            Boolean array the same size as the image, True inside the phantom.
+        """
+        max_signal = abs(self.pixel_stack).max(axis=0)
+        mask = max_signal > skimage.filters.threshold_otsu(max_signal)
+        return scipy.ndimage.binary_fill_holes(mask)
+
+    def generate_relax_map(self, mask=None, chunk_size=MAP_CHUNK_SIZE):
+        """
+        Calculate voxel-wise relaxation time (T1 or T2) maps.
+
+        The signal model is fitted to every voxel in ``mask`` with
+        ``fit_batch``, a chunk of ``chunk_size`` voxels at a time so memory
+        use does not depend on the image size. Each voxel is seeded with
+        ``initialise_map_parameters``. The fitted parameters are stored in
+        ``self.param_maps``, with shape (n_params, rows, cols) and NaN outside
+        the mask or where the fit failed.
+
+        Parameters
+        ----------
+        mask : array, optional
+            Boolean array the same size as the image, selecting the voxels to
+            fit. If ``None``, use ``self.phantom_mask()``. The default is
+            ``None``.
+        chunk_size : int, optional
+            Number of voxels fitted together. The default is MAP_CHUNK_SIZE.
+
+        Returns
+        -------
+        relax_map : np.array
+            Array the same size as the image of relaxation time (T1 or T2).
+
+        Raises
+        ------
+        ValueError
+            If ``mask`` does not select any voxels.
+        """
+        if mask is None:
+            mask = self.phantom_mask()
+        self.map_mask = mask
+
+        n_images = len(self.images)
+        flat_stack = self.pixel_stack.reshape(n_images, -1)
+        voxel_index = np.flatnonzero(mask)
+        if len(voxel_index) == 0:
+            raise ValueError("The relaxation map mask does not select any voxels")
+
+        param_maps = None
+        for start in range(0, len(voxel_index), chunk_size):
+            chunk_index = voxel_index[start : start + chunk_size]
+            signal = flat_stack[:, chunk_index].T
+            # fits to noise outside the spheres may diverge, these are set to NaN
+            with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+                popt, _ = self.fit_batch(signal, self.initialise_map_parameters(signal))
+            if param_maps is None:
+                param_maps = np.full((popt.shape[1], flat_stack.shape[1]), np.nan)
+            param_maps[:, chunk_index] = np.where(np.isfinite(popt), popt, np.nan).T
+
+        self.param_maps = param_maps.reshape((-1,) + self.pixel_stack.shape[1:])
+        return self.relax_map
+
+    @property
+    def relax_map(self):
+        """Map of relaxation time (T1 or T2) from ``generate_relax_map``."""
+        return self.param_maps[0]
+
+    def sample_relax_map(self):
+        """
+        Set the fit for each ROI from the voxel-wise parameter maps.
+
+        Requires ``generate_time_series`` and ``generate_relax_map``. The
+        fitted parameters for each ROI are the mean of the voxel parameters
+        in the ROI, and the covariance is the covariance of that mean. Access
+        as ``image_stack.relax_times``. ROIs with fewer than two fitted voxels
+        in the image are set to NaN.
+        """
+        n_params = len(self.param_maps)
+        roi_params = self.param_maps.reshape(n_params, -1)[:, self.roi_flat_index]
+        self.relax_fit = []
+        for i, (params, in_image) in enumerate(
+            zip(roi_params.transpose(1, 2, 0), self.roi_in_image)
+        ):
+            params = params[in_image & np.all(np.isfinite(params), axis=1)]
+            if len(params) < 2:
+                logger.warning(
+                    f"ROI {i} has {len(params)} fitted voxels in the relaxation map,"
+                    " its relaxation time is set to NaN"
+                )
+                self.relax_fit.append(
+                    (np.full(n_params, np.nan), np.full((n_params, n_params), np.nan))
+                )
+                continue
+            pcov = np.cov(params, rowvar=False) / len(params)
+            self.relax_fit.append((params.mean(axis=0), pcov))
+
+    def plot_relax_map(self, relax_str):
+        """
+        Plot relaxation map from ``generate_relax_map``, with the ROIs.
+
+        Parameters
+        ----------
+        relax_str : string
+            Label for the colour bar, e.g. 'T1'.
+
+        Returns
+        -------
+            matplotlib figure handle.
+        """
+        fig = plt.figure()
+        finite = self.relax_map[np.isfinite(self.relax_map)]
+        plt.imshow(
+            self.relax_map,
+            cmap="viridis",
+            vmin=0,
+            vmax=np.percentile(finite, 99) if finite.size else None,
+        )
+        plt.colorbar(label=f"{relax_str} (ms)")
+        plt.axis("off")
+        if hasattr(self, "ROI_time_series"):
+            combined_ROI_map = np.zeros_like(self.ROI_time_series[0].ROI_mask)
+            for roi in self.ROI_time_series:
+                combined_ROI_map += roi.ROI_mask
+            for line in outline_mask(combined_ROI_map):
+                plt.plot(line[1], line[0], color="r", alpha=1)
+
+        return fig
+
     def plot_fit(self):
         """
         Visual representation of target fitting.
@@ -960,13 +1672,70 @@ class T1ImageStack(ImageStack):
 
         return t1_function, t1_jacobian, eqn_str
 
+    def generate_t1_batch_function(self, ti, tr, mag_image=False):
+        """
+        Generate vectorised T1 signal function and jacobian for batch fitting.
+
+        The functions evaluate the same expression as ``generate_t1_function``
+        for the parameters of many ROIs at once, for use with
+        ``fit_batch_lm``. TI and the matching TR are fixed when the functions
+        are generated, so TR is looked up once per series rather than on every
+        evaluation.
+
+        Parameters
+        ----------
+        ti : array_like
+            TI of each sample.
+        tr : array_like
+            TR of each sample.
+        mag_image : bool, optional
+            If True, the generated function returns the magnitude of the signal
+            (i.e. negative outputs become positive). The default is False.
+
+        Returns
+        -------
+        t1_batch_function : function
+            Takes an (n, 3) array of (t1, s0, a1) for n ROIs and returns an
+            (n, len(ti)) array of signal.
+
+        t1_batch_jacobian : function
+            Takes an (n, 3) array of (t1, s0, a1) and returns the (n, len(ti), 3)
+            array of partial derivatives.
+        """
+        ti = np.asarray(ti, dtype=np.float64)
+        tr = np.asarray(tr, dtype=np.float64)
+
+        def _t1_terms(params):
+            t1, s0, a1 = params[:, [0]], params[:, [1]], params[:, [2]]
+            exp_ti = np.exp(-ti / t1)
+            exp_tr = np.exp(-tr / t1)
+            s0_der = 1 - a1 * exp_ti + exp_tr
+            return t1, s0, a1, exp_ti, exp_tr, s0_der
+
+        def t1_batch_function(params):
+            *_, s0, _, _, _, s0_der = _t1_terms(params)
+            pv = s0 * s0_der
+            return abs(pv) if mag_image else pv
+
+        def t1_batch_jacobian(params):
+            t1, s0, a1, exp_ti, exp_tr, s0_der = _t1_terms(params)
+            t1_der = s0 / (t1**2) * (-ti * a1 * exp_ti + tr * exp_tr)
+            a1_der = -s0 * exp_ti
+            jacobian = np.stack(np.broadcast_arrays(t1_der, s0_der, a1_der), axis=-1)
+            if mag_image:
+                jacobian = jacobian * np.where(s0 * s0_der < 0, -1, 1)[..., None]
+            return jacobian
+
+        return t1_batch_function, t1_batch_jacobian
+
     def generate_fit_function(self):
         """ "Create T1 fit function for magnitude/signed image and variable TI."""
         #  check if image is signed or magnitude
-        if np.all(pixel_rescale(self.images[0]) >= 0):
+        if np.all(self.pixel_stack[0] >= 0):
             mag_image = True
         else:
             mag_image = False
+        self.mag_image = mag_image
         (
             self.fit_function,
             self.fit_jacobian,
@@ -976,6 +1745,11 @@ class T1ImageStack(ImageStack):
             self.ROI_time_series[0].trs,
             mag_image=mag_image,
         )
+        # TR at each sampled TI is the TR of that image
+        (
+            self.batch_fit_function,
+            self.batch_fit_jacobian,
+        ) = self.generate_t1_batch_function(self.times, self.trs, mag_image=mag_image)
 
     def est_t1_s0(self, ti, tr, t1, pv):
         """
@@ -1059,18 +1833,63 @@ class T1ImageStack(ImageStack):
         None.
 
         """
-        rois = self.ROI_time_series
-        self.relax_fit = [
-            scipy.optimize.curve_fit(
-                self.fit_function,
-                rois[i].times,
-                rois[i].means,
-                p0=[t1_estimates[i], s0_est[i], self.a1_est[i]],
-                jac=self.fit_jacobian,
-                method="lm",
-            )
-            for i in range(len(rois))
-        ]
+        # fit all ROIs at once
+        p0 = np.column_stack([t1_estimates, s0_est, self.a1_est])
+        popt, pcov = self.fit_batch(self.roi_means, p0)
+        self.relax_fit = list(zip(popt, pcov))
+
+    def fit_batch(self, signal, p0):
+        """
+        Fit the T1 signal equation to many signal series at once.
+
+        Requires ``generate_fit_function``.
+
+        Parameters
+        ----------
+        signal : array_like
+            Array (n, n_images) of signal, one series per row, in the order of
+            ``self.images``.
+        p0 : array_like
+            Array (n, 3) of initial (t1, s0, a1) for each series.
+
+        Returns
+        -------
+        popt, pcov
+            Fitted parameters (n, 3) and their covariance (n, 3, 3), see
+            ``fit_batch_lm``.
+        """
+        return fit_batch_lm(
+            self.batch_fit_function, signal, p0, jacobian=self.batch_fit_jacobian
+        )
+
+    def initialise_map_parameters(self, signal):
+        """
+        Estimate fit parameters (t1, s0, a1) for each voxel in a T1 map.
+
+        There are no published values to seed each voxel. Instead the signal
+        equation with a1 = 2.0 is evaluated for each of MAP_SEED_TIMES['t1'],
+        and the T1 (and s0) which best fits the signal is used.
+
+        Parameters
+        ----------
+        signal : array_like
+            Array (n, n_images) of signal, one voxel per row.
+
+        Returns
+        -------
+        np.array
+            Array (n, 3) of initial (t1, s0, a1) for each voxel.
+        """
+        t1_seeds = MAP_SEED_TIMES["t1"][:, None]
+        ti = np.array(self.times)
+        tr = np.array(self.trs)
+        basis = 1 - 2 * np.exp(-ti / t1_seeds) + np.exp(-tr / t1_seeds)
+        if self.mag_image:
+            basis = abs(basis)
+        best_index, s0_est = grid_search_scale(signal, basis)
+        return np.column_stack(
+            [t1_seeds[best_index, 0], s0_est, np.full_like(s0_est, 2.0)]
+        )
 
 
 class T2ImageStack(ImageStack):
@@ -1078,10 +1897,29 @@ class T2ImageStack(ImageStack):
     Calculate T2 relaxometry.
     """
 
-    def __init__(self, image_slices):
+    def __init__(self, image_slices, jacobian="analytic"):
+        """
+        Create T2ImageStack object.
+
+        Parameters
+        ----------
+        image_slices : list of pydicom.FileDataSet objects
+            List of pydicom objects to perform relaxometry analysis on.
+        jacobian : {'analytic', 'numeric'}, optional
+            How the Jacobian of the Rician model is calculated when fitting.
+            'analytic' uses ``fit_jacobian``, which needs one Bessel function
+            evaluation per fit iteration. 'numeric' uses forward differences
+            of ``fit_function``, which needs one evaluation per parameter. The
+            default is 'analytic'.
+        """
         time_attribute = "EchoTime"
         super().__init__(image_slices, time_attribute)
 
+        if jacobian not in ("analytic", "numeric"):
+            raise ValueError(
+                f"jacobian must be 'analytic' or 'numeric', not {jacobian!r}"
+            )
+        self.jacobian = jacobian
         self.fit_eqn_str = "T2 with Rician noise (Raya et al 2010)"
 
     def generate_fit_function(self):
@@ -1126,14 +1964,55 @@ class T2ImageStack(ImageStack):
         """
 
         alpha = (s0 / (2 * c) * np.exp(-te / t2)) ** 2
-        # NB need to use `i0e` and `ive` below to avoid numeric inaccuracy from
-        # multiplying by huge exponentials then dividing by the same exponential
+        # NB need to use `i0e` and `i1e` below to avoid numeric inaccuracy from
+        # multiplying by huge exponentials then dividing by the same exponential.
+        # `ive(1, alpha)` returns nan for alpha > ~2e9 (very high SNR), `i1e` does not
         pv = np.sqrt(np.pi / 2 * c**2) * (
-            (1 + 2 * alpha) * i0e(alpha) + 2 * alpha * ive(1, alpha)
+            (1 + 2 * alpha) * i0e(alpha) + 2 * alpha * i1e(alpha)
         )
 
         return pv
 
+    def fit_jacobian(self, te, t2, s0, c):
+        """
+        Partial derivatives of the Rician model in ``fit_function``.
+
+        Using ``d/dalpha [(1 + 2 alpha) I0e(alpha) + 2 alpha I1e(alpha)] =
+        I0e(alpha) + I1e(alpha)``, the derivatives with respect to all three
+        parameters are calculated from a single evaluation of each Bessel
+        function. The derivative with respect to c reduces to
+        ``sqrt(pi / 2) I0e(alpha)``.
+
+        Parameters
+        ----------
+        te : array_like
+            Echo times.
+        t2 : array_like
+            T2 decay constant.
+        s0 : array_like
+            Initial pixel magnitude.
+        c : array_like
+            Noise parameter for Rician model (equivalent to st dev).
+
+        Returns
+        -------
+        np.array
+            Partial derivatives with respect to (t2, s0, c), in the last axis.
+        """
+        decay = np.exp(-te / t2)
+        alpha = (s0 / (2 * c) * decay) ** 2
+        bessel_0 = i0e(alpha)
+        bessel_1 = i1e(alpha)
+        scale = np.sqrt(np.pi / 2)
+        # derivative of the signal with respect to alpha
+        pv_alpha = scale * c * (bessel_0 + bessel_1)
+
+        t2_der = pv_alpha * 2 * alpha * te / t2**2
+        s0_der = pv_alpha * s0 * decay**2 / (2 * c**2)
+        # (1 + 2 alpha) I0e + 2 alpha I1e - 2 alpha (I0e + I1e) simplifies to I0e
+        c_der = scale * bessel_0
+        return np.stack(np.broadcast_arrays(t2_der, s0_der, c_der), axis=-1)
+
     def est_t2_s0(self, te, t2, pv, c=0.0):
         """
         Initial guess for s0 to seed curve fitting::
@@ -1227,23 +2106,79 @@ class T2ImageStack(ImageStack):
          Magnetic Resonance in Medicine, 63(1), pp.181-193.
         """
 
-        rois = self.ROI_time_series
+        # fit all ROIs at once
+        p0 = np.column_stack([t2_estimates, s0_est, self.c_est])
+        popt, pcov = self.fit_batch(self.roi_means, p0)
+        self.relax_fit = list(zip(popt, pcov))
+
+    def fit_batch(self, signal, p0):
+        """
+        Fit the T2 Rician signal model to many signal series at once.
+
+        The first echo is omitted from the fit (see ``find_relax_times``).
+
+        Parameters
+        ----------
+        signal : array_like
+            Array (n, n_images) of signal, one series per row, in the order of
+            ``self.images``.
+        p0 : array_like
+            Array (n, 3) of initial (t2, s0, c) for each series.
+
+        Returns
+        -------
+        popt, pcov
+            Fitted parameters (n, 3) and their covariance (n, 3, 3), see
+            ``fit_batch_lm``.
+        """
         #  Omit the first image data from the curve fit. This is achieved by
-        #  slicing rois[i].times[1:] and rois[i].means[1:].
-        #  Skipping odd echoes can be implemented with
-        #  rois[i].times[1::2] and .means[1::2]
+        #  slicing the times and signal from index 1.
+        #  Skipping odd echoes can be implemented with [1::2]
+        te = np.array(self.times[1:])
+
+        def t2_batch_function(params):
+            return self.fit_function(te, params[:, [0]], params[:, [1]], params[:, [2]])
+
+        def t2_batch_jacobian(params):
+            return self.fit_jacobian(te, params[:, [0]], params[:, [1]], params[:, [2]])
 
         bounds = ([0, 0, 1], [np.inf, np.inf, MAX_RICIAN_NOISE])
 
-        self.relax_fit = [
-            scipy.optimize.curve_fit(
-                self.fit_function,
-                rois[i].times[1:],
-                rois[i].means[1:],
-                p0=[t2_estimates[i], s0_est[i], self.c_est[i]],
-                jac=None,
-                bounds=bounds,
-                method="trf",
-            )
-            for i in range(len(rois))
-        ]
+        return fit_batch_lm(
+            t2_batch_function,
+            signal[:, 1:],
+            p0,
+            jacobian=t2_batch_jacobian if self.jacobian == "analytic" else None,
+            bounds=bounds,
+        )
+
+    def initialise_map_parameters(self, signal):
+        """
+        Estimate fit parameters (t2, s0, c) for each voxel in a T2 map.
+
+        There are no published values to seed each voxel. Instead an
+        exponential decay is evaluated for each of MAP_SEED_TIMES['t2'] at the
+        fitted echo times, and the T2 (and s0) which best fits the signal is
+        used. C is estimated as SEED_RICIAN_NOISE.
+
+        Parameters
+        ----------
+        signal : array_like
+            Array (n, n_images) of signal, one voxel per row.
+
+        Returns
+        -------
+        np.array
+            Array (n, 3) of initial (t2, s0, c) for each voxel.
+        """
+        t2_seeds = MAP_SEED_TIMES["t2"][:, None]
+        te = np.array(self.times[1:])
+        basis = np.exp(-te / t2_seeds)
+        best_index, s0_est = grid_search_scale(signal[:, 1:], basis)
+        return np.column_stack(
+            [
+                t2_seeds[best_index, 0],
+                np.maximum(s0_est, 0),
+                np.full_like(s0_est, SEED_RICIAN_NOISE),
+            ]
+        )
@@ -0,0 +1,205 @@
+"""
+Relaxometry All
+
+Runs T1 and T2 relaxometry on every plate of the Caliber (HPD) system phantom imaged in a study.
+
+The DICOM files of a study (eg. T1 and T2 acquisitions of plates 4 and 5) are grouped into image sets by relaxation
+type and slice position, the plate in each image set is identified by template matching, and the relaxometry
+measurement is run on every image set in one process. Preprocessed templates and decoded pixel arrays are shared
+by all image sets. The results of all image sets are combined into a single results dictionary.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+
+from hazenlib.HazenTask import HazenTask
+from hazenlib.logger import logger
+from hazenlib.tasks.relaxometry import (
+    Relaxometry,
+    T1ImageStack,
+    T2ImageStack,
+    detect_plate,
+    template_cache,
+)
+
+# DICOM attribute holding the time that varies within a T1 or T2 image set
+TIME_ATTRIBUTES = {"T1": "InversionTime", "T2": "EchoTime"}
+# Fewest distinct times in an image set that can be fitted (three fit parameters)
+MIN_TIMES = 3
+
+
+def relaxation_type(dcm) -> str:
+    """Relaxation type of an image: T1 if an inversion time is set, otherwise T2
+
+    Args:
+        dcm (pydicom.Dataset): DICOM image object
+
+    Returns:
+        str: "T1" or "T2"
+    """
+    return "T1" if dcm.get("InversionTime") else "T2"
+
+
+def slice_position(dcm) -> float:
+    """Position of an image along the normal to its plane, in mm
+
+    Args:
+        dcm (pydicom.Dataset): DICOM image object
+
+    Returns:
+        float: distance of the image plane from the scanner origin, or SliceLocation if the
+        image position and orientation are not available
+    """
+    position = dcm.get("ImagePositionPatient")
+    orientation = dcm.get("ImageOrientationPatient")
+    if position is None or orientation is None:
+        return float(dcm.get("SliceLocation") or 0)
+    orientation = np.asarray(orientation, dtype=float)
+    normal = np.cross(orientation[:3], orientation[3:])
+    return float(np.dot(np.asarray(position, dtype=float), normal))
+
+
+def group_relaxometry_images(dcms: list) -> list:
+    """Group DICOM images into T1 and T2 image sets, one per imaged plate
+
+    Images are split by study, relaxation type, orientation and matrix size, then by slice position: images within
+    half a slice thickness of each other belong to the same image set. Series UIDs are not used, as T1 images are
+    often acquired as one series per inversion time, while T2 images of both plates may share a multi-slice series.
+
+    Args:
+        dcms (list): DICOM image objects, eg. all images of a study
+
+    Returns:
+        list: (relaxation type, list of images) for each image set, ordered by study, relaxation type and slice
+        position
+    """
+    groups = defaultdict(list)
+    for dcm in dcms:
+        orientation = dcm.get("ImageOrientationPatient")
+        if orientation is not None:
+            orientation = tuple(np.round(np.asarray(orientation, dtype=float), 2))
+        key = (
+            str(dcm.get("StudyInstanceUID")),
+            relaxation_type(dcm),
+            orientation,
+            dcm.get("Rows"),
+            dcm.get("Columns"),
+        )
+        groups[key].append(dcm)
+
+    image_sets = []
+    for key in sorted(groups, key=str):
+        images = sorted(groups[key], key=slice_position)
+        positions = [slice_position(dcm) for dcm in images]
+        tolerance = 0.5 * float(images[0].get("SliceThickness") or 1)
+        start = 0
+        for i in range(1, len(images) + 1):
+            if i == len(images) or positions[i] - positions[i - 1] > tolerance:
+                image_sets.append((key[1], images[start:i]))
+                start = i
+    return image_sets
+
+
+class RelaxometryAll(HazenTask):
+    """Runs T1 and T2 relaxometry on every image set of the HPD phantom in a study, sharing the template and
+    pixel caches."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Preprocessed templates, shared by plate detection and all measurements
+        self.template_cache = kwargs.get("template_cache")
+        if self.template_cache is None:
+            self.template_cache = template_cache
+        # keep the input arguments (eg. pyramid_levels, cache) to pass on to each measurement
+        self.task_kwargs = dict(kwargs, template_cache=self.template_cache)
+
+    def run(self, verbose=False, calc_map=False) -> dict:
+        """Main function for performing relaxometry on all image sets in the study.
+
+        Args:
+            verbose (bool, optional): whether to add the additional data of each measurement to the results.
+                Defaults to False.
+            calc_map (bool, optional): whether to sample the relaxation times from voxel-wise maps, see
+                Relaxometry.run. Defaults to False.
+
+        Notes:
+            Image sets with fewer than three distinct times (eg. localisers) are skipped. An image set that fails is
+            reported under "errors" in the results, the remaining image sets are still run.
+
+        Raises:
+            ValueError: if there are no images, or no image set with enough distinct times to be measured.
+
+        Returns:
+            dict: results are returned in a standardised dictionary structure specifying the task name, the input
+            study description and date, the measurement results of each image set (keyed by the series description,
+            series number, instance number, plate and relaxation type of the image set), the error message of each
+            image set that failed and optionally the paths to the generated images for visualisation.
+        """
+        if not self.dcm_list:
+            raise ValueError("No DICOM images to run relaxometry on")
+
+        results = self.init_result_dict()
+        results["file"] = self.img_desc(
+            self.dcm_list[0], properties=["StudyDescription", "StudyDate"]
+        )
+        if verbose:
+            results["additional data"] = {}
+
+        n_measured = 0
+        for calc, dcms in group_relaxometry_images(self.dcm_list):
+            n_times = len({dcm.get(TIME_ATTRIBUTES[calc]) for dcm in dcms})
+            if n_times < MIN_TIMES:
+                logger.warning(
+                    f"Skipping {len(dcms)} {calc} images with {n_times} distinct"
+                    f" {TIME_ATTRIBUTES[calc]} values"
+                )
+                continue
+            n_measured += 1
+            try:
+                if calc == "T1":
+                    image_stack = T1ImageStack(dcms)
+                else:
+                    image_stack = T2ImageStack(dcms)
+                plate_number, correlations = detect_plate(
+                    image_stack, calc.lower(), self.template_cache
+                )
+                logger.info(
+                    f"Found plate {plate_number} in {calc} images"
+                    f" {self.img_desc(dcms[0])} (template correlations: {correlations})"
+                )
+                task = Relaxometry(**dict(self.task_kwargs, input_data=dcms))
+                task_results = task.run(
+                    calc=calc,
+                    plate_number=plate_number,
+                    verbose=verbose,
+                    calc_map=calc_map,
+                )
+                results["measurement"][task_results["file"]] = task_results[
+                    "measurement"
+                ]
+                if verbose:
+                    results["additional data"][task_results["file"]] = task_results[
+                        "additional data"
+                    ]
+                if self.report:
+                    self.report_files.extend(task.report_files)
+            except Exception as e:
+                logger.error(
+                    f"Could not run {calc} relaxometry on {self.img_desc(dcms[0])}"
+                    f" because of: {e}"
+                )
+                image_set = f"{self.img_desc(dcms[0])}_{calc.lower()}"
+                results.setdefault("errors", {})[image_set] = f"{type(e).__name__}: {e}"
+                continue
+
+        if n_measured == 0:
+            raise ValueError(
+                f"No T1 or T2 image set with at least {MIN_TIMES} distinct times found"
+            )
+
+        # only return reports if requested
+        if self.report:
+            results["report_image"] = self.report_files
+
+        return results
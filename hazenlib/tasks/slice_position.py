@@ -3,11 +3,11 @@ Local Otsu thresholding
 http://scikit-image.org/docs/0.11.x/auto_examples/plot_local_otsu.html
 
 """
+
 import os
 import copy
 
 import pydicom
-import cv2 as cv
 import numpy as np
 from skimage import measure, filters
 
@@ -30,6 +30,10 @@ class SlicePosition(HazenTask):
             self.verbose = kwargs["verbose"]
         else:
             self.verbose = False
+        # Whether to track the rods from slice to slice rather than detect them in every slice
+        self.track_rods = kwargs.get("track_rods", True)
+        # Half width, in pixels, of the window searched around the rod positions in the previous slice
+        self.track_window = int(kwargs.get("track_window", 10))
 
     def run(self) -> dict:
         """Main function for performing slice position measurement
@@ -98,8 +102,8 @@ class SlicePosition(HazenTask):
         theta = np.arctan(m)
         return theta
 
-    def get_rods_coords(self, dcm: pydicom.Dataset):
-        """Determine the coordinates of the rods
+    def get_phantom_circle(self, dcm: pydicom.Dataset):
+        """Locate the phantom, assuming the largest circle if several are found
 
         Args:
             dcm (pydicom.Dataset): DICOM image object
@@ -108,34 +112,34 @@ class SlicePosition(HazenTask):
             Exception: hazenlib.exceptions.ShapeError
 
         Returns:
-            tuple of int: corresponding to rod coordinates of the left and right rods
+            tuple of float: x, y coordinates of the centre and radius of the phantom
         """
-        shape_detector = hazenlib.utils.ShapeDetector(arr=dcm.pixel_array)
         try:
-            x, y, r = shape_detector.get_shape("circle")
+            x, y, r = self.phantom_locator.get_shape(dcm, "circle")
 
         except hazenlib.exceptions.MultipleShapesError as e:
             # logger.info(f'Warning: found multiple shapes: {list(shape_detector.shapes.keys())}')
-            shape_detector.find_contours()
-            shape_detector.detect()
-            x, y, r = 0, 0, 0
-            for contour in shape_detector.shapes["circle"]:
-                (new_x, new_y), new_r = cv.minEnclosingCircle(contour)
-                if new_r > r:
-                    # logger.info(f"Found bigger circle: {new_x}, {new_y}, {new_r}")
-                    x, y, r = new_x, new_y, new_r
-                # logger.info(f"Found circle with x={x},y={y},r={r}")
-
-        except hazenlib.exceptions.ShapeError:
-            raise
+            x, y, r = self.phantom_locator.get_largest_circle(dcm)
+
+        return x, y, r
 
+    def threshold_rods(self, arr: np.ndarray, phantom: tuple):
+        """Clip the image to the region where the rods could be and find the Otsu threshold of the rods
+
+        Args:
+            arr (np.ndarray): pixel array
+            phantom (tuple): x, y coordinates of the centre and radius of the phantom
+
+        Returns:
+            tuple: clipped pixel array and threshold below which pixels belong to the rods
+        """
+        x, y, r = phantom
         x, y = int(x), int(y)
 
         # clip image in xy plane to only include regions where rods could be
         x_window = int(r / 4)
         y_window = int(r * 0.95)
 
-        arr = dcm.pixel_array
         clipped = np.zeros_like(arr)
         clipped[y - y_window : y + y_window, x - x_window : x + x_window] = arr[
             y - y_window : y + y_window, x - x_window : x + x_window
@@ -143,6 +147,23 @@ class SlicePosition(HazenTask):
 
         threshold = filters.threshold_otsu(clipped, 2)
 
+        return clipped, threshold
+
+    def get_rods_coords(self, dcm: pydicom.Dataset):
+        """Determine the coordinates of the rods
+
+        Args:
+            dcm (pydicom.Dataset): DICOM image object
+
+        Raises:
+            Exception: hazenlib.exceptions.ShapeError
+
+        Returns:
+            tuple of int: corresponding to rod coordinates of the left and right rods
+        """
+        phantom = self.get_phantom_circle(dcm)
+        clipped, threshold = self.threshold_rods(dcm.pixel_array, phantom)
+
         clipped_thresholded = clipped <= threshold  # binarise using otsu threshold
 
         labels, num = measure.label(clipped_thresholded, return_num=True)
@@ -169,6 +190,64 @@ class SlicePosition(HazenTask):
 
         return lx, ly, rx, ry
 
+    def track_rods_coords(self, dcm: pydicom.Dataset, phantom: tuple, previous: tuple):
+        """Find the rods in small windows around their coordinates in a neighbouring slice
+
+        The image is clipped and thresholded as in get_rods_coords, using the phantom found in an earlier slice.
+        Only the windows around the previous rod coordinates are then labelled, so that neither shape detection nor
+        labelling of the whole image is needed.
+
+        Args:
+            dcm (pydicom.Dataset): DICOM image object
+            phantom (tuple): x, y coordinates of the centre and radius of the phantom
+            previous (tuple): coordinates of the left and right rods in the neighbouring slice
+
+        Raises:
+            Exception: hazenlib.exceptions.RodTrackingError if a single rod is not found entirely within each window
+
+        Returns:
+            tuple of float: corresponding to rod coordinates of the left and right rods
+        """
+        clipped, threshold = self.threshold_rods(dcm.pixel_array, phantom)
+
+        coords = []
+        for x_prev, y_prev in [previous[:2], previous[2:]]:
+            row = max(int(round(y_prev)) - self.track_window, 0)
+            col = max(int(round(x_prev)) - self.track_window, 0)
+            window = (
+                clipped[
+                    row : row + 2 * self.track_window + 1,
+                    col : col + 2 * self.track_window + 1,
+                ]
+                <= threshold
+            )
+
+            labels = measure.label(window)
+            # rods touching the window edge may extend beyond it
+            rods = [
+                obj
+                for obj in measure.regionprops(label_image=labels)
+                if 5 < obj.bbox_area < 25
+                and min(obj.bbox[:2]) > 0
+                and obj.bbox[2] < window.shape[0]
+                and obj.bbox[3] < window.shape[1]
+            ]
+            if len(rods) != 1:
+                raise hazenlib.exceptions.RodTrackingError(
+                    f"Tracked {len(rods)} rods instead of 1."
+                )
+
+            rod_y, rod_x = rods[0].centroid
+            coords.extend([rod_x + col, rod_y + row])
+
+        lx, ly, rx, ry = coords
+        if not lx < rx:
+            raise hazenlib.exceptions.RodTrackingError(
+                "Tracked left and right rods are not in order."
+            )
+
+        return lx, ly, rx, ry
+
     def get_rods(self, data: list):
         """For the whole dataset of 40 DICOMS, record the list of coordinates and
         nominal positions for the left and right rods
@@ -185,11 +264,26 @@ class SlicePosition(HazenTask):
         # TODO: combine this with the function above so rod coords are not recorded again
         left_rod, right_rod = {"x_pos": [], "y_pos": []}, {"x_pos": [], "y_pos": []}
         nominal_positions = []
+        phantom, coords = None, None
         for i, dcm in enumerate(data):
             # print(dcm.SpacingBetweenSlices) # constant
             nominal_positions.append((i + 10) * dcm.SpacingBetweenSlices)
 
-            lx, ly, rx, ry = self.get_rods_coords(dcm)
+            if not self.track_rods:
+                coords = None
+            elif coords is not None:
+                try:
+                    coords = self.track_rods_coords(dcm, phantom, coords)
+                except hazenlib.exceptions.RodTrackingError as e:
+                    logger.debug(
+                        f"Could not track rods in {self.img_desc(dcm)}, detecting them again: {e}"
+                    )
+                    coords = None
+            if coords is None:
+                # reference slice, or tracking failed
+                coords = self.get_rods_coords(dcm)
+                phantom = self.get_phantom_circle(dcm)
+            lx, ly, rx, ry = coords
 
             left_rod["x_pos"].append(lx)
             left_rod["y_pos"].append(ly)
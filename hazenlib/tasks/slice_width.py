@@ -30,6 +30,8 @@ class SliceWidth(HazenTask):
         super().__init__(**kwargs)
         self.single_dcm = self.dcm_list[0]
         self.pixel_size = self.single_dcm.PixelSpacing[0]
+        # "reference" (coordinate descent, as the MATLAB implementation) or "least_squares"
+        self.trapezoid_fit_method = kwargs.get("trapezoid_fit_method", "reference")
 
     def run(self):
         """Main function for performing slice width measurement
@@ -98,15 +100,10 @@ class SliceWidth(HazenTask):
 
         # threshold and binaries the image in order to locate the rods.
         img_max = np.max(arr)  # maximum number of img intensity
-        no_region = [None] * img_max
 
         img_tmp = arr
-        # step over a range of threshold levels from 0 to the max in the image
-        # using the ndimage.label function to count the features for each threshold
-        for x in range(0, img_max):
-            tmp = img_tmp <= x
-            labeled_array, num_features = ndimage.label(tmp.astype(int))
-            no_region[x] = num_features
+        # count the features for each threshold level from 0 to the max in the image
+        no_region = self.count_regions_by_threshold(img_tmp, img_max)
 
         # find the indices that correspond to 10 regions and pick the median
         index = [i for i, val in enumerate(no_region) if val == 10]
@@ -214,6 +211,68 @@ class SliceWidth(HazenTask):
 
         return rods, rods_initial
 
+    def count_regions_by_threshold(self, arr, n_thresholds):
+        """Count the connected regions of pixels at or below each threshold level
+
+        Equivalent to ndimage.label(arr <= x) for x in range(n_thresholds), with the default
+        (4-connected) structure, but computed in a single pass: pixels are added in order of
+        increasing intensity and the regions are tracked with a union-find structure.
+
+        Args:
+            arr (np.ndarray): pixel array
+            n_thresholds (int): number of threshold levels, starting from 0
+
+        Returns:
+            np.ndarray: number of regions for each threshold level
+        """
+        n_rows, n_cols = arr.shape
+        values = arr.ravel()
+        order = np.argsort(values, kind="stable")
+        # threshold level at which each pixel (in intensity order) joins a region
+        levels = np.maximum(values[order], 0).tolist()
+        order = order.tolist()
+
+        parent = list(range(values.size))
+        added = [False] * values.size
+
+        def find_root(pixel):
+            while parent[pixel] != pixel:
+                parent[pixel] = parent[parent[pixel]]  # path halving
+                pixel = parent[pixel]
+            return pixel
+
+        no_region = np.zeros(n_thresholds, dtype=int)
+        n_regions = 0
+        threshold = 0
+        for pixel, level in zip(order, levels):
+            if level >= n_thresholds:
+                break
+            # all pixels below this level have been added
+            no_region[threshold:level] = n_regions
+            threshold = level
+
+            added[pixel] = True
+            n_regions += 1
+            row, col = divmod(pixel, n_cols)
+            neighbours = []
+            if col > 0:
+                neighbours.append(pixel - 1)
+            if col < n_cols - 1:
+                neighbours.append(pixel + 1)
+            if row > 0:
+                neighbours.append(pixel - n_cols)
+            if row < n_rows - 1:
+                neighbours.append(pixel + n_cols)
+            for neighbour in neighbours:
+                if added[neighbour]:
+                    root, neighbour_root = find_root(pixel), find_root(neighbour)
+                    if root != neighbour_root:
+                        parent[neighbour_root] = root
+                        n_regions -= 1
+        no_region[threshold:] = n_regions
+
+        return no_region
+
     def plot_rods(self, ax, arr, rods, rods_initial):  # pragma: no cover
         """Plot rods and curve fit graphs
 
@@ -843,6 +902,141 @@ class SliceWidth(HazenTask):
 
         return trapezoid_fit_coefficients, baseline_fit_coefficients
 
+    def trapezoid_profile(
+        self, n_samples, n_ramp, n_plateau, n_left_baseline, plateau_amplitude
+    ):
+        """Trapezoid with continuous (non-integer) widths and position
+
+        Equal to the trapezoid from trapezoid() for integer parameters. With n_ramp of 1 or
+        less there is no ramp, and the trapezoid is a rectangular plateau as in trapezoid().
+        The parameters can be arrays to evaluate one trapezoid per profile at once.
+
+        Args:
+            n_samples (int): length of the profile
+            n_ramp
+            n_plateau
+            n_left_baseline
+            plateau_amplitude
+
+        Returns:
+            np.ndarray: trapezoid of shape (n_samples,), or (n_profiles, n_samples) for array parameters
+        """
+        x = np.arange(n_samples)
+        n_ramp = np.asarray(n_ramp, dtype=float)[..., None]
+        ramp_width = n_ramp - 1
+        start = np.asarray(n_left_baseline, dtype=float)[..., None]
+        end = start + 2 * ramp_width + np.asarray(n_plateau)[..., None] + 1
+        has_ramp = ramp_width > 0
+        ramp_width = np.where(has_ramp, ramp_width, 1)
+        rising = (x - start) / ramp_width
+        falling = (end - x) / ramp_width
+        shape = np.where(
+            has_ramp,
+            np.clip(np.minimum(rising, falling), 0, 1),
+            (x >= start + n_ramp) & (x <= end),
+        )
+        return np.asarray(plateau_amplitude)[..., None] * shape
+
+    def fit_trapezoids_least_squares(self, profiles_list, slice_thickness):
+        """Fit baseline and trapezoid to several profiles in one bounded least squares problem
+
+        Each profile is modelled as a quadratic baseline plus a trapezoid with continuous
+        widths, position and amplitude, starting from the same initial estimates as
+        fit_trapezoid. The profiles are independent, so the Jacobian is block diagonal.
+
+        Args:
+            profiles_list (list): of dicts from baseline_correction
+            slice_thickness (int)
+
+        Returns:
+            list: of tuples of trapezoid_fit_coefficients and baseline_fit_coefficients, one per profile,
+                in the same format as fit_trapezoid (but not rounded to integers)
+        """
+        n_params = 7
+        n_profiles = len(profiles_list)
+        n_samples = [
+            len(profiles["profile_interpolated"]) for profiles in profiles_list
+        ]
+        x = np.zeros((n_profiles, max(n_samples)))
+        y = np.zeros((n_profiles, max(n_samples)))
+        mask = np.zeros((n_profiles, max(n_samples)))
+        initial_params = []
+        for idx, profiles in enumerate(profiles_list):
+            x[idx, : n_samples[idx]] = profiles["x_interpolated"]
+            y[idx, : n_samples[idx]] = profiles["profile_interpolated"]
+            mask[idx, : n_samples[idx]] = 1
+            _, trapezoid_fit_coefficients = (
+                self.get_initial_trapezoid_fit_and_coefficients(
+                    profiles["profile_corrected_interpolated"], slice_thickness
+                )
+            )
+            n_ramp, n_plateau, n_left_baseline, _, amplitude = (
+                trapezoid_fit_coefficients
+            )
+            # polyfit coefficients, poly1d.c drops leading zeros
+            initial_params.append(
+                list(profiles["f"]) + [n_ramp, n_plateau, n_left_baseline, amplitude]
+            )
+
+        def residuals(params):
+            params = params.reshape(n_profiles, n_params)
+            baseline = params[:, [0]] * x**2 + params[:, [1]] * x + params[:, [2]]
+            trap = self.trapezoid_profile(
+                max(n_samples), params[:, 3], params[:, 4], params[:, 5], params[:, 6]
+            )
+            return ((baseline + trap - y) * mask).ravel()
+
+        # ramp of at least one sample, plateau may shrink to a point
+        lower = [-np.inf, -np.inf, -np.inf, 2, -1, 0, -np.inf] * n_profiles
+        upper = [np.inf, np.inf, np.inf] + [max(n_samples)] * 3 + [np.inf]
+        upper = upper * n_profiles
+        fit = opt.least_squares(
+            residuals,
+            np.clip(np.ravel(initial_params), lower, upper),
+            bounds=(lower, upper),
+            x_scale="jac",
+            jac_sparsity=np.kron(
+                np.eye(n_profiles), np.ones((max(n_samples), n_params))
+            ),
+        )
+
+        fits = []
+        for idx, params in enumerate(fit.x.reshape(n_profiles, n_params)):
+            a, b, c, n_ramp, n_plateau, n_left_baseline, amplitude = params
+            n_right_baseline = n_samples[idx] - n_left_baseline - 2 * n_ramp - n_plateau
+            fits.append(
+                (
+                    [n_ramp, n_plateau, n_left_baseline, n_right_baseline, amplitude],
+                    [a, b, c],
+                )
+            )
+        return fits
+
+    def fit_trapezoids(self, profiles, slice_thickness):
+        """Fit trapezoids to the top and bottom profiles using the selected method
+
+        Args:
+            profiles (dict): of dicts from baseline_correction, eg. for "top" and "bottom"
+            slice_thickness (int)
+
+        Returns:
+            dict: of tuples of trapezoid_fit_coefficients and baseline_fit_coefficients, same keys as profiles
+        """
+        if self.trapezoid_fit_method == "least_squares":
+            fits = self.fit_trapezoids_least_squares(
+                list(profiles.values()), slice_thickness
+            )
+            return dict(zip(profiles.keys(), fits))
+        elif self.trapezoid_fit_method == "reference":
+            return {
+                key: self.fit_trapezoid(profile, slice_thickness)
+                for key, profile in profiles.items()
+            }
+        else:
+            raise ValueError(
+                f"Unknown trapezoid fit method: {self.trapezoid_fit_method}"
+            )
+
     def get_slice_width(self, dcm):
         """Calculates slice width using double wedge image
 
@@ -881,10 +1075,19 @@ class SliceWidth(HazenTask):
             ),
         }
 
-        trapezoid_coefficients, baseline_coefficients = self.fit_trapezoid(
-            ramp_profiles_baseline_corrected["top"], dcm.SliceThickness
+        trapezoid_fits = self.fit_trapezoids(
+            ramp_profiles_baseline_corrected, dcm.SliceThickness
+        )
+        n_samples = len(
+            ramp_profiles_baseline_corrected["top"]["profile_corrected_interpolated"]
+        )
+
+        trapezoid_coefficients, baseline_coefficients = trapezoid_fits["top"]
+        n_ramp, n_plateau, n_left_baseline, _, amplitude = trapezoid_coefficients
+        top_trap = self.trapezoid_profile(
+            n_samples, n_ramp, n_plateau, n_left_baseline, amplitude
         )
-        top_trap, fwhm = self.trapezoid(*trapezoid_coefficients)
+        fwhm = n_ramp + n_plateau
 
         slice_width_mm["top"]["default"] = (
             fwhm * sample_spacing * self.pixel_size * np.tan((11.3 * pi) / 180)
@@ -903,10 +1106,15 @@ class SliceWidth(HazenTask):
             fwhm * sample_spacing * self.pixel_size
         ) / correction_coefficients_mm["top"]
 
-        trapezoid_coefficients, baseline_coefficients = self.fit_trapezoid(
-            ramp_profiles_baseline_corrected["bottom"], dcm.SliceThickness
+        trapezoid_coefficients, baseline_coefficients = trapezoid_fits["bottom"]
+        n_ramp, n_plateau, n_left_baseline, _, amplitude = trapezoid_coefficients
+        n_samples = len(
+            ramp_profiles_baseline_corrected["bottom"]["profile_corrected_interpolated"]
+        )
+        bottom_trap = self.trapezoid_profile(
+            n_samples, n_ramp, n_plateau, n_left_baseline, amplitude
         )
-        bottom_trap, fwhm = self.trapezoid(*trapezoid_coefficients)
+        fwhm = n_ramp + n_plateau
 
         slice_width_mm["bottom"]["default"] = (
             fwhm * sample_spacing * self.pixel_size * np.tan((11.3 * pi) / 180)
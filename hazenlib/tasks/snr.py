@@ -11,9 +11,9 @@ Created by Neil Heraghty
 
 04/05/2018
 """
+
 import os
 import pydicom
-import cv2 as cv
 import numpy as np
 import skimage.filters
 from scipy import ndimage
@@ -164,7 +164,7 @@ class SNR(HazenTask):
         Returns:
             np.array: filtered image pixel values
         """
-        a = dcm.pixel_array.astype("int")
+        a = hazenlib.utils.get_pixel_array(dcm, "int")
 
         # filter size = 9, following MATLAB code and McCann 2013 paper for head coil, although note McCann 2013 recommends 25x25 for body coil.
 
@@ -182,7 +182,7 @@ class SNR(HazenTask):
         Returns:
             np.array: pixel array representing the image noise
         """
-        a = dcm.pixel_array.astype("int")
+        a = hazenlib.utils.get_pixel_array(dcm, "int")
 
         # Convolve image with boxcar/uniform kernel
         imsmoothed = self.filtered_image(dcm)
@@ -203,7 +203,7 @@ class SNR(HazenTask):
                 pixel array representing the image above threshold
                 and a corresponding mask
         """
-        a = dcm.pixel_array.astype("int")
+        a = hazenlib.utils.get_pixel_array(dcm, "int")
 
         # threshold_li: Pixels > this value are assumed foreground
         threshold_value = skimage.filters.threshold_li(a)
@@ -317,7 +317,6 @@ class SNR(HazenTask):
         # Shape Detection
         try:
             logger.debug("Performing phantom shape detection.")
-            shape_detector = hazenlib.utils.ShapeDetector(arr=dcm.pixel_array)
             orientation = hazenlib.utils.get_image_orientation(
                 dcm.ImageOrientationPatient
             )
@@ -325,30 +324,18 @@ class SNR(HazenTask):
             if orientation in ["Sagittal", "Coronal"]:
                 logger.debug("Orientation = sagittal or coronal.")
                 # orientation is sagittal to patient
-                try:
-                    (col, row), size, angle = shape_detector.get_shape("rectangle")
-                except exc.ShapeError as e:
-                    # shape_detector.find_contours()
-                    # shape_detector.detect()
-                    # contour = shape_detector.shapes['rectangle'][1]
-                    # angle, centre, size = cv.minAreaRect(contour)
-                    # print((angle, centre, size))
-                    # im = cv.drawContours(dcm.pixel_array.copy(), [shape_detector.contours[0]], -1, (0, 255, 255), 10)
-                    # plt.imshow(im)
-                    # plt.savefig("rectangles.png")
-                    # print(shape_detector.shapes.keys())
-                    raise e
+                (col, row), size, angle = self.phantom_locator.get_shape(
+                    dcm, "rectangle"
+                )
             elif orientation == "Transverse":
                 logger.debug("Orientation = transverse.")
                 try:
-                    col, row, r = shape_detector.get_shape("circle")
+                    col, row, r = self.phantom_locator.get_shape(dcm, "circle")
                 except exc.MultipleShapesError:
                     logger.info(
                         "Warning! Found multiple circles in image, will assume largest circle is phantom."
                     )
-                    col, row, r = self.get_largest_circle(
-                        shape_detector.shapes["circle"]
-                    )
+                    col, row, r = self.phantom_locator.get_largest_circle(dcm)
             else:
                 raise exc.ShapeError("Unable to identify phantom shape.")
 
@@ -416,23 +403,6 @@ class SNR(HazenTask):
 
         return snr, normalised_snr
 
-    def get_largest_circle(self, circles):
-        """Determine circle with largest radius from list of detected circles
-
-        Args:
-            circles (_type_): _description_
-
-        Returns:
-            tuple: of centre coordinates (col, row) and radius (float)
-        """
-        largest_col, largest_row, largest_r = 0, 0, 0
-        for circle in circles:
-            (col, row), r = cv.minEnclosingCircle(circle)
-            if r > largest_r:
-                largest_col, largest_row, largest_r = col, row, r
-
-        return largest_col, largest_row, largest_r
-
     def snr_by_subtraction(
         self, dcm1: pydicom.Dataset, dcm2: pydicom.Dataset, measured_slice_width=None
     ):
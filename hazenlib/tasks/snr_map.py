@@ -38,6 +38,7 @@ from scipy import ndimage
 from skimage import filters
 import skimage.morphology
 
+import hazenlib.utils
 from hazenlib.HazenTask import HazenTask
 from hazenlib.logger import logger
 
@@ -252,13 +253,10 @@ class SNRMap(HazenTask):
         Returns:
             snr_map
         """
-        #  If you need a faster (less transparent) implementation, see:
-        #  https://nickc1.github.io/python,/matlab/2016/05/17/Standard-Deviation-(Filters)-in-Matlab-and-Python.html
-
-        noise_map = ndimage.filters.generic_filter(
-            noise_image, lambda x: np.std(x, ddof=1), size=self.roi_size
-        )
-        signal_map = ndimage.filters.uniform_filter(original_image, size=self.roi_size)
+        #  Sliding window statistics over roi_size x roi_size pixels,
+        #  sample standard deviation (ddof=1) as in calc_snr
+        noise_map = hazenlib.utils.local_std(noise_image, self.roi_size, ddof=1)
+        signal_map = hazenlib.utils.local_mean(original_image, self.roi_size)
         snr_map = signal_map / noise_map
 
         return snr_map
@@ -11,7 +11,6 @@ Neil Heraghty, neil.heraghty@nhs.net, 16/05/2018
 """
 import os
 import sys
-import copy
 import traceback
 
 import cv2 as cv
@@ -20,6 +19,7 @@ from numpy.fft import fftfreq
 
 import hazenlib.utils
 from hazenlib.HazenTask import HazenTask
+import hazenlib.exceptions as exc
 from hazenlib.logger import logger
 
 
@@ -32,6 +32,9 @@ class SpatialResolution(HazenTask):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.single_dcm = self.dcm_list[0]
+        # Width in pixels (even) of the square edge, void and signal ROIs.
+        # Larger ROIs sample the edge spread function at more distances
+        self.roi_size = int(kwargs.get("roi_size", 20))
 
     def run(self) -> dict:
         """Main function for performing spatial resolution measurement
@@ -59,38 +62,42 @@ class SpatialResolution(HazenTask):
 
         return results
 
-    def get_circles(self, image):
+    def get_circles(self, image, dicom=None):
         """Locate Hough Circles in a DICOM pixel array
 
+        The accumulator threshold is searched from 40 downwards with hazenlib.utils.find_circles, within a fixed
+        number of attempts. The number of attempts made is stored in self.circle_search_attempts. When the DICOM
+        image is given, the search is shared with other tasks through self.phantom_locator.
+
         Args:
             image (array): DICOM pixel array rescaled to byte
+            dicom (pydicom.Dataset, optional): DICOM image object that image was rescaled from. Defaults to None.
 
         Returns:
             np.array: pixel array of the located circle
+
+        Raises:
+            ShapeDetectionError: if no circle is found
         """
-        # TODO: use shape functions from utils
         v = np.median(image)
         upper = int(min(255, (1.0 + 5) * v))
-        i = 40
-
-        while True:
-            circles = cv.HoughCircles(
-                image,
-                cv.HOUGH_GRADIENT,
-                1.2,
-                256,
-                param1=upper,
-                param2=i,
-                minRadius=80,
-                maxRadius=200,
+        # min and max radius need to accomodate at least 256 and 512 matrix sizes
+        params = dict(
+            min_dist=256, min_radius=80, max_radius=200, param1=upper, max_param2=40
+        )
+        if dicom is None:
+            circles, attempts = hazenlib.utils.find_circles(image, **params)
+        else:
+            circles, attempts = self.phantom_locator.find_circles(
+                dicom, image, **params
+            )
+        self.circle_search_attempts = attempts
+        if circles is None:
+            raise exc.ShapeDetectionError(
+                "circle",
+                f"Could not find the phantom circle after {self.circle_search_attempts} attempts",
             )
-            # min and max radius need to accomodate at least 256 and 512 matrix sizes
-            i -= 1
-            if circles is None:
-                pass
-            else:
-                circles = np.uint16(np.around(circles))
-                break
+        circles = np.uint16(np.around(circles))
 
         # img = cv.circle(image, (circles[0][0][0], circles[0][0][1]), circles[0][0][2], (255, 0, 0))
         # plt.imshow(img)
@@ -169,22 +176,24 @@ class SpatialResolution(HazenTask):
         arr = pixels[x - size // 2 : x + size // 2, y - size // 2 : y + size // 2]
         return arr
 
-    def get_void_roi(self, pixels, circle, size=20):
+    def get_void_roi(self, pixels, circle, size=None):
         """Create an 'empty' region of interest - same size filles with 0
 
         Args:
             pixels (np.array): _description_
             centre (tuple): x,y (int) coordinates
-            size (int, optional): diameter of the region of interest. Defaults to 20.
+            size (int, optional): diameter of the region of interest. Defaults to self.roi_size.
 
         Returns:
             np.array: subset of the pixel array
         """
+        size = self.roi_size if size is None else size
         centre_x = circle[0][0][0]
         centre_y = circle[0][0][1]
         return self.get_roi(pixels=pixels, centre=(centre_x, centre_y), size=size)
 
-    def get_edge_roi(self, pixels, edge_centre, size=20):
+    def get_edge_roi(self, pixels, edge_centre, size=None):
+        size = self.roi_size if size is None else size
         return self.get_roi(
             pixels, centre=(edge_centre["x"], edge_centre["y"]), size=size
         )
@@ -208,15 +217,27 @@ class SpatialResolution(HazenTask):
         Returns:
             bool: True or false whether edge is vertical
         """
-        for col in range(edge_roi.shape[0] - 1):
-            if edge_roi[col, 0] == mean:
-                return True
-            if edge_roi[col, 0] < mean < edge_roi[col + 1, 0]:
-                return True
-            if edge_roi[col, 0] > mean > edge_roi[col + 1, 0]:
-                return True
+        return bool(self.edge_crossings(edge_roi[:, 0], mean).any())
 
-        return False
+    @staticmethod
+    def edge_crossings(values, mean):
+        """Find where pixel values cross the mean, along the last axis
+
+        Args:
+            values (np.ndarray): pixel values, 1D or 2D
+            mean (float): value at the edge
+
+        Returns:
+            np.ndarray: bool, one element shorter than values along the last axis, True where a value is equal to the
+            mean or the mean lies strictly between a value and the next
+        """
+        values = np.asarray(values)
+        current, following = values[..., :-1], values[..., 1:]
+        return (
+            (current == mean)
+            | ((current < mean) & (following > mean))
+            | ((current > mean) & (following < mean))
+        )
 
     def get_bisecting_normal(self, vector, centre, length_factor=0.25):
         # calculate coordinates of bisecting normal
@@ -255,7 +276,7 @@ class SpatialResolution(HazenTask):
         }
         return right_edge_profile_vector, right_edge_profile_roi_centre
 
-    def get_signal_roi(self, pixels, edge, edge_centre, circle_r, size=20):
+    def get_signal_roi(self, pixels, edge, edge_centre, circle_r, size=None):
         """Get pixel array from the image within ROI
 
         Args:
@@ -263,11 +284,12 @@ class SpatialResolution(HazenTask):
             edge (_type_): _description_
             edge_centre (_type_): _description_
             circle_r (float/int): circle radius
-            size (int, optional): diameter of the region of interest. Defaults to 20.
+            size (int, optional): diameter of the region of interest. Defaults to self.roi_size.
 
         Returns:
             np.array: subset of the pixel array
         """
+        size = self.roi_size if size is None else size
 
         if edge == "right":
             x = edge_centre["x"] + circle_r // 2
@@ -279,31 +301,27 @@ class SpatialResolution(HazenTask):
         return self.get_roi(pixels=pixels, centre=(x, y), size=size)
 
     def get_edge(self, edge_arr, mean_value, spacing):
-        # TODO: simplify this function
-        if self.edge_is_vertical(edge_arr, mean_value):
-            edge_arr = np.rot90(edge_arr)
+        """Locate the edge in each row of the edge ROI
 
-        x_edge = [0] * 20
-        y_edge = [0] * 20
-
-        for row in range(20):
-            for col in range(19):
-                control_parameter_02 = 0
+        Args:
+            edge_arr (np.ndarray): pixel array of the edge ROI, of any size
+            mean_value (float): value at the edge
+            spacing (tuple/list): spacing value in x and y directions
 
-                if edge_arr[row, col] == mean_value:
-                    control_parameter_02 = 1
-                if (edge_arr[row, col] < mean_value) and (
-                    edge_arr[row, col + 1] > mean_value
-                ):
-                    control_parameter_02 = 1
-                if (edge_arr[row, col] > mean_value) and (
-                    edge_arr[row, col + 1] < mean_value
-                ):
-                    control_parameter_02 = 1
+        Returns:
+            tuple: x and y positions of the last crossing of the mean in each row (0 for rows without a crossing), and
+            the edge ROI rotated so that the edge is horizontal
+        """
+        if self.edge_is_vertical(edge_arr, mean_value):
+            edge_arr = np.rot90(edge_arr)
 
-                if control_parameter_02 == 1:
-                    x_edge[row] = row * spacing[0]
-                    y_edge[row] = col * spacing[1]
+        crossings = self.edge_crossings(edge_arr, mean_value)
+        found = crossings.any(axis=1)
+        # index of the last crossing in each row
+        last_col = crossings.shape[1] - 1 - np.argmax(crossings[:, ::-1], axis=1)
+        rows = np.arange(edge_arr.shape[0])
+        x_edge = np.where(found, rows * spacing[0], 0)
+        y_edge = np.where(found, last_col * spacing[1], 0)
 
         return x_edge, y_edge, edge_arr
 
@@ -331,31 +349,22 @@ class SpatialResolution(HazenTask):
         intercept = mean_y - slope * mean_x
         return angle, intercept
 
-    def get_edge_profile_coords(self, angle, intercept, spacing):
+    def get_edge_profile_coords(self, angle, intercept, spacing, size=None):
         """translate and rotate the data's coordinates according to the slope and intercept
 
         Args:
             angle (ndarray or scalar): angle of slope
             intercept (ndarray or scalar): intercept of slope
             spacing (tuple/list): spacing value in x and y directions
+            size (int, optional): width of the (square) edge ROI in pixels. Defaults to self.roi_size.
 
         Returns:
             tuple: of np.ndarrays of the rotated MTF positions in x and y directions
         """
-
-        original_mtf_x_position = np.array([x * spacing[0] for x in range(20)])
-        original_mtf_x_positions = copy.copy(original_mtf_x_position)
-        for row in range(19):
-            original_mtf_x_positions = np.row_stack(
-                (original_mtf_x_positions, original_mtf_x_position)
-            )
-
-        original_mtf_y_position = np.array([x * spacing[1] for x in range(20)])
-        original_mtf_y_positions = copy.copy(original_mtf_y_position)
-        for row in range(19):
-            original_mtf_y_positions = np.column_stack(
-                (original_mtf_y_positions, original_mtf_y_position)
-            )
+        size = self.roi_size if size is None else size
+        # x varies along the rows and y down the columns of the (size, size) grid
+        original_mtf_x_positions = np.arange(size)[np.newaxis, :] * spacing[0]
+        original_mtf_y_positions = np.arange(size)[:, np.newaxis] * spacing[1]
 
         # we are only interested in the rotated y positions as there correspond to the distance of the data from the edge
         rotated_mtf_y_positions = -original_mtf_x_positions * np.sin(angle) + (
@@ -379,49 +388,68 @@ class SpatialResolution(HazenTask):
             tuple: u and esf - 'normal' and interpolated edge response function (ESF)
         """
 
-        # extract the distance from the edge and the corresponding data as vectors
-
-        edge_distance = copy.copy(y[0, :])
+        # extract the distance from the edge and the corresponding data as vectors:
+        # distances row by row, data column by column
+        edge_distance = np.asarray(y).ravel()
+        esf_data = np.asarray(edge_arr).ravel(order="F")
 
-        for row in range(1, 20):
-            edge_distance = np.append(edge_distance, y[row, :])
+        # sort the distances, replacing data at the same distance by their average
+        distances, inverse = np.unique(edge_distance, return_inverse=True)
+        esf_means = np.bincount(inverse, weights=esf_data) / np.bincount(inverse)
 
-        esf_data = copy.copy(edge_arr[:, 0])
-        for row in range(1, 20):
-            esf_data = np.append(esf_data, edge_arr[:, row])
+        # ;interpolate the edge response function (ESF) so that it only has 128 elements
+        u = np.linspace(distances[0], distances[-1], 128)
+        esf = np.interp(u, distances, esf_means)
 
-        # sort the distances and the data accordingly
-        ind_edge_distance = np.argsort(edge_distance)
-        sorted_edge_distance = edge_distance[ind_edge_distance]
-        sorted_esf_data = esf_data[ind_edge_distance]
+        return u, esf
 
-        # get rid of duplicates (if two data correspond to the same distance) and replace them with their average
-        temp_array01 = np.array([sorted_edge_distance[0]])
-        temp_array02 = np.array([sorted_esf_data[0]])
+    def preprocess(self, dicom) -> dict:
+        """Locate the phantom features shared by the measurements of all edges in an image
 
-        for element in range(1, len(sorted_edge_distance)):
-            if not (sorted_edge_distance[element] - temp_array01[-1]).all():
-                temp_array02[-1] = (temp_array02[-1] + sorted_esf_data[element]) / 2
+        Args:
+            dicom (pydicom.Dataset): DICOM image object
 
-            else:
-                temp_array01 = np.append(temp_array01, sorted_edge_distance[element])
-                temp_array02 = np.append(temp_array02, sorted_esf_data[element])
+        Returns:
+            dict: pixel array ("pixels"), pixel array rescaled to byte ("img") and thresholded ("thresh"), the
+            located circle ("circle"), MTF square and its box ("square", "box") and pixel size ("spacing")
+        """
+        pixels = dicom.pixel_array
+        img = hazenlib.utils.rescale_to_byte(pixels)  # rescale for OpenCV operations
+        thresh = self.thresh_image(img)
+        square, box = self.find_square(thresh)
+        return {
+            "pixels": pixels,
+            "img": img,
+            "thresh": thresh,
+            "circle": self.get_circles(img, dicom),
+            "square": square,
+            "box": box,
+            "spacing": hazenlib.utils.get_pixel_size(dicom),
+        }
 
-        # ;interpolate the edge response function (ESF) so that it only has 128 elements
-        u = np.linspace(temp_array01[0], temp_array01[-1], 128)
-        esf = np.interp(u, temp_array01, temp_array02)
+    def calculate_mtf_for_edge(self, dicom, edge, preprocessed=None):
+        """Measure the spatial resolution from one edge of the MTF square
 
-        return u, esf
+        Args:
+            dicom (pydicom.Dataset): DICOM image object
+            edge (str): "right" or "top" edge of the square
+            preprocessed (dict, optional): output of self.preprocess(dicom), to share between edges.
+                Defaults to None, when the image is preprocessed for this edge only.
 
-    def calculate_mtf_for_edge(self, dicom, edge):
-        pixels = dicom.pixel_array
+        Returns:
+            float: spatial resolution in mm
+        """
+        if preprocessed is None:
+            preprocessed = self.preprocess(dicom)
+        pixels = preprocessed["pixels"]
+        img = preprocessed["img"]
+        thresh = preprocessed["thresh"]
+        circle = preprocessed["circle"]
+        circle_radius = circle[0][0][2]
+        square, box = preprocessed["square"], preprocessed["box"]
+        spacing = preprocessed["spacing"]
         pe = dicom.InPlanePhaseEncodingDirection
 
-        img = hazenlib.utils.rescale_to_byte(pixels)  # rescale for OpenCV operations
-        thresh = self.thresh_image(img)
-        circle = self.get_circles(img)
-        circle_radius = circle[0][0][2]
-        square, box = self.find_square(thresh)
         if edge == "right":
             _, centre = self.get_right_edge_vector_and_centre(square)
         else:
@@ -430,11 +458,12 @@ class SpatialResolution(HazenTask):
         edge_arr = self.get_edge_roi(pixels, centre)
         void_arr = self.get_void_roi(pixels, circle)
         signal_arr = self.get_signal_roi(pixels, edge, centre, circle_radius)
-        spacing = hazenlib.utils.get_pixel_size(dicom)
         mean = np.mean([void_arr, signal_arr])
         x_edge, y_edge, edge_arr = self.get_edge(edge_arr, mean, spacing)
         angle, intercept = self.get_edge_angle_and_intercept(x_edge, y_edge)
-        x, y = self.get_edge_profile_coords(angle, intercept, spacing)
+        x, y = self.get_edge_profile_coords(
+            angle, intercept, spacing, size=edge_arr.shape[0]
+        )
         u, esf = self.get_esf(edge_arr, y)
         # This function calculated the LSF by taking the derivative of the ESF.
         # Reference: https://www.ncbi.nlm.nih.gov/pmc/articles/PMC3643984/
@@ -469,11 +498,15 @@ class SpatialResolution(HazenTask):
             axes[2].set_title("thresholded")
             axes[2].imshow(thresh, cmap="gray")
             axes[3].set_title("finding circle")
+            # draw on a copy, the rescaled image is shared by all edges
             c = cv.circle(
-                img, (circle[0][0][0], circle[0][0][1]), circle[0][0][2], (255, 0, 0)
+                img.copy(),
+                (circle[0][0][0], circle[0][0][1]),
+                circle[0][0][2],
+                (255, 0, 0),
             )
             axes[3].imshow(c)
-            box = cv.drawContours(img, [box], 0, (255, 0, 0), 1)
+            box = cv.drawContours(c.copy(), [box], 0, (255, 0, 0), 1)
             axes[4].set_title("finding MTF square")
             axes[4].imshow(box)
             axes[5].set_title("edge ROI")
@@ -505,14 +538,25 @@ class SpatialResolution(HazenTask):
         return res
 
     def calculate_mtf(self, dicom) -> tuple:
+        """Measure the spatial resolution in the phase and frequency encoding directions
+
+        The image is preprocessed once and the result is shared by the measurements of both edges.
+
+        Args:
+            dicom (pydicom.Dataset): DICOM image object
+
+        Returns:
+            tuple: spatial resolution in mm in the phase and frequency encoding directions
+        """
         pe = dicom.InPlanePhaseEncodingDirection
         pe_result, fe_result = None, None
+        preprocessed = self.preprocess(dicom)
 
         if pe == "COL":
-            pe_result = self.calculate_mtf_for_edge(dicom, "top")
-            fe_result = self.calculate_mtf_for_edge(dicom, "right")
+            pe_result = self.calculate_mtf_for_edge(dicom, "top", preprocessed)
+            fe_result = self.calculate_mtf_for_edge(dicom, "right", preprocessed)
         elif pe == "ROW":
-            pe_result = self.calculate_mtf_for_edge(dicom, "right")
-            fe_result = self.calculate_mtf_for_edge(dicom, "top")
+            pe_result = self.calculate_mtf_for_edge(dicom, "right", preprocessed)
+            fe_result = self.calculate_mtf_for_edge(dicom, "top", preprocessed)
 
         return pe_result, fe_result
@@ -24,7 +24,6 @@ import traceback
 import numpy as np
 
 import hazenlib.utils
-import hazenlib.exceptions as exc
 from hazenlib.HazenTask import HazenTask
 
 
@@ -34,6 +33,9 @@ class Uniformity(HazenTask):
     Inherits from HazenTask class
     """
 
+    # Largest table of counts, in values, that mode builds at once with np.bincount
+    MAX_BINS = 2**22
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         # Set the single DICOM input to be the first in the list
@@ -69,7 +71,13 @@ class Uniformity(HazenTask):
         return results
 
     def mode(self, a, axis=0):
-        """Finds the modal value of an array. From scipy.stats.mode
+        """Finds the modal value of an array, as scipy.stats.mode
+
+        Ties are resolved by returning the smallest of the most frequent values.
+        Integer data are counted with np.bincount, as many lines at once as fit
+        in a table of MAX_BINS counts. Other data, or integers spanning more than
+        MAX_BINS values, are counted one line at a time with np.unique. NaN
+        values are not counted.
 
         Args:
             a (np.array): _description_
@@ -79,21 +87,50 @@ class Uniformity(HazenTask):
             most_frequent: the modal value
             old_counts: the number of times this value was counted (check this)
         """
-        scores = np.unique(np.ravel(a))  # get ALL unique values
+        a = np.asarray(a)
         test_shape = list(a.shape)
         test_shape[axis] = 1
-        old_most_frequent = np.zeros(test_shape)
-        old_counts = np.zeros(test_shape)
-        most_frequent = None
-
-        for score in scores:
-            template = a == score
-            counts = np.expand_dims(np.sum(template, axis), axis)
-            most_frequent = np.where(counts > old_counts, score, old_most_frequent)
-            old_counts = np.maximum(counts, old_counts)
-            old_most_frequent = most_frequent
-
-        return most_frequent, old_counts
+        if a.size == 0:
+            return None, np.zeros(test_shape)
+
+        rows = np.moveaxis(a, axis, -1).reshape(-1, a.shape[axis])
+        n_rows, n = rows.shape
+
+        if (
+            np.issubdtype(rows.dtype, np.integer)
+            and int(np.max(rows)) - int(np.min(rows)) < self.MAX_BINS
+        ):
+            offset = int(np.min(rows))
+            n_values = int(np.max(rows)) - offset + 1
+            most_frequent = np.zeros(n_rows, dtype=np.int64)
+            old_counts = np.zeros(n_rows, dtype=np.int64)
+            # offset the values of each row to count a chunk of rows in one pass
+            chunk_rows = max(self.MAX_BINS // n_values, 1)
+            for start in range(0, n_rows, chunk_rows):
+                codes = rows[start : start + chunk_rows].astype(np.int64) - offset
+                n_chunk = len(codes)
+                codes += n_values * np.arange(n_chunk)[:, np.newaxis]
+                counts = np.bincount(codes.ravel(), minlength=n_values * n_chunk)
+                counts = counts.reshape(n_chunk, n_values)
+                most_frequent[start : start + n_chunk] = np.argmax(counts, axis=1)
+                old_counts[start : start + n_chunk] = np.max(counts, axis=1)
+            most_frequent += offset
+        else:
+            most_frequent = np.zeros(n_rows)
+            old_counts = np.zeros(n_rows)
+            for idx, row in enumerate(rows):
+                if np.issubdtype(row.dtype, np.inexact):
+                    row = row[~np.isnan(row)]
+                values, counts = np.unique(row, return_counts=True)
+                # lines without any counted value keep a mode of zero
+                if len(values):
+                    most_frequent[idx] = values[np.argmax(counts)]
+                    old_counts[idx] = np.max(counts)
+
+        return (
+            most_frequent.astype(float).reshape(test_shape),
+            old_counts.astype(float).reshape(test_shape),
+        )
 
     def get_object_centre(self, dcm):
         """Locate centre coordinates
@@ -107,20 +144,15 @@ class Uniformity(HazenTask):
         Returns:
             tuple: x and y coordinates
         """
-        arr = dcm.pixel_array
-        shape_detector = hazenlib.utils.ShapeDetector(arr=arr)
         orientation = hazenlib.utils.get_image_orientation(dcm.ImageOrientationPatient)
 
         if orientation in ["Sagittal", "Coronal"]:
             # orientation is sagittal to patient
-            try:
-                (x, y), size, angle = shape_detector.get_shape("rectangle")
-            except exc.ShapeError:
-                raise
+            (x, y), size, angle = self.phantom_locator.get_shape(dcm, "rectangle")
 
         elif orientation == "Transverse":
             # orientation is axial
-            x, y, r = shape_detector.get_shape("circle")
+            x, y, r = self.phantom_locator.get_shape(dcm, "circle")
 
         else:
             raise Exception("Direction must be Transverse, Sagittal or Coronal.")
@@ -1,14 +1,21 @@
 import os
+import copy
+import hashlib
+import itertools
+import threading
 import cv2 as cv
 import pydicom
 import imutils
 import matplotlib
 import numpy as np
 
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from scipy import ndimage
 from skimage import filters
 
 import hazenlib.exceptions as exc
+from hazenlib.logger import logger
 
 matplotlib.use("Agg")
 
@@ -23,20 +30,339 @@ def get_dicom_files(folder: str, sort=False) -> list:
     Returns:
         list: full path to DICOM files found within a folder
     """
-    if sort:
-        file_list = [
-            os.path.join(folder, x)
-            for x in os.listdir(folder)
-            if is_dicom_file(os.path.join(folder, x))
+    return [header.path for header in scan_dicom_headers(folder, sort=sort)]
+
+
+class DicomHeader:
+    """Header-only record of a DICOM file
+
+    Holds the file path together with the DICOM header, read without the pixel
+    data, so that sorting, grouping and tasks can reuse it instead of reopening
+    the file. Attribute access is forwarded to the header dataset and the record
+    can be passed anywhere a file path is accepted, eg. pydicom.dcmread.
+    """
+
+    def __init__(self, path: str, dataset: pydicom.Dataset):
+        self.path = path
+        self.dataset = dataset
+
+    def __getattr__(self, name):
+        # only called for attributes not found on the record itself
+        if name.startswith("__") or name in ("path", "dataset"):
+            raise AttributeError(name)
+        return getattr(self.dataset, name)
+
+    def __getitem__(self, key):
+        return self.dataset[key]
+
+    def __contains__(self, key):
+        return key in self.dataset
+
+    def __fspath__(self):
+        return self.path
+
+    def __lt__(self, other):
+        return self.path < os.fspath(other)
+
+    def __repr__(self):
+        return f"DicomHeader({self.path!r})"
+
+    def get(self, key, default=None):
+        return self.dataset.get(key, default)
+
+
+def read_dicom_header(path: str):
+    """Read the header of a DICOM file, skipping the pixel data
+
+    The file is opened once: the DICM preamble is checked (see is_dicom_file)
+    and, if present, the header is parsed from the same file handle.
+
+    Args:
+        path (str): path to file
+
+    Returns:
+        DicomHeader: header record, or None if the file is not a DICOM
+    """
+    with open(path, "rb") as file_stream:
+        file_stream.seek(128)
+        if file_stream.read(4) != b"DICM":
+            return None
+        file_stream.seek(0)
+        try:
+            dataset = pydicom.dcmread(file_stream, stop_before_pixels=True)
+        except pydicom.errors.InvalidDicomError as e:
+            logger.warning(f"Could not read DICOM header of {path}: {e}")
+            return None
+    return DicomHeader(path, dataset)
+
+
+def scan_dicom_headers(
+    folder: str, sort=False, max_workers=None, recursive=False
+) -> list:
+    """Read the headers of all DICOM files in a folder using a thread pool
+
+    Only the headers are read (stop_before_pixels), which keeps the scan cheap
+    on large exports and network storage where file access dominates.
+
+    Args:
+        folder (str): path to folder
+        sort (bool, optional): whether to sort records based on InstanceNumber. Defaults to False.
+        max_workers (int, optional): number of threads to use. Defaults to the
+            concurrent.futures default.
+        recursive (bool, optional): whether to include files in subfolders, eg. for a study
+            exported with one folder per series. Defaults to False.
+
+    Returns:
+        list: DicomHeader records, one per DICOM file found within the folder
+    """
+    if recursive:
+        paths = [
+            os.path.join(root, name)
+            for root, _, names in sorted(os.walk(folder))
+            for name in sorted(names)
         ]
-        file_list.sort(key=lambda x: pydicom.dcmread(x).InstanceNumber)
     else:
-        file_list = [
-            os.path.join(folder, x)
-            for x in os.listdir(folder)
-            if is_dicom_file(os.path.join(folder, x))
+        paths = [entry.path for entry in os.scandir(folder) if entry.is_file()]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        headers = [
+            header
+            for header in executor.map(read_dicom_header, paths)
+            if header is not None
         ]
-    return file_list
+    if sort:
+        headers.sort(key=lambda header: header.InstanceNumber)
+    return headers
+
+
+def group_dicom_headers(headers: list, attribute="SeriesInstanceUID") -> dict:
+    """Group header records by the value of a DICOM attribute
+
+    Args:
+        headers (list): DicomHeader records, eg. from scan_dicom_headers
+        attribute (str, optional): DICOM header field name to group by. Defaults to "SeriesInstanceUID".
+
+    Returns:
+        dict: attribute value as key, list of records as value, in input order
+    """
+    groups = defaultdict(list)
+    for header in headers:
+        groups[header.get(attribute)].append(header)
+    return dict(groups)
+
+
+class PixelCache:
+    """Least recently used store of decoded pixel arrays within a memory budget
+
+    Arrays are stored read-only so that a cached array cannot be altered by the
+    task that requested it. When the budget is exceeded the least recently used
+    arrays are dropped, and are decoded again from file when next requested.
+
+    Tasks share the module level pixel_cache unless one is passed in. Its budget
+    can be changed by setting pixel_cache.max_bytes, and the command line
+    interface clears it at the end of each run.
+    """
+
+    def __init__(self, max_bytes: int = 2**30):
+        """Initialise an empty cache
+
+        Args:
+            max_bytes (int, optional): memory budget in bytes. Defaults to 1 GiB.
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._arrays = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._arrays)
+
+    def __contains__(self, key):
+        return key in self._arrays
+
+    def get(self, key):
+        """Return the array stored under key and mark it as recently used, or None"""
+        with self._lock:
+            array = self._arrays.get(key)
+            if array is not None:
+                self._arrays.move_to_end(key)
+            return array
+
+    def put(self, key, array: np.ndarray) -> np.ndarray:
+        """Store a read-only array under key, evicting old arrays to stay within budget"""
+        array.setflags(write=False)
+        with self._lock:
+            self._pop(key)
+            self._arrays[key] = array
+            self.nbytes += array.nbytes
+            # always keep the newest array, even when it is larger than the budget
+            while self.nbytes > self.max_bytes and len(self._arrays) > 1:
+                self.nbytes -= self._arrays.popitem(last=False)[1].nbytes
+        return array
+
+    def discard(self, key):
+        """Remove all arrays stored for key, including converted copies"""
+        with self._lock:
+            for stored_key in [k for k in self._arrays if k[:2] == key[:2]]:
+                self._pop(stored_key)
+
+    def clear(self):
+        with self._lock:
+            self._arrays.clear()
+            self.nbytes = 0
+
+    def _pop(self, key):
+        array = self._arrays.pop(key, None)
+        if array is not None:
+            self.nbytes -= array.nbytes
+
+
+pixel_cache = PixelCache()
+
+
+class LazyDicom:
+    """Proxy for a DICOM file that reads it only when it is needed
+
+    The header is read (without pixel data) on first attribute access, unless
+    one is provided, eg. from scan_dicom_headers. The pixel data are decoded
+    once into a read-only array held in a PixelCache, so repeated pixel_array
+    access does not decode again. Assigning to an attribute loads the full
+    dataset into memory and applies the change there, as for pydicom.Dataset.
+    """
+
+    _versions = itertools.count(1)
+
+    def __init__(self, path, header: pydicom.Dataset = None, cache: PixelCache = None):
+        """Initialise a proxy for a DICOM file
+
+        Args:
+            path (str): path to DICOM file
+            header (pydicom.Dataset, optional): already read header of the file. Defaults to None.
+            cache (PixelCache, optional): where decoded pixels are kept. Defaults to the shared pixel_cache.
+        """
+        object.__setattr__(self, "_path", os.fspath(path))
+        object.__setattr__(self, "_dataset", header)
+        object.__setattr__(self, "_cache", pixel_cache if cache is None else cache)
+        # the key is unique to this proxy once its dataset has been modified in memory
+        object.__setattr__(self, "_key", (self._path, 0))
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def pixel_key(self) -> tuple:
+        """Key of the pixel data in the cache: the path, and a version once modified in memory"""
+        return self._key
+
+    @property
+    def dataset(self) -> pydicom.Dataset:
+        """DICOM header, or the full dataset once it has been modified"""
+        if self._dataset is None:
+            object.__setattr__(
+                self, "_dataset", pydicom.dcmread(self._path, stop_before_pixels=True)
+            )
+        return self._dataset
+
+    @property
+    def pixel_array(self) -> np.ndarray:
+        return self.get_pixel_array()
+
+    def get_pixel_array(self, dtype=None) -> np.ndarray:
+        """Decoded pixel values, optionally converted to dtype
+
+        Both the decoded array and converted copies are cached, read-only.
+
+        Args:
+            dtype (optional): data type to convert the pixel values to. Defaults to None.
+
+        Returns:
+            np.ndarray: read-only pixel array
+        """
+        key = self._key if dtype is None else self._key + (np.dtype(dtype).str,)
+        array = self._cache.get(key)
+        if array is not None:
+            return array
+        if dtype is not None:
+            return self._cache.put(key, self.get_pixel_array().astype(dtype))
+
+        if self._key[1]:
+            array = self._dataset.pixel_array
+        else:
+            dataset = pydicom.dcmread(self._path)
+            array = dataset.pixel_array
+            if self._dataset is None:
+                # keep the header, which comes for free with the full read
+                del dataset.PixelData
+                object.__setattr__(self, "_dataset", dataset)
+        return self._cache.put(key, array)
+
+    def _load_full(self):
+        """Replace the header by the full dataset, to be modified in memory"""
+        if not self._key[1]:
+            object.__setattr__(self, "_dataset", pydicom.dcmread(self._path))
+            object.__setattr__(self, "_key", (self._path, next(self._versions)))
+
+    def __getattr__(self, name):
+        # only called for attributes not found on the proxy itself
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name == "PixelData":
+            self._load_full()
+        return getattr(self.dataset, name)
+
+    def __setattr__(self, name, value):
+        self._load_full()
+        setattr(self._dataset, name, value)
+        if name == "PixelData":
+            self._cache.discard(self._key)
+            object.__setattr__(self, "_key", (self._path, next(self._versions)))
+
+    def __getitem__(self, key):
+        return self.dataset[key]
+
+    def __contains__(self, key):
+        return key in self.dataset
+
+    def __fspath__(self):
+        return self._path
+
+    def __lt__(self, other):
+        return self._path < os.fspath(other)
+
+    def __deepcopy__(self, memo):
+        copied = LazyDicom(self._path, cache=self._cache)
+        if self._key[1]:
+            object.__setattr__(copied, "_dataset", copy.deepcopy(self._dataset, memo))
+            object.__setattr__(copied, "_key", (self._path, next(self._versions)))
+        else:
+            object.__setattr__(copied, "_dataset", self._dataset)
+        return copied
+
+    def __repr__(self):
+        return f"LazyDicom({self._path!r})"
+
+    def get(self, key, default=None):
+        return self.dataset.get(key, default)
+
+
+def get_pixel_array(dcm, dtype=None) -> np.ndarray:
+    """Get the pixel array of a DICOM image, optionally converted to dtype
+
+    For LazyDicom proxies the decoded and converted arrays are cached and
+    read-only; for other datasets the pixels are converted on every call.
+
+    Args:
+        dcm (pydicom.Dataset or LazyDicom): DICOM image object
+        dtype (optional): data type to convert the pixel values to. Defaults to None.
+
+    Returns:
+        np.ndarray: pixel array
+    """
+    if isinstance(dcm, LazyDicom):
+        return dcm.get_pixel_array(dtype)
+    if dtype is None:
+        return dcm.pixel_array
+    return dcm.pixel_array.astype(dtype)
 
 
 def is_dicom_file(filename):
@@ -348,6 +674,142 @@ def rescale_to_byte(array):
     return image_equalized.reshape(array.shape).astype("uint8")
 
 
+def local_mean(image, size, mode="reflect") -> np.ndarray:
+    """Mean of the pixel values in a square window centred on each pixel
+
+    Args:
+        image (np.ndarray): pixel array
+        size (int): width of the square window, in pixels
+        mode (str, optional): how the image is extended beyond its borders, see scipy.ndimage. Defaults to "reflect".
+
+    Returns:
+        np.ndarray: local mean, same shape as image
+    """
+    return ndimage.uniform_filter(np.asarray(image, dtype=float), size=size, mode=mode)
+
+
+def local_std(image, size, ddof=1, mode="reflect") -> np.ndarray:
+    """Standard deviation of the pixel values in a square window centred on each pixel
+
+    Vectorised equivalent of ndimage.generic_filter(image, lambda x: np.std(x, ddof=ddof), size),
+    from the local means of x and x**2. The image is centred on its global mean first to limit
+    the loss of precision from subtracting the two.
+
+    Args:
+        image (np.ndarray): pixel array
+        size (int): width of the square window, in pixels
+        ddof (int, optional): delta degrees of freedom, as for np.std. Defaults to 1.
+        mode (str, optional): how the image is extended beyond its borders, see scipy.ndimage. Defaults to "reflect".
+
+    Returns:
+        np.ndarray: local standard deviation, same shape as image
+    """
+    image = np.asarray(image, dtype=float)
+    centred = image - image.mean()
+    n_pixels = size**image.ndim
+    variance = local_mean(centred**2, size, mode) - local_mean(centred, size, mode) ** 2
+    # rounding can leave tiny negative values in uniform regions
+    variance = np.clip(variance, 0, None) * n_pixels / (n_pixels - ddof)
+    return np.sqrt(variance)
+
+
+def find_circles(
+    image,
+    min_dist,
+    min_radius,
+    max_radius,
+    param1=100,
+    max_param2=40,
+    min_param2=1,
+    dp=1.2,
+    downsample=2,
+    max_attempts=16,
+):
+    """Find circles with the strictest Hough accumulator threshold that detects any
+
+    Gives the same circles as calling cv.HoughCircles with param2 decreasing from max_param2 until circles are
+    found, with a bounded number of Hough transforms. The image is tried at max_param2 first. If nothing is found,
+    the threshold is bisected on a downsampled image, which is cheaper, and the threshold found there (scaled to
+    full resolution) is the first guess of a bisection on the full resolution image.
+
+    Args:
+        image (np.ndarray): 8-bit pixel array
+        min_dist (float): minimum distance between circle centres, in pixels
+        min_radius (int): minimum circle radius, in pixels
+        max_radius (int): maximum circle radius, in pixels
+        param1 (int, optional): upper threshold of the Canny edge detector. Defaults to 100.
+        max_param2 (int, optional): strictest accumulator threshold to try. Defaults to 40.
+        min_param2 (int, optional): most lenient accumulator threshold to try. Defaults to 1.
+        dp (float, optional): inverse ratio of the accumulator resolution to the image resolution. Defaults to 1.2.
+        downsample (int, optional): factor to downsample the image by for the coarse search, 1 to skip it.
+            Defaults to 2.
+        max_attempts (int, optional): maximum number of Hough transforms, at either resolution. Defaults to 16.
+
+    Returns:
+        tuple: circles as returned by cv.HoughCircles, or None if no circle was found, and the number of Hough
+        transforms performed
+    """
+    attempts = 0
+
+    def hough(img, param2, scale=1):
+        nonlocal attempts
+        attempts += 1
+        return cv.HoughCircles(
+            img,
+            cv.HOUGH_GRADIENT,
+            dp,
+            min_dist / scale,
+            param1=param1,
+            param2=param2,
+            minRadius=int(min_radius / scale),
+            maxRadius=int(max_radius / scale),
+        )
+
+    circles = hough(image, max_param2)
+    if circles is not None:
+        return circles, attempts
+
+    # Coarse search for the largest threshold that finds circles on the downsampled image
+    guess = (min_param2 + max_param2) // 2
+    if downsample > 1:
+        small = cv.resize(
+            image,
+            None,
+            fx=1 / downsample,
+            fy=1 / downsample,
+            interpolation=cv.INTER_AREA,
+        )
+        found, not_found = min_param2 - 1, max_param2 + 1
+        while not_found - found > 1 and attempts < max_attempts // 2:
+            param2 = (found + not_found) // 2
+            if hough(small, param2, downsample) is not None:
+                found = param2
+            else:
+                not_found = param2
+        # thresholds at both resolutions are similar but not proportional: a first guess only
+        guess = int(np.clip(found, min_param2, max_param2 - 1))
+
+    # Full resolution search, bracketed by max_param2 where no circle was found.
+    # Steps away from the guess double until the threshold is bracketed, then bisect
+    circles = None
+    found, not_found = min_param2 - 1, max_param2
+    param2, step = guess, 1
+    while not_found - found > 1 and attempts < max_attempts:
+        detected = hough(image, param2)
+        if detected is not None:
+            found, circles = param2, detected
+            param2 = min(found + step, (found + not_found) // 2)
+        else:
+            not_found = param2
+            param2 = max(not_found - step, (found + not_found) // 2)
+        step *= 2
+
+    logger.debug(
+        f"Circle search: {attempts} Hough transforms, accumulator threshold {found}"
+    )
+    return circles, attempts
+
+
 class Rod:
     """Class for rods detected in the image"""
 
@@ -383,15 +845,28 @@ class ShapeDetector:
     This class is largely adapted from https://www.pyimagesearch.com/2016/02/08/opencv-shape-detection/
     """
 
+    # Contours are found without chain approximation, so consecutive points are at most sqrt(2) pixels apart
+    CHAIN_APPROX = cv.CHAIN_APPROX_NONE
+    MAX_STEP = np.sqrt(2)
+    # Contours with a shorter perimeter are ignored, magic number is complete guess
+    MIN_PERIMETER = 100
+
     def __init__(self, arr):
         self.arr = arr
         self.contours = None
         self.shapes = defaultdict(list)
         self.blurred = None
         self.thresh = None
+        self.detected = False
 
     def find_contours(self):
-        """Find contours in pixel array"""
+        """Find contours in pixel array
+
+        The blurred and thresholded images and the contours are computed on the
+        first call only.
+        """
+        if self.contours is not None:
+            return
         # convert the resized image to grayscale, blur it slightly, and threshold it
         self.blurred = cv.GaussianBlur(self.arr.copy(), (5, 5), 0)  # magic numbers
 
@@ -403,7 +878,7 @@ class ShapeDetector:
         )
 
         # have to convert type for find contours
-        contours = cv.findContours(self.thresh, cv.RETR_TREE, 1)
+        contours = cv.findContours(self.thresh, cv.RETR_TREE, self.CHAIN_APPROX)
         self.contours = imutils.grab_contours(contours)
         # rep = cv.drawContours(self.arr.copy(), [self.contours[0]], -1, color=(0, 255, 0), thickness=5)
         # plt.imshow(rep)
@@ -419,12 +894,21 @@ class ShapeDetector:
             - triangle
             - rectangle
             - pentagon
+
+        Contours are found and classified on the first call only.
         """
+        if self.detected:
+            return
+        self.find_contours()
+
         for c in self.contours:
+            # contours with too few points cannot reach the minimum perimeter
+            if len(c) * self.MAX_STEP < self.MIN_PERIMETER:
+                continue
             # initialize the shape name and approximate the contour
             peri = cv.arcLength(c, True)
-            if peri < 100:
-                # ignore small shapes, magic number is complete guess
+            if peri < self.MIN_PERIMETER:
+                # ignore small shapes
                 continue
             approx = cv.approxPolyDP(c, 0.04 * peri, True)
 
@@ -448,6 +932,8 @@ class ShapeDetector:
             # return the name of the shape
             self.shapes[shape].append(c)
 
+        self.detected = True
+
     def get_shape(self, shape):
         """Identify shapes in pixel array
 
@@ -466,7 +952,7 @@ class ShapeDetector:
         self.find_contours()
         self.detect()
 
-        if shape not in self.shapes.keys():
+        if not self.shapes.get(shape):
             # print(self.shapes.keys())
             raise exc.ShapeDetectionError(shape)
 
@@ -492,3 +978,174 @@ class ShapeDetector:
             size = (size[1], size[0])
             angle = angle - 90
             return (x, y), size, angle
+
+
+class PhantomLocator:
+    """Store of phantom localisation results, shared by the tasks run on an image
+
+    Each result is computed once per image and cached under the identity of its
+    pixel data, together with the method and parameters used to find it: the
+    LazyDicom pixel_key, or otherwise a hash of the PixelData bytes. Images passed
+    to the search are hashed into the key too. Shape detection failures are cached
+    as well, and raised again when the same result is requested. Images without
+    pixel data are not cached. When results for more than max_images images are
+    held, those of the least recently used image are dropped.
+
+    Tasks share the module level phantom_locator unless one is passed in, so that
+    an image analysed by several tasks is only localised once. The command line
+    interface clears it at the end of each run.
+    """
+
+    def __init__(self, max_images: int = 256):
+        """Initialise an empty store
+
+        Args:
+            max_images (int, optional): number of images to keep results for. Defaults to 256.
+        """
+        self.max_images = max_images
+        self._results = OrderedDict()
+        # the shape detector of the last image, to answer requests for other shapes
+        self._detector = (None, None)
+        self._lock = threading.Lock()
+        # number of localisations computed rather than found in the store
+        self.searches = 0
+
+    def __len__(self):
+        return len(self._results)
+
+    def get_shape(self, dcm, shape: str):
+        """Locate the phantom as a single shape, as ShapeDetector.get_shape
+
+        Args:
+            dcm (pydicom.Dataset): DICOM image object
+            shape (str): shape to locate, eg. "circle" or "rectangle"
+
+        Raises:
+            exc.ShapeDetectionError: if the shape is not found
+            exc.MultipleShapesError: if more than one such shape is found
+
+        Returns:
+            tuple: as returned by ShapeDetector.get_shape
+        """
+        return self._get(
+            dcm,
+            "shape",
+            {"shape": shape},
+            lambda: self._shape_detector(dcm).get_shape(shape),
+        )
+
+    def get_largest_circle(self, dcm):
+        """Locate the phantom as the largest of the circles found by ShapeDetector
+
+        Args:
+            dcm (pydicom.Dataset): DICOM image object
+
+        Raises:
+            exc.ShapeDetectionError: if no circle is found
+
+        Returns:
+            tuple: x, y coordinates of the centre and radius of the enclosing circle
+        """
+
+        def largest_circle():
+            circles = self._shape_detector(dcm).shapes.get("circle")
+            if not circles:
+                raise exc.ShapeDetectionError("circle")
+            x, y, r = 0, 0, 0
+            for contour in circles:
+                (new_x, new_y), new_r = cv.minEnclosingCircle(contour)
+                if new_r > r:
+                    x, y, r = new_x, new_y, new_r
+            return x, y, r
+
+        return self._get(dcm, "largest circle", {}, largest_circle)
+
+    def find_circles(self, dcm, image, **kwargs):
+        """Locate the phantom with a Hough circle search, as find_circles
+
+        Args:
+            dcm (pydicom.Dataset): DICOM image object that image was derived from
+            image (np.ndarray): 8-bit image to search
+            **kwargs: parameters passed to find_circles
+
+        Returns:
+            tuple: read-only circles, or None, and the number of Hough transforms run
+        """
+
+        def hough():
+            circles, attempts = find_circles(image, **kwargs)
+            if circles is not None:
+                circles.setflags(write=False)
+            return circles, attempts
+
+        params = dict(kwargs, image=self._digest(np.ascontiguousarray(image)))
+        return self._get(dcm, "hough", params, hough)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self._detector = (None, None)
+
+    @staticmethod
+    def _digest(data) -> bytes:
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def _image_key(self, dcm):
+        """Identity of the pixel data of an image, or None if it has none"""
+        if isinstance(dcm, LazyDicom):
+            return dcm.pixel_key
+        pixel_data = dcm.get("PixelData")
+        if not pixel_data:
+            return None
+        return self._digest(pixel_data)
+
+    def _shape_detector(self, dcm):
+        """ShapeDetector with contours detected, kept for the most recent image only"""
+        image_key = self._image_key(dcm)
+        with self._lock:
+            detector_key, shape_detector = self._detector
+        if image_key is None or image_key != detector_key:
+            shape_detector = ShapeDetector(arr=dcm.pixel_array)
+            shape_detector.detect()
+            if image_key is not None:
+                with self._lock:
+                    self._detector = (image_key, shape_detector)
+        return shape_detector
+
+    def _get(self, dcm, method, params, locate):
+        """Return the cached result of locate for this image, computing it if needed"""
+        image_key = self._image_key(dcm)
+        if image_key is None:
+            return locate()
+
+        key = (method, tuple(sorted(params.items())))
+        with self._lock:
+            results = self._results.get(image_key)
+            if results is not None:
+                self._results.move_to_end(image_key)
+                outcome = results.get(key)
+            else:
+                outcome = None
+
+        if outcome is None:
+            logger.debug(
+                f"Locating phantom by {method} in image {dcm.get('SOPInstanceUID')}"
+            )
+            try:
+                outcome = (locate(), None)
+            except exc.ShapeError as e:
+                outcome = (None, e)
+            with self._lock:
+                self.searches += 1
+                self._results.setdefault(image_key, {})[key] = outcome
+                self._results.move_to_end(image_key)
+                while len(self._results) > self.max_images:
+                    self._results.popitem(last=False)
+
+        result, error = outcome
+        if error is not None:
+            raise error
+        return result
+
+
+phantom_locator = PhantomLocator()
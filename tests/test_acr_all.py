@@ -0,0 +1,43 @@
+import unittest
+import pathlib
+
+from hazenlib.utils import get_dicom_files
+from hazenlib.tasks.acr_all import ACRAll
+from hazenlib.tasks.acr_uniformity import ACRUniformity
+from tests import TEST_DATA_DIR, TEST_REPORT_DIR
+
+
+class TestACRAllSiemens(unittest.TestCase):
+    ACR_DATA = pathlib.Path(TEST_DATA_DIR / "acr" / "Siemens")
+
+    def setUp(self):
+        self.files = get_dicom_files(self.ACR_DATA)
+        self.acr_all_task = ACRAll(
+            input_data=self.files,
+            report_dir=pathlib.PurePath.joinpath(TEST_REPORT_DIR),
+        )
+
+    def test_all_tasks_run(self):
+        results = self.acr_all_task.run()
+        assert list(results["measurement"].keys()) == [
+            task.__name__ for task in ACRAll.acr_tasks
+        ]
+
+    def test_matches_separate_tasks(self):
+        # every task, in the order ACRAll runs them, so that a task changing the shared
+        # ACR object would change the results of the tasks after it
+        results = self.acr_all_task.run()
+        for task_class in ACRAll.acr_tasks:
+            task_results = task_class(input_data=self.files).run()
+            assert (
+                results["measurement"][task_class.__name__]
+                == task_results["measurement"]
+            )
+
+    def test_shared_acr_object(self):
+        task = ACRUniformity(input_data=self.files, acr_obj=self.acr_all_task.ACR_obj)
+        assert task.ACR_obj is self.acr_all_task.ACR_obj
+
+
+class TestACRAllGE(TestACRAllSiemens):
+    ACR_DATA = pathlib.Path(TEST_DATA_DIR / "acr" / "GE")
@@ -2,6 +2,8 @@ import os
 import unittest
 import pathlib
 import pydicom
+import numpy as np
+import skimage.measure
 
 from hazenlib.utils import get_dicom_files
 from hazenlib.tasks.acr_slice_position import ACRSlicePosition
@@ -63,6 +65,36 @@ class TestACRSlicePositionSiemens(unittest.TestCase):
         assert slice_position_val_1 == self.dL[0]
         assert slice_position_val_11 == self.dL[1]
 
+    def test_wedge_profiles(self):
+        img = self.dcm_1.pixel_array
+        mask = self.acr_slice_position_task.ACR_obj.get_mask_image(img)
+        rows, cols = np.arange(20, 60), np.arange(100, 140)
+        profiles = self.acr_slice_position_task.wedge_profiles(img, mask, rows, cols)
+
+        assert profiles.shape == (len(rows), len(cols))
+        for i, row in enumerate(rows):
+            line_prof = skimage.measure.profile_line(
+                img, (row, cols[0]), (row, cols[-1]), mode="constant"
+            )
+            assert (profiles[i] == mask[row, cols] * line_prof).all()
+
+    def test_lag_errors(self):
+        rng = np.random.default_rng(0)
+        lag = np.linspace(-50, 50, 101, dtype=int)
+        for n in [10, 50, 120]:
+            line_L, line_R = rng.normal(size=n), rng.normal(size=n)
+            err = self.acr_slice_position_task.lag_errors(line_L, line_R, lag)
+            for k, lag_val in enumerate(lag):
+                difference = line_R - np.roll(line_L, lag_val)
+                if lag_val > 0:
+                    difference[:lag_val] = np.nan
+                else:
+                    difference[lag_val:] = np.nan
+                if np.isnan(difference).all():
+                    assert err[k] == 1e10
+                else:
+                    assert err[k] == np.nanmean(difference)
+
 
 class TestACRSlicePositionGE(TestACRSlicePositionSiemens):
     x_pts = [(246, 257), (246, 257)]
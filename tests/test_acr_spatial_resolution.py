@@ -59,6 +59,32 @@ class TestACRSpatialResolutionSiemens(unittest.TestCase):
         )[0]
         assert np.round(slope, 3) == self.slope
 
+    def test_bin_erf(self):
+        rng = np.random.default_rng(0)
+        image = rng.integers(0, 5, (20, 160))
+        coords = rng.normal(0, 30, image.shape)
+        erf, n_inside_roi = self.acr_spatial_resolution_task.bin_erf(image, coords)
+
+        k_range = range(np.min(coords).astype(int), np.max(coords).astype(int))
+        assert len(erf) == len(n_inside_roi) == len(k_range)
+        for i, k in enumerate(k_range):
+            in_bin = image[(coords >= k) & (coords < k + 1)]
+            assert n_inside_roi[i] == np.count_nonzero(in_bin)
+            if in_bin.size:
+                assert np.isclose(erf[i], np.mean(in_bin))
+            else:
+                assert np.isnan(erf[i])
+
+    def test_resamp_factor(self):
+        task = ACRSpatialResolution(
+            input_data=[self.dcm.filename],
+            acr_obj=self.acr_spatial_resolution_task.ACR_obj,
+            resamp_factor=16,
+        )
+        assert task.resamp_factor == 16
+        mtf50 = task.get_mtf50(self.dcm)
+        assert np.allclose(mtf50, self.MTF50, atol=0.05)
+
     def test_get_MTF50(self):
         mtf50 = self.acr_spatial_resolution_task.get_mtf50(self.dcm)
         rounded_mtf50 = (np.round(mtf50[0], 2), np.round(mtf50[1], 2))
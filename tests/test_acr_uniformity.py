@@ -2,6 +2,7 @@ import os
 import unittest
 import pathlib
 import pydicom
+import numpy as np
 
 from hazenlib.utils import get_dicom_files
 from hazenlib.tasks.acr_uniformity import ACRUniformity
@@ -33,6 +34,33 @@ class TestACRUniformitySiemens(unittest.TestCase):
 
         assert rounded_results == self.piu
 
+    def test_mean_map(self):
+        piu = self.acr_uniformity_task.get_integral_uniformity(
+            self.acr_uniformity_task.ACR_obj.slice7_dcm
+        )
+        mean_map = self.acr_uniformity_task.mean_map
+        sig_max, sig_min = np.max(mean_map), np.min(mean_map[np.nonzero(mean_map)])
+        assert piu == 100 * (1 - (sig_max - sig_min) / (sig_max + sig_min))
+
+    def test_local_mean_map(self):
+        rng = np.random.default_rng(0)
+        image = rng.integers(1, 100, (30, 40))
+        image[:5] = 0
+        kernel = ACRObject.circular_mask((3, 3), 2, (5, 5))
+        anchor = (2, 1)
+        mean_map = self.acr_uniformity_task.local_mean_map(image, kernel, anchor)
+
+        rows, cols = np.nonzero(kernel)
+        for row in range(image.shape[0]):
+            for col in range(image.shape[1]):
+                r, c = rows + row - anchor[0], cols + col - anchor[1]
+                inside = (r >= 0) & (r < 30) & (c >= 0) & (c < 40)
+                values = image[r[inside], c[inside]]
+                if np.count_nonzero(values) < len(rows):
+                    assert mean_map[row, col] == 0
+                else:
+                    assert mean_map[row, col] == np.mean(values)
+
 
 # TODO: Add unit tests for Philips datasets.
 
@@ -74,6 +74,20 @@ class TestGhosting(unittest.TestCase):
             lower_row,
         ) == self.SIGNAL_BOUNDING_BOX
 
+    def test_get_signal_mask(self):
+        signal_mask = self.ghosting.get_signal_mask(self.dcm.pixel_array)
+        assert signal_mask.shape == self.dcm.pixel_array.shape
+        rows, columns = np.nonzero(signal_mask)
+        assert (
+            columns.min(),
+            columns.max(),
+            rows.min(),
+            rows.max(),
+        ) == self.SIGNAL_BOUNDING_BOX
+        # the bounding box keeps the mask it was derived from
+        self.ghosting.get_signal_bounding_box(self.dcm.pixel_array)
+        assert (self.ghosting.signal_mask == signal_mask).all()
+
     def test_get_signal_slice(self):
         assert list(
             self.ghosting.get_signal_slice(self.SIGNAL_BOUNDING_BOX)[0]
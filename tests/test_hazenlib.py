@@ -1,4 +1,6 @@
+import os
 import sys
+import tempfile
 from tests import TEST_DATA_DIR, TEST_REPORT_DIR
 import unittest
 import pydicom
@@ -35,6 +37,45 @@ class TestCliParser(unittest.TestCase):
 
         self.assertEqual(logging.root.level, logging.INFO)
 
+    def test_single_image_tasks_jobs(self):
+        path = str(TEST_DATA_DIR / "ghosting" / "GHOSTING")
+        files = get_dicom_files(path)
+        files.append(str(TEST_DATA_DIR / "tools" / "dicom_no.jfif"))
+
+        serial = list(hazenlib.run_single_image_tasks("ghosting", files, False, None))
+        parallel = list(
+            hazenlib.run_single_image_tasks("ghosting", files, False, None, jobs=2)
+        )
+
+        self.assertEqual(serial, parallel)
+        self.assertEqual(len(parallel), len(files))
+        # the non-DICOM file fails without aborting the batch
+        self.assertEqual(parallel[-1]["file"], "dicom_no.jfif")
+        self.assertIn("error", parallel[-1])
+        for result in parallel[:-1]:
+            self.assertIn("measurement", result)
+
+    def test_failed_batch_exit_status(self):
+        # slice width cannot be set up for an image without a pixel size
+        dcm = pydicom.read_file(
+            get_dicom_files(str(TEST_DATA_DIR / "slicewidth" / "512_matrix"))[0]
+        )
+        del dcm.PixelSpacing
+        with tempfile.TemporaryDirectory() as folder:
+            dcm.save_as(os.path.join(folder, "no_pixel_spacing.dcm"))
+            sys.argv = ["hazen", "slice_width", folder]
+            with self.assertRaises(SystemExit) as context:
+                hazenlib.main()
+        self.assertEqual(context.exception.code, 1)
+
+    def test_jobs_validated(self):
+        path = str(TEST_DATA_DIR / "ghosting" / "GHOSTING")
+        for jobs in ["0", "two"]:
+            sys.argv = ["hazen", "ghosting", path, f"--jobs={jobs}"]
+            with self.assertRaises(SystemExit) as context:
+                hazenlib.main()
+            self.assertIn("--jobs", str(context.exception.code))
+
     def test_snr_measured_slice_width(self):
         path = str(TEST_DATA_DIR / "snr" / "GE")
         files = get_dicom_files(path)
@@ -4,15 +4,21 @@ Created on Tue Aug 11 10:52:40 2020
 
 @author: Paul Wilson
 """
+
 import unittest
 import pydicom
 import numpy as np
+import scipy.optimize
 import os
 import os.path
+import tempfile
 from pydicom.errors import InvalidDicomError
 
 from hazenlib.tasks.relaxometry import (
     transform_coords,
+    pixel_rescale,
+    fit_batch_lm,
+    TemplateCache,
     T1ImageStack,
     T2ImageStack,
     Relaxometry,
@@ -849,6 +855,62 @@ class TestRelaxometry(unittest.TestCase):
             transformed_coordinates_xy, self.TEMPLATE_TARGET_COORDS_COL_ROW, atol=1
         )
 
+    def test_template_cache(self):
+        target_dcm = pydicom.dcmread(self.PATH_256_MATRIX)
+        t1_image_stack = T1ImageStack([target_dcm])
+        warp_matrix = t1_image_stack.template_fit(
+            pydicom.read_file(TEMPLATE_VALUES["plate4"]["t1"]["filename"])
+        )
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = TemplateCache(use_disk=True, cache_dir=cache_dir)
+            template = cache.get(4, "t1", (256, 256))
+            # preprocessed once for each plate, relaxation type and matrix size
+            assert cache.get(4, "T1", (256, 256)) is template
+            assert len(cache) == 1
+            assert os.path.exists(cache.cache_path(4, "t1", (256, 256)))
+
+            # template loaded from disk matches
+            cache.clear()
+            disk_template = cache.get(4, "t1", (256, 256))
+            assert disk_template is not template
+            np.testing.assert_equal(disk_template.template8bit, template.template8bit)
+            np.testing.assert_equal(
+                disk_template.scaled_template8bit, template.scaled_template8bit
+            )
+
+        # fit with cached template matches fit with template DICOM
+        cached_warp_matrix = t1_image_stack.template_fit(template=template)
+        np.testing.assert_allclose(cached_warp_matrix, warp_matrix)
+
+    def test_template_fit_pyramid(self):
+        template_dcm = pydicom.read_file(self.TEMPLATE_PATH_T1_P5)
+        target_dcm = pydicom.dcmread(self.TEMPLATE_TARGET_PATH_T1_P5)
+        t1_image_stack = T1ImageStack([target_dcm])
+        warp_matrix = t1_image_stack.template_fit(template_dcm, pyramid_levels=3)
+
+        transformed_coordinates_xy = transform_coords(
+            self.TEMPLATE_TEST_COORDS_ROW_COL,
+            warp_matrix,
+            input_row_col=True,
+            output_row_col=False,
+        )
+        np.testing.assert_allclose(
+            transformed_coordinates_xy, self.TEMPLATE_TARGET_COORDS_COL_ROW, atol=1
+        )
+
+        # diagnostics for each level, from coarsest to full resolution
+        levels = t1_image_stack.template_fit_levels
+        assert [level["level"] for level in levels] == [3, 2, 1, 0]
+        assert [level["shape"] for level in levels] == [
+            (24, 24),
+            (48, 48),
+            (96, 96),
+            (192, 192),
+        ]
+        assert levels[-1]["correlation"] == t1_image_stack.template_cc
+        assert all(level["time"] >= 0 for level in levels)
+
     def test_image_stack_T1_sort(self):
         # read list of un-ordered T1 files, sort by TI, test sorted
         t1_dcms = [
@@ -946,6 +1008,78 @@ class TestRelaxometry(unittest.TestCase):
                 self.ROI_TEMPLATE_MEANS_T0[i],
             )
 
+    def test_generate_time_series_roi_means(self):
+        # ROI means matrix matches masked means of each rescaled image
+        template_dcm = pydicom.read_file(self.TEMPLATE_PATH_T1_P5)
+        t1_dcms = [
+            pydicom.dcmread(os.path.join(self.T1_DIR, fname)) for fname in self.T1_FILES
+        ]
+        t1_image_stack = T1ImageStack(t1_dcms)
+        warp_matrix = t1_image_stack.template_fit(template_dcm)
+        t1_image_stack.generate_time_series(
+            self.TEMPLATE_TEST_COORDS_ROW_COL, warp_matrix=warp_matrix
+        )
+
+        assert t1_image_stack.roi_means.shape == (
+            len(self.TEMPLATE_TEST_COORDS_ROW_COL),
+            len(self.T1_FILES),
+        )
+        for i, roi in enumerate(t1_image_stack.ROI_time_series):
+            expected = [
+                np.mean(pixel_rescale(dcm)[roi.ROI_mask > 0])
+                for dcm in t1_image_stack.images
+            ]
+            assert roi.ROI_mask.sum() == 25
+            np.testing.assert_allclose(roi.means, expected)
+            np.testing.assert_allclose(t1_image_stack.roi_means[i], expected)
+
+    def test_generate_time_series_edge_rois(self):
+        # ROIs partly outside the image are clipped to the image
+        template_dcm = pydicom.read_file(self.TEMPLATE_PATH_T1_P5)
+        template_image_stack = T1ImageStack([template_dcm])
+        rows, cols = template_image_stack.pixel_stack.shape[1:]
+        template_image_stack.generate_time_series(
+            [[0, 0], [1, cols - 1], [rows // 2, cols // 2]],
+            warp_matrix=None,
+            fit_coords=False,
+        )
+
+        for roi, n_pixels in zip(template_image_stack.ROI_time_series, [9, 12, 25]):
+            assert roi.ROI_mask.sum() == n_pixels
+            expected = np.mean(
+                pixel_rescale(template_dcm)[roi.ROI_mask > 0], dtype=float
+            )
+            assert len(roi.pixel_values[0]) == n_pixels
+            np.testing.assert_allclose(roi.means, [expected])
+
+    def test_fit_batch_lm(self):
+        # Batch fit of many exponential decays matches fitting each separately
+        rng = np.random.default_rng(0)
+        x = np.linspace(10, 400, 12)
+        true_params = np.column_stack(
+            [rng.uniform(20, 300, 50), rng.uniform(500, 1500, 50)]
+        )
+        y = true_params[:, [1]] * np.exp(-x / true_params[:, [0]])
+        y += rng.normal(0, 5, y.shape)
+        p0 = true_params * rng.uniform(0.7, 1.3, true_params.shape)
+
+        def model(params):
+            return params[:, [1]] * np.exp(-x / params[:, [0]])
+
+        popt, pcov = fit_batch_lm(model, y, p0)
+        assert popt.shape == (50, 2)
+        assert pcov.shape == (50, 2, 2)
+        for i in range(len(y)):
+            ref_popt, ref_pcov = scipy.optimize.curve_fit(
+                lambda x, t, s: s * np.exp(-x / t), x, y[i], p0=p0[i], method="lm"
+            )
+            np.testing.assert_allclose(popt[i], ref_popt, rtol=1e-5)
+            np.testing.assert_allclose(pcov[i], ref_pcov, rtol=1e-3)
+
+        # parameters are kept within bounds
+        popt, _ = fit_batch_lm(model, y, p0, bounds=([0, 0], [100, np.inf]))
+        assert np.all(popt[:, 0] <= 100)
+
     def test_t1_calc_magnitude_image(self):
         """Test T1 value for plate 5 spheres."""
         template_dcm = pydicom.read_file(self.TEMPLATE_PATH_T1_P5)
@@ -986,6 +1120,27 @@ class TestRelaxometry(unittest.TestCase):
             t2_image_stack.relax_times, self.PLATE4_T2, rtol=0.01, atol=1
         )
 
+    def test_t2_fit_jacobian(self):
+        """Test analytic Jacobian of Rician model against finite differences."""
+        t2_image_stack = T2ImageStack(
+            [pydicom.dcmread(os.path.join(self.T2_DIR, self.T2_FILES[0]))]
+        )
+        te = np.linspace(10, 400, 20)
+        for params in [(100.0, 1000.0, 5.0), (50.0, 30.0, 10.0), (80.0, 5.0, 20.0)]:
+            jacobian = t2_image_stack.fit_jacobian(te, *params)
+            assert jacobian.shape == (len(te), 3)
+            for k in range(3):
+                step = np.zeros(3)
+                step[k] = 1e-5 * params[k]
+                numeric = (
+                    t2_image_stack.fit_function(te, *(params + step))
+                    - t2_image_stack.fit_function(te, *(params - step))
+                ) / (2 * step[k])
+                np.testing.assert_allclose(jacobian[:, k], numeric, rtol=1e-4)
+
+        with self.assertRaises(ValueError):
+            T2ImageStack(t2_image_stack.images, jacobian="tabulated")
+
     def test_t1_calc_signed_image(self):
         """Test T1 value for signed plate 5 spheres (site 2)."""
         template_dcm = pydicom.read_file(self.TEMPLATE_PATH_T1_P5)
@@ -1007,6 +1162,58 @@ class TestRelaxometry(unittest.TestCase):
             t1_image_stack.relax_times, self.SITE2_PLATE5_T1, rtol=0.02, atol=1
         )
 
+    def test_t1_map(self):
+        """Test T1 map of plate 5 spheres, in chunks of voxels."""
+        template_dcm = pydicom.read_file(self.TEMPLATE_PATH_T1_P5)
+        t1_dcms = [
+            pydicom.dcmread(os.path.join(self.T1_DIR, fname)) for fname in self.T1_FILES
+        ]
+        t1_image_stack = T1ImageStack(t1_dcms)
+        warp_matrix = t1_image_stack.template_fit(template_dcm)
+        t1_image_stack.generate_time_series(
+            self.TEMPLATE_TEST_COORDS_ROW_COL, warp_matrix=warp_matrix
+        )
+        t1_image_stack.generate_fit_function()
+        mask = t1_image_stack.phantom_mask()
+        relax_map = t1_image_stack.generate_relax_map(mask=mask, chunk_size=5000)
+
+        assert relax_map.shape == mask.shape
+        assert np.all(np.isnan(relax_map[~mask]))
+        # all voxels in the spheres are fitted
+        assert np.all(np.isfinite(relax_map.ravel()[t1_image_stack.roi_flat_index]))
+
+        # sphere values sampled from the map agree with fitting the ROI means
+        t1_image_stack.sample_relax_map()
+        np.testing.assert_allclose(
+            t1_image_stack.relax_times, self.PLATE5_T1, rtol=0.05, atol=1
+        )
+
+        # ROIs with fewer than two fitted voxels are not sampled
+        roi_mask = t1_image_stack.ROI_time_series[0].ROI_mask > 0
+        mask[roi_mask] = False
+        row, col = np.argwhere(roi_mask)[0]
+        mask[row, col] = True
+        t1_image_stack.generate_relax_map(mask=mask, chunk_size=5000)
+        t1_image_stack.sample_relax_map()
+        assert np.isnan(t1_image_stack.relax_times[0])
+        assert np.all(np.isfinite(t1_image_stack.relax_times[1:]))
+
+        with self.assertRaises(ValueError):
+            t1_image_stack.generate_relax_map(mask=np.zeros_like(mask))
+
+    def test_t1_map_siemens(self):
+        """Test T1 values from map on Siemens images."""
+        dcms = get_dicom_files(self.T1_DIR)
+        with tempfile.TemporaryDirectory() as report_dir:
+            task = Relaxometry(input_data=dcms, report=True, report_dir=report_dir)
+            results = task.run(plate_number=5, calc="T1", verbose=True, calc_map=True)
+        np.testing.assert_allclose(
+            results["additional data"]["calc_times"], self.PLATE5_T1, rtol=0.05, atol=1
+        )
+        report_names = [name for name, _ in results["report_image"]]
+        assert "relax_map" in report_names
+        assert "relax_map_data" in report_names
+
     def test_t1_siemens(self):
         """Test T1 values on Siemens images."""
         dcms = get_dicom_files(self.T1_DIR)
@@ -0,0 +1,80 @@
+import unittest
+import pathlib
+import pydicom
+
+from hazenlib.utils import get_dicom_files, scan_dicom_headers
+from hazenlib.tasks.relaxometry import Relaxometry, T2ImageStack, detect_plate
+from hazenlib.tasks.relaxometry_all import RelaxometryAll, group_relaxometry_images
+from tests import TEST_DATA_DIR, TEST_REPORT_DIR
+
+
+class TestRelaxometryAll(unittest.TestCase):
+    RELAX_DATA = pathlib.Path(TEST_DATA_DIR / "relaxometry")
+    SITE = "site5_philips_3T"
+
+    def setUp(self):
+        # T1 and T2 images of both plates from the same study
+        self.headers = scan_dicom_headers(
+            self.RELAX_DATA / "T1" / self.SITE, recursive=True
+        ) + scan_dicom_headers(self.RELAX_DATA / "T2" / self.SITE, recursive=True)
+        self.relaxometry_all_task = RelaxometryAll(
+            input_data=self.headers,
+            report_dir=pathlib.PurePath.joinpath(TEST_REPORT_DIR),
+        )
+
+    def test_group_relaxometry_images(self):
+        image_sets = group_relaxometry_images(self.headers)
+        assert [calc for calc, _ in image_sets] == ["T1", "T1", "T2", "T2"]
+        for calc, dcms in image_sets:
+            # each image set is one plate folder of the test data
+            folders = {pathlib.Path(dcm.path).parent for dcm in dcms}
+            assert len(folders) == 1
+            assert folders.pop().parent.parent.name == calc
+            assert len(dcms) == len(
+                scan_dicom_headers(pathlib.Path(dcms[0].path).parent)
+            )
+
+    def test_detect_plate(self):
+        for plate in [4, 5]:
+            dcms = get_dicom_files(self.RELAX_DATA / "T2" / self.SITE / f"plate{plate}")
+            image_stack = T2ImageStack([pydicom.dcmread(dcm) for dcm in dcms])
+            plate_number, correlations = detect_plate(image_stack, "t2")
+            assert plate_number == plate
+            assert set(correlations) == {4, 5}
+
+    def test_matches_separate_tasks(self):
+        results = self.relaxometry_all_task.run()
+        assert len(results["measurement"]) == 4
+        for calc in ["T1", "T2"]:
+            for plate in [4, 5]:
+                task = Relaxometry(
+                    input_data=scan_dicom_headers(
+                        self.RELAX_DATA / calc / self.SITE / f"plate{plate}"
+                    )
+                )
+                task_results = task.run(calc=calc, plate_number=plate)
+                assert (
+                    results["measurement"][task_results["file"]]
+                    == task_results["measurement"]
+                )
+
+    def test_failed_image_sets_reported(self):
+        # measuring the T2 image sets fails with an invalid option, the T1 image sets are still measured
+        task = RelaxometryAll(input_data=self.headers, t2_jacobian="invalid")
+        results = task.run()
+        assert len(results["measurement"]) == 2
+        assert len(results["errors"]) == 2
+        for image_set, error in results["errors"].items():
+            assert image_set.endswith("_t2")
+            assert error.startswith("ValueError")
+
+    def test_no_images(self):
+        with self.assertRaises(ValueError):
+            RelaxometryAll(input_data=[]).run()
+        # single images cannot be fitted
+        with self.assertRaises(ValueError):
+            RelaxometryAll(input_data=self.headers[:1]).run()
+
+
+class TestRelaxometryAllGE(TestRelaxometryAll):
+    SITE = "site3_ge"
@@ -5,6 +5,7 @@ import numpy as np
 
 from tests import TEST_DATA_DIR, TEST_REPORT_DIR
 from hazenlib.tasks.slice_position import SlicePosition
+from hazenlib.exceptions import RodTrackingError
 from hazenlib.utils import get_dicom_files
 import copy
 
@@ -81,6 +82,33 @@ class TestSlicePosition(unittest.TestCase):
 
         assert (lx, ly, rx, ry) == self.ROD_COORDS
 
+    def test_track_rods_coords(self):
+        reference, test_dcm = self.sorted_slices[10:12]
+        phantom = self.hazen_slice_position.get_phantom_circle(reference)
+
+        tracked = self.hazen_slice_position.track_rods_coords(
+            test_dcm, phantom, self.ROD_COORDS
+        )
+
+        np.testing.assert_allclose(
+            tracked, self.hazen_slice_position.get_rods_coords(test_dcm)
+        )
+
+        # a window without any rod is not tracked
+        with self.assertRaises(RodTrackingError):
+            self.hazen_slice_position.track_rods_coords(
+                test_dcm, phantom, (20, 20, 200, 20)
+            )
+
+    def test_get_rods_tracked(self):
+        tracked = self.hazen_slice_position.get_rods(self.sorted_slices[10:50])
+        self.hazen_slice_position.track_rods = False
+        detected = self.hazen_slice_position.get_rods(self.sorted_slices[10:50])
+
+        for tracked_rod, detected_rod in zip(tracked[:2], detected[:2]):
+            np.testing.assert_allclose(tracked_rod["x_pos"], detected_rod["x_pos"])
+            np.testing.assert_allclose(tracked_rod["y_pos"], detected_rod["y_pos"])
+
     def test_slice_position_errors(self):
         slice_positions = self.hazen_slice_position.slice_position_error(
             self.sorted_slices[10:50]
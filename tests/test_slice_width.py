@@ -3,6 +3,7 @@ import pathlib
 
 import numpy as np
 import pydicom
+from scipy import ndimage
 
 # import hazenlib.slice_width as hazen_slice_width
 from tests import TEST_DATA_DIR, TEST_REPORT_DIR
@@ -210,6 +211,15 @@ class TestSliceWidth(unittest.TestCase):
         for n in range(len(rods)):
             np.testing.assert_almost_equal(self.rods[n].centroid, rods[n].centroid, 3)
 
+    def test_count_regions_by_threshold(self):
+        arr = self.slice_width.single_dcm.pixel_array
+        img_max = np.max(arr)
+        no_region = self.slice_width.count_regions_by_threshold(arr, img_max)
+        assert len(no_region) == img_max
+        for x in np.linspace(0, img_max - 1, 25).astype(int):
+            _, num_features = ndimage.label(arr <= x)
+            assert no_region[x] == num_features
+
     def test_get_rod_distances(self):
         # From MATLAB Rods
         distances = self.slice_width.get_rod_distances(self.matlab_rods)
@@ -298,6 +308,74 @@ class TestSliceWidth(unittest.TestCase):
 
         assert self.slice_width.trapezoid(55, 58, 156, 153, -136.6194)[1] == 113
 
+    def test_trapezoid_profile(self):
+        trap, _ = self.slice_width.trapezoid(55, 58, 156, 153, -136.6194)
+        np.testing.assert_allclose(
+            self.slice_width.trapezoid_profile(len(trap), 55, 58, 156, -136.6194),
+            trap,
+            atol=1e-10,
+        )
+
+    def test_trapezoid_profile_without_ramp(self):
+        for n_ramp in [0, 1]:
+            trap, _ = self.slice_width.trapezoid(n_ramp, 58, 156, 153, 100)
+            np.testing.assert_array_equal(
+                self.slice_width.trapezoid_profile(len(trap), n_ramp, 58, 156, 100),
+                trap,
+            )
+
+    def test_fit_trapezoids_least_squares(self):
+        # synthetic top and bottom profiles with known trapezoids on a quadratic baseline
+        sample_spacing = 0.25
+        rng = np.random.default_rng(0)
+        x = np.arange(0, 120, sample_spacing)
+        true_coefficients = [[47.6, 55.3, 160.2, -110.0], [51.2, 60.7, 150.9, -130.0]]
+        profiles_list = []
+        for n_ramp, n_plateau, n_left_baseline, amplitude in true_coefficients:
+            baseline = np.poly1d([0.02, -2.5, 600])
+            profile = (
+                baseline(x)
+                + self.slice_width.trapezoid_profile(
+                    len(x), n_ramp, n_plateau, n_left_baseline, amplitude
+                )
+                + rng.normal(0, 0.5, len(x))
+            )
+            profiles_list.append(
+                self.slice_width.baseline_correction(profile[::4], sample_spacing)
+            )
+            profiles_list[-1]["profile_interpolated"] = profile
+
+        fits = self.slice_width.fit_trapezoids_least_squares(
+            profiles_list, slice_thickness=5
+        )
+        for (trapezoid_fit_coefficients, _), expected in zip(fits, true_coefficients):
+            n_ramp, n_plateau, n_left_baseline, _, amplitude = (
+                trapezoid_fit_coefficients
+            )
+            assert abs(n_ramp + n_plateau - (expected[0] + expected[1])) < 1
+            assert abs(n_left_baseline - expected[2]) < 1
+            assert abs(amplitude - expected[3]) < 2
+
+    def test_fit_trapezoids_least_squares_linear_baseline(self):
+        # a baseline fit without quadratic term, for which poly1d drops the leading zero
+        sample_spacing = 0.25
+        x = np.arange(0, 120, sample_spacing)
+        profile = (
+            600
+            - 2.5 * x
+            + self.slice_width.trapezoid_profile(len(x), 47.6, 55.3, 160.2, -110.0)
+        )
+        profiles = self.slice_width.baseline_correction(profile[::4], sample_spacing)
+        profiles["profile_interpolated"] = profile
+        profiles["f"] = np.array([0.0, -2.5, 600.0])
+        profiles["baseline_fit"] = np.poly1d(profiles["f"])
+
+        [(trapezoid_fit_coefficients, baseline_fit_coefficients)] = (
+            self.slice_width.fit_trapezoids_least_squares([profiles], slice_thickness=5)
+        )
+        assert len(baseline_fit_coefficients) == 3
+        assert abs(trapezoid_fit_coefficients[2] - 160.2) < 1
+
     def test_get_initial_trapezoid_fit_and_coefficients(self):
         """
         Notes
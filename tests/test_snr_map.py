@@ -71,7 +71,11 @@ class TestSnrMap(unittest.TestCase):
         print("new_release_value:", snr_map_cumsum)
         print("fixed_value:", 128077116718.40483)
 
-        np.testing.assert_almost_equal(snr_map_cumsum, 128077116718.40483)
+        # sliding window statistics agree with the per-pixel reference to
+        # floating point precision, not bit for bit
+        np.testing.assert_approx_equal(
+            snr_map_cumsum, 128077116718.40483, significant=12
+        )
 
     def test_plot_detailed(self):
         # Just check a valid figure handle is returned
@@ -3027,6 +3027,8 @@ class TestSpatialResolution(unittest.TestCase):
         assert (
             np.testing.assert_allclose(circles[0][0][:], self.CIRCLE[0][0][:]) is None
         )
+        # the circle is found at the strictest accumulator threshold
+        assert self.hazen_spatial_resolution.circle_search_attempts == 1
 
     def test_thresh_image(self):
         img = rescale_to_byte(self.hazen_spatial_resolution.dcm_list[0].pixel_array)
@@ -3040,6 +3042,15 @@ class TestSpatialResolution(unittest.TestCase):
 
         assert np.testing.assert_allclose(square, self.TEST_SQUARE) is None
 
+    def test_preprocess(self):
+        dcm = self.hazen_spatial_resolution.dcm_list[0]
+        preprocessed = self.hazen_spatial_resolution.preprocess(dcm)
+        np.testing.assert_allclose(preprocessed["circle"][0][0], self.CIRCLE[0][0])
+        np.testing.assert_allclose(preprocessed["square"], self.TEST_SQUARE)
+        np.testing.assert_array_equal(
+            preprocessed["img"], rescale_to_byte(dcm.pixel_array)
+        )
+
     def test_get_bisecting_normals(self):
         img = rescale_to_byte(self.hazen_spatial_resolution.dcm_list[0].pixel_array)
         thresh = self.hazen_spatial_resolution.thresh_image(img)
@@ -3130,6 +3141,36 @@ class TestSpatialResolution(unittest.TestCase):
             self.rotated_edge_roi, self.y
         )
 
+    def test_get_esf_averages_duplicates(self):
+        # distances are read row by row, pixel values column by column
+        edge_arr = np.array([[1.0, 2.0], [3.0, 4.0]])
+        y = np.array([[0.0, 1.0], [0.0, 1.0]])
+        u, esf = self.hazen_spatial_resolution.get_esf(edge_arr, y)
+        assert len(u) == len(esf) == 128
+        np.testing.assert_allclose([esf[0], esf[-1]], [1.5, 3.5])
+
+    def test_get_edge_roi_size(self):
+        size = 32
+        edge_arr = np.tile(np.arange(size, dtype=float), (size, 1))
+        x_edge, y_edge, rotated = self.hazen_spatial_resolution.get_edge(
+            edge_arr, 10.5, (0.5, 2.0)
+        )
+        np.testing.assert_allclose(x_edge, np.arange(size) * 0.5)
+        np.testing.assert_allclose(y_edge, 20.0)
+        x, y = self.hazen_spatial_resolution.get_edge_profile_coords(
+            0, 20.0, (0.5, 2.0), size=size
+        )
+        assert x.shape == y.shape == (size, size)
+
+    def test_calculate_mtf_roi_size(self):
+        task = SpatialResolution(input_data=self.files, roi_size=32)
+        pixels = task.dcm_list[0].pixel_array
+        assert task.get_edge_roi(pixels, self.CENTRE).shape == (32, 32)
+        # a larger ROI samples the edge differently, but measures a similar resolution
+        pe_result, fe_result = task.calculate_mtf(task.dcm_list[0])
+        assert fe_result == pytest.approx(self.MTF_FE, abs=0.1)
+        assert pe_result == pytest.approx(self.MTF_PE, abs=0.1)
+
     def test_mtf(self):
         assert self.mtf[0] == abs(np.fft.fft(self.lsf))[0]
 
@@ -2,6 +2,7 @@ import os
 import pathlib
 import unittest
 import pytest
+import numpy as np
 
 from hazenlib.tasks.uniformity import Uniformity
 from tests import TEST_DATA_DIR, TEST_REPORT_DIR
@@ -30,6 +31,27 @@ class TestUniformity(unittest.TestCase):
         assert horizontal_ipem == pytest.approx(self.IPEM_HORIZONTAL, abs=0.005)
         assert vertical_ipem == pytest.approx(self.IPEM_VERTICAL, abs=0.005)
 
+    def test_mode(self):
+        arr = self.uniformity_task.single_dcm.pixel_array
+        roi = arr[100:110, 50:210]
+        for a, max_bins in [
+            (roi, Uniformity.MAX_BINS),
+            # lines counted in chunks, and integers counted line by line
+            (roi, 2 * int(np.ptp(roi) + 1)),
+            (roi, 10),
+            (roi.astype(float) / 3, Uniformity.MAX_BINS),
+        ]:
+            self.uniformity_task.MAX_BINS = max_bins
+            for axis in [0, 1]:
+                most_frequent, counts = self.uniformity_task.mode(a, axis)
+                for idx, line in enumerate(np.moveaxis(a, axis, 0).T):
+                    values, line_counts = np.unique(line, return_counts=True)
+                    # smallest of the most frequent values
+                    assert (
+                        most_frequent.flatten()[idx] == values[np.argmax(line_counts)]
+                    )
+                    assert counts.flatten()[idx] == np.max(line_counts)
+
 
 class TestSagUniformity(TestUniformity):
     IPEM_HORIZONTAL = 0.46875
@@ -1,8 +1,10 @@
 import unittest
 import os
 
+import cv2 as cv
 import numpy as np
 import pydicom
+from scipy import ndimage
 
 import hazenlib.utils as hazen_tools
 from tests import TEST_DATA_DIR
@@ -79,6 +81,116 @@ class TestShapeDetector(ShapeSetUp):
         np.testing.assert_allclose(size, self.cor2_rectangle_size, rtol=1e-02)
         np.testing.assert_allclose(angle, self.cor2_rectangle_angle, rtol=1e-02)
 
+    def test_detection_memoised(self):
+        arr = pydicom.read_file(self.LARGE_CIRCLE_PHANTOM_FILE).pixel_array
+        shape_detector = hazen_tools.ShapeDetector(arr=arr)
+        circle = shape_detector.get_shape("circle")
+        contours, shapes = shape_detector.contours, dict(shape_detector.shapes)
+
+        with self.assertRaises(hazen_tools.exc.ShapeDetectionError):
+            shape_detector.get_shape("rectangle")
+        assert shape_detector.get_shape("circle") == circle
+        # contours are not found, nor shapes classified, again
+        assert shape_detector.contours is contours
+        assert dict(shape_detector.shapes) == shapes
+
+    def test_small_contours_ignored(self):
+        arr = np.random.default_rng(0).integers(50, 150, (256, 256)).astype(np.uint16)
+        cv.circle(arr, (128, 128), 80, 1000, -1)
+        for centre in [(20, 20), (230, 30), (30, 230)]:
+            cv.circle(arr, centre, 6, 1000, -1)
+        shape_detector = hazen_tools.ShapeDetector(arr=arr)
+        x, y, r = shape_detector.get_shape("circle")
+        assert (round(x), round(y)) == (128, 128)
+        assert len(shape_detector.contours) == 4
+
+
+class TestPhantomLocator(ShapeSetUp):
+    def setUp(self):
+        self.locator = hazen_tools.PhantomLocator(max_images=2)
+
+    def test_get_shape_cached(self):
+        dcm = pydicom.read_file(self.LARGE_CIRCLE_PHANTOM_FILE)
+        x, y, r = hazen_tools.ShapeDetector(arr=dcm.pixel_array).get_shape("circle")
+        assert self.locator.get_shape(dcm, "circle") == (x, y, r)
+
+        # the same image is not searched again, whatever object it is read into
+        dcm = pydicom.read_file(self.LARGE_CIRCLE_PHANTOM_FILE)
+        assert self.locator.get_shape(dcm, "circle") == (x, y, r)
+        assert len(self.locator) == 1
+
+        # an image with the same SOPInstanceUID but different pixels is searched
+        dcm.PixelData = np.roll(dcm.pixel_array, 10, axis=1).tobytes()
+        shifted_x, shifted_y, _ = self.locator.get_shape(dcm, "circle")
+        assert round(shifted_x - x) == 10
+        assert len(self.locator) == 2
+
+    def test_lazy_dicom_modified(self):
+        lazy_dcm = hazen_tools.LazyDicom(
+            self.LARGE_CIRCLE_PHANTOM_FILE, cache=hazen_tools.PixelCache()
+        )
+        x, y, r = self.locator.get_shape(lazy_dcm, "circle")
+        lazy_dcm.PixelData = np.roll(lazy_dcm.pixel_array, 10, axis=0).tobytes()
+        shifted_x, shifted_y, _ = self.locator.get_shape(lazy_dcm, "circle")
+        assert round(shifted_y - y) == 10
+
+    def test_failure_cached(self):
+        dcm = pydicom.read_file(self.LARGE_CIRCLE_PHANTOM_FILE)
+        for _ in range(2):
+            with self.assertRaises(hazen_tools.exc.ShapeDetectionError):
+                self.locator.get_shape(dcm, "triangle")
+        assert len(self.locator) == 1
+
+    def test_find_circles_keyed_by_image(self):
+        dcm = pydicom.read_file(self.LARGE_CIRCLE_PHANTOM_FILE)
+        image = cv.normalize(dcm.pixel_array, None, 0, 255, cv.NORM_MINMAX, cv.CV_8U)
+        params = dict(min_dist=256, min_radius=80, max_radius=200, max_param2=40)
+        circles, _ = self.locator.find_circles(dcm, image, **params)
+        # a different image derived from the same DICOM is searched again
+        shifted_circles, _ = self.locator.find_circles(
+            dcm, np.roll(image, 10, axis=1), **params
+        )
+        assert abs(shifted_circles[0, 0, 0] - circles[0, 0, 0] - 10) < 2
+
+    def test_shared_by_tasks(self):
+        from hazenlib.tasks.snr import SNR
+        from hazenlib.tasks.uniformity import Uniformity
+
+        kwargs = dict(
+            input_data=[self.LARGE_CIRCLE_PHANTOM_FILE], phantom_locator=self.locator
+        )
+        snr_task, uniformity_task = SNR(**kwargs), Uniformity(**kwargs)
+        assert uniformity_task.get_object_centre(uniformity_task.dcm_list[0]) == (
+            snr_task.get_object_centre(snr_task.dcm_list[0])
+        )
+        assert len(self.locator) == 1
+
+    def test_shared_by_default(self):
+        from hazenlib.tasks.snr import SNR
+        from hazenlib.tasks.uniformity import Uniformity
+
+        hazen_tools.phantom_locator.clear()
+        searches = hazen_tools.phantom_locator.searches
+        snr_task = SNR(input_data=[self.LARGE_CIRCLE_PHANTOM_FILE])
+        uniformity_task = Uniformity(input_data=[self.LARGE_CIRCLE_PHANTOM_FILE])
+        assert uniformity_task.get_object_centre(uniformity_task.dcm_list[0]) == (
+            snr_task.get_object_centre(snr_task.dcm_list[0])
+        )
+        # the phantom is detected once, for the first task
+        assert hazen_tools.phantom_locator.searches == searches + 1
+
+    def test_least_recent_dropped(self):
+        for path in [
+            self.LARGE_CIRCLE_PHANTOM_FILE,
+            self.SAG_RECTANGLE_PHANTOM_FILE,
+            self.COR_RECTANGLE_PHANTOM_FILE,
+        ]:
+            try:
+                self.locator.get_largest_circle(pydicom.read_file(path))
+            except hazen_tools.exc.ShapeError:
+                pass
+        assert len(self.locator) == 2
+
 
 class Test_is_Dicom_file(unittest.TestCase):
     def setUp(self) -> None:
@@ -102,6 +214,102 @@ class Test_is_Dicom_file(unittest.TestCase):
         self.assertFalse(result)
 
 
+class TestDicomHeaders(unittest.TestCase):
+    ACR_DATA_SIEMENS = str(TEST_DATA_DIR / "acr" / "Siemens")
+
+    def test_scan_matches_get_dicom_files(self):
+        headers = hazen_tools.scan_dicom_headers(self.ACR_DATA_SIEMENS)
+        files = hazen_tools.get_dicom_files(self.ACR_DATA_SIEMENS)
+        assert [header.path for header in headers] == files
+
+    def test_headers_skip_pixel_data(self):
+        headers = hazen_tools.scan_dicom_headers(self.ACR_DATA_SIEMENS)
+        for header in headers:
+            assert "PixelData" not in header
+            assert header.Modality == "MR"
+
+    def test_sort_by_instance_number(self):
+        headers = hazen_tools.scan_dicom_headers(self.ACR_DATA_SIEMENS, sort=True)
+        instance_numbers = [header.InstanceNumber for header in headers]
+        assert instance_numbers == sorted(instance_numbers)
+
+    def test_non_dicom_is_skipped(self):
+        data_folder = str(TEST_DATA_DIR / "tools")
+        assert (
+            hazen_tools.read_dicom_header(os.path.join(data_folder, "dicom_no.jfif"))
+            is None
+        )
+
+    def test_group_by_series(self):
+        headers = hazen_tools.scan_dicom_headers(self.ACR_DATA_SIEMENS)
+        groups = hazen_tools.group_dicom_headers(headers)
+        assert len(groups) == 1
+        assert list(groups.values())[0] == headers
+
+    def test_recursive_scan(self):
+        study_folder = str(TEST_DATA_DIR / "relaxometry" / "T2" / "site3_ge")
+        assert hazen_tools.scan_dicom_headers(study_folder) == []
+        headers = hazen_tools.scan_dicom_headers(study_folder, recursive=True)
+        assert len(headers) == 16
+        assert {os.path.basename(os.path.dirname(h.path)) for h in headers} == {
+            "plate4",
+            "plate5",
+        }
+
+    def test_header_reusable_as_path(self):
+        header = hazen_tools.scan_dicom_headers(self.ACR_DATA_SIEMENS)[0]
+        dcm = pydicom.dcmread(header)
+        assert dcm.SOPInstanceUID == header.SOPInstanceUID
+        assert "PixelData" in dcm
+
+
+class TestLazyDicom(unittest.TestCase):
+    DICOM_FILE = str(TEST_DATA_DIR / "acr" / "Siemens" / "0.dcm")
+
+    def setUp(self):
+        self.cache = hazen_tools.PixelCache()
+        self.dcm = hazen_tools.LazyDicom(self.DICOM_FILE, cache=self.cache)
+        self.reference = pydicom.dcmread(self.DICOM_FILE)
+
+    def test_header_access(self):
+        assert self.dcm.SOPInstanceUID == self.reference.SOPInstanceUID
+        assert self.dcm[0x0008, 0x0018].value == self.reference.SOPInstanceUID
+        assert "PixelSpacing" in self.dcm
+        assert self.dcm.get("NotAKeyword") is None
+
+    def test_pixels_decoded_once_read_only(self):
+        pixels = self.dcm.pixel_array
+        np.testing.assert_array_equal(pixels, self.reference.pixel_array)
+        assert self.dcm.pixel_array is pixels
+        assert not pixels.flags.writeable
+        with self.assertRaises(ValueError):
+            pixels[0, 0] = 1
+
+    def test_converted_pixels_cached(self):
+        pixels = hazen_tools.get_pixel_array(self.dcm, "int")
+        assert pixels.dtype == np.dtype("int")
+        assert hazen_tools.get_pixel_array(self.dcm, "int") is pixels
+        assert len(self.cache) == 2
+
+    def test_memory_budget_eviction(self):
+        nbytes = self.dcm.pixel_array.nbytes
+        cache = hazen_tools.PixelCache(max_bytes=nbytes)
+        first = hazen_tools.LazyDicom(self.DICOM_FILE, cache=cache)
+        first.pixel_array
+        hazen_tools.get_pixel_array(first, "float64")
+        assert len(cache) == 1
+        # evicted pixels are decoded again on request
+        np.testing.assert_array_equal(first.pixel_array, self.reference.pixel_array)
+
+    def test_pixel_data_assignment(self):
+        flipped = np.fliplr(self.dcm.pixel_array)
+        self.dcm.PixelData = flipped.tobytes()
+        np.testing.assert_array_equal(self.dcm.pixel_array, flipped)
+        # other proxies of the same file are unaffected
+        other = hazen_tools.LazyDicom(self.DICOM_FILE, cache=self.cache)
+        np.testing.assert_array_equal(other.pixel_array, self.reference.pixel_array)
+
+
 class TestUtils(unittest.TestCase):
     def setUp(self):
         TEST_DICOM = str(TEST_DATA_DIR / "toshiba" / "TOSHIBA_TM_MR_DCM_V3_0.dcm")
@@ -270,6 +478,55 @@ class TestUtils(unittest.TestCase):
         TEST_OUT = TEST_OUT.tolist()
         self.assertListEqual(test_array, TEST_OUT)
 
+    def test_local_std(self):
+        rng = np.random.default_rng(0)
+        image = rng.normal(1000, 20, (64, 48))
+        for size, ddof in [(5, 1), (20, 1), (9, 0)]:
+            expected = ndimage.generic_filter(
+                image, lambda x: np.std(x, ddof=ddof), size=size
+            )
+            np.testing.assert_allclose(
+                hazen_tools.local_std(image, size, ddof=ddof), expected, rtol=1e-9
+            )
+
+    def test_local_std_uniform_image(self):
+        image = np.full((16, 16), 7)
+        np.testing.assert_array_equal(hazen_tools.local_std(image, 5), 0)
+
+    def test_local_mean(self):
+        image = np.arange(100).reshape(10, 10)
+        expected = ndimage.generic_filter(image.astype(float), np.mean, size=3)
+        np.testing.assert_allclose(hazen_tools.local_mean(image, 3), expected)
+
+    def test_find_circles(self):
+        # partial circles need lower accumulator thresholds than a full circle
+        for arc in [360, 45, 15]:
+            image = np.zeros((512, 512), np.uint8)
+            cv.ellipse(image, (250, 260), (150, 150), 0, 0, arc, 255, 3)
+            image = cv.GaussianBlur(image, (5, 5), 0)
+            for param2 in range(40, 0, -1):
+                expected = cv.HoughCircles(
+                    image,
+                    cv.HOUGH_GRADIENT,
+                    1.2,
+                    256,
+                    param1=100,
+                    param2=param2,
+                    minRadius=80,
+                    maxRadius=200,
+                )
+                if expected is not None:
+                    break
+            circles, attempts = hazen_tools.find_circles(image, 256, 80, 200)
+            np.testing.assert_array_equal(circles, expected)
+            assert attempts <= 16
+
+    def test_find_circles_none_found(self):
+        image = np.zeros((256, 256), np.uint8)
+        circles, attempts = hazen_tools.find_circles(image, 128, 40, 100)
+        assert circles is None
+        assert attempts <= 16
+
 
 if __name__ == "__main__":
     unittest.main()